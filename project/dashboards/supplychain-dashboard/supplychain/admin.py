@@ -40,6 +40,14 @@ class TrackerEventAdmin(admin.ModelAdmin):
     search_fields = ('message_id', 'tracker__tracker_key')
     raw_id_fields = ('tracker',)
 
+
+from supplychain.models import TelemetryReading
+@admin.register(TelemetryReading)
+class TelemetryReadingAdmin(admin.ModelAdmin):
+    list_display = ('trackerevent', 'tracker', 'timestamp', 'temperature_c', 'humidity_percent')
+    list_filter = ('timestamp', 'tracker')
+    raw_id_fields = ('trackerevent', 'tracker')
+
 from supplychain.models import CustodyTransfer
 @admin.register(CustodyTransfer)
 class CustodyTransferAdmin(admin.ModelAdmin):
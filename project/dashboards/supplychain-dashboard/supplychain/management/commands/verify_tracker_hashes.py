@@ -0,0 +1,83 @@
+"""
+Django management command to recompute TrackerEvent hashes from their
+stored payloads and report events whose data_hash no longer matches.
+
+Usage:
+    python manage.py verify_tracker_hashes
+    python manage.py verify_tracker_hashes --since 2025-06-01 --chunk 5000
+
+Events are read in primary key order, a chunk at a time. The next chunk is
+fetched on a second thread while the current one is hashed, so the sweep
+runs at the speed of the slower of the two rather than their sum.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils.dateparse import parse_datetime, parse_date
+
+from supplychain.models import TrackerEvent
+from supplychain.scripts.compute_event_hash import compute_tracker_hashes
+
+from concurrent.futures import ThreadPoolExecutor
+
+class Command(BaseCommand):
+    help = 'Recompute TrackerEvent hashes and report mismatches with the stored data_hash'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk',
+            type=int,
+            default=2000,
+            help='Events read per query'
+        )
+        parser.add_argument(
+            '--since',
+            help='Only events with a timestamp from this date or datetime (ISO 8601)'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            help='Report at most this many mismatches'
+        )
+
+    def handle(self, *args, **options):
+        events = TrackerEvent.objects.order_by('pk')
+
+        if options['since']:
+            since = parse_datetime(options['since']) or parse_date(options['since'])
+            if since is None:
+                raise CommandError(f"Invalid --since: {options['since']}")
+            events = events.filter(timestamp__gte=since)
+
+        def fetch(after_pk):
+            rows = events.filter(pk__gt=after_pk) if after_pk is not None else events
+            return list(rows.values_list('pk', 'payload', 'data_hash')[:options['chunk']])
+
+        checked = mismatched = 0
+
+        with ThreadPoolExecutor(max_workers=1) as prefetch:
+            pending = prefetch.submit(fetch, None)
+
+            while True:
+                rows = pending.result()
+                if not rows:
+                    break
+
+                pending = prefetch.submit(fetch, rows[-1][0])
+
+                hashes = compute_tracker_hashes(payload for _, payload, _ in rows)
+
+                for (pk, _, data_hash), computed in zip(rows, hashes):
+                    if computed is not None and computed == data_hash.lower():
+                        continue
+
+                    mismatched += 1
+                    if options['limit'] is None or mismatched <= options['limit']:
+                        self.stdout.write(f"TrackerEvent {pk}: stored {data_hash}, computed {computed}")
+
+                checked += len(rows)
+
+            # the prefetch thread opened its own connection
+            prefetch.submit(connections.close_all).result()
+
+        style = self.style.ERROR if mismatched else self.style.SUCCESS
+        self.stdout.write(style(f'Checked {checked} tracker events, {mismatched} mismatched'))
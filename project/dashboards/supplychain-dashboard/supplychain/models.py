@@ -4,6 +4,7 @@ from iota_sdk import HexStr
 
 from django.db import models
 from django.conf import settings
+from django.contrib.postgres.indexes import BrinIndex
 from django.utils import timezone
 
 from accounts.models import Company
@@ -295,10 +296,17 @@ class TrackerEvent(models.Model):
                 HexString for hashed ProductEvent
 
                 e.g. "0x12398a12bc14e09"
+
+            Memoised on the instance for as long as self.payload is the
+            same object; assign a new payload rather than editing it in place.
         """
-        serialized_key_enc = compute_event_hash.compute_tracker_hash(self.payload)
+        cached = getattr(self, '_payload_hash', None)
+
+        if cached is None or cached[0] is not self.payload:
+            serialized_key_enc = compute_event_hash.compute_tracker_hash(self.payload)
+            cached = self._payload_hash = (self.payload, HexStr(serialized_key_enc))
 
-        return HexStr(serialized_key_enc)
+        return cached[1]
 
     def verify_block_hash(self) -> bool:
         """
@@ -317,27 +325,124 @@ class TrackerEvent(models.Model):
 
         return chain_message_id == self.message_id and model_hash == chain_hash
 
-    def anchor_on_iota(self) -> str:
+    def anchor_on_iota(self, save: bool = True) -> str:
         """
         Publish zero‐value tagged data to IOTA blockchain.
 
         Args:
-            None
+            save (bool): Store the block id on the event. Pass False to
+                         store it separately, outside a transaction the
+                         network round-trip should not hold open.
 
         Returns:
             BlockId of stored block
         """
+        data_hex = self.data_hash if self.data_hash.startswith("0x") else "0x" + self.data_hash
+
         block_id, _ = iota_client.iota_build_and_post_block(
-            message_id=self.message_id,
-            data_hex=self.data_hash,
+            message_id=str(self.message_id),
+            data_hex=HexStr(data_hex),
         )
 
         self.block_id = block_id
-        self.save()
+        if save:
+            self.save()
 
         return block_id
 
 
+class TelemetryReading(models.Model):
+    """
+    The sensor values of a telemetry TrackerEvent as typed columns, written
+    at ingest alongside it, so range queries and aggregates do not have to
+    cast the payload's JSON strings row by row.
+    """
+    trackerevent = models.OneToOneField(
+        TrackerEvent,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name='reading',
+        help_text="Tracker event the values were read from.",
+        # partitioned like TrackerEvent (partition_events), which PostgreSQL
+        # cannot reference by message_id alone
+        db_constraint=False,
+    )
+
+    tracker = models.ForeignKey(
+        Tracker,
+        on_delete=models.SET_NULL,
+        related_name='readings',
+        help_text="Tracker that took the reading.",
+        null=True,
+        blank=True,
+        # covered by the (tracker, timestamp) index
+        db_index=False,
+    )
+
+    timestamp = models.DateTimeField(
+        help_text="When the reading was taken."
+    )
+
+    latitude = models.FloatField(
+        help_text="Degrees, negative south of the equator."
+    )
+
+    longitude = models.FloatField(
+        help_text="Degrees, negative west of Greenwich."
+    )
+
+    altitude_m = models.FloatField(
+        help_text="Altitude in metres."
+    )
+
+    temperature_c = models.FloatField(
+        help_text="Temperature in degrees Celsius."
+    )
+
+    humidity_percent = models.FloatField(
+        help_text="Relative humidity in percent."
+    )
+
+    pressure_hpa = models.FloatField(
+        help_text="Air pressure in hectopascals."
+    )
+
+    gas_ppm = models.FloatField(
+        help_text="Gas concentration in parts per million."
+    )
+
+    x_mps2 = models.FloatField(
+        help_text="Acceleration along x in m/s²."
+    )
+
+    y_mps2 = models.FloatField(
+        help_text="Acceleration along y in m/s²."
+    )
+
+    z_mps2 = models.FloatField(
+        help_text="Acceleration along z in m/s²."
+    )
+
+    VALUE_FIELDS = [
+        'latitude', 'longitude', 'altitude_m',
+        'temperature_c', 'humidity_percent', 'pressure_hpa', 'gas_ppm',
+        'x_mps2', 'y_mps2', 'z_mps2',
+    ]
+
+    class Meta:
+        ordering = ['timestamp']
+        indexes = [
+            # rows arrive in time order, so a BRIN index stays tiny
+            BrinIndex(fields=['timestamp'], autosummarize=True),
+            models.Index(fields=['tracker', 'timestamp']),
+        ]
+        verbose_name = "Telemetry Reading"
+        verbose_name_plural = "Telemetry Readings"
+
+    def __str__(self):
+        return f"{self.temperature_c} °C @ {self.timestamp.isoformat()} for {self.tracker}"
+
+
 class ProductEvent(models.Model):
     """
     Records an event in a product's lifecycle, anchored on-chain/off-chain.
@@ -371,6 +476,9 @@ class ProductEvent(models.Model):
         help_text="Tracker event to which this was created from.",
         null=True,
         blank=True,
+        # the tracker event table is partitioned by timestamp (partition_events),
+        # and PostgreSQL cannot reference it by message_id alone
+        db_constraint=False,
     )
 
     event_type = models.CharField(
@@ -1,6 +1,8 @@
 import json
 import hashlib
 
+from typing import Iterable, List, Optional
+
 JSON_BUFFER_SIZE = 352
 
 def compute_tracker_hash(payload: dict) -> str:
@@ -60,4 +62,24 @@ def compute_tracker_hash(payload: dict) -> str:
 
     return digest
 
+def compute_tracker_hashes(payloads: Iterable[dict]) -> List[Optional[str]]:
+    """
+    compute_tracker_hash over many payloads, for backfills and verification
+    sweeps. A payload that cannot be hashed (missing or oversized fields)
+    gives None instead of stopping the batch.
+
+    This runs in the calling thread: each buffer is 352 bytes, under the
+    2 KiB above which hashlib releases the GIL, and the formatting is
+    Python, so a thread pool over the payloads gains nothing. Callers that
+    read payloads from the database overlap that I/O with hashing instead
+    (see the verify_tracker_hashes command).
+    """
+    hashes = []
+
+    for payload in payloads:
+        try:
+            hashes.append(compute_tracker_hash(payload))
+        except (KeyError, TypeError, ValueError):
+            hashes.append(None)
 
+    return hashes
@@ -67,7 +67,8 @@ def create_productevent_from_trackerevent(trackerevent: TrackerEvent) -> List[Pr
                 if created:
                     continue
 
-                # Verify the product hash
+                # Verify the product hash; compute_hash is memoised, so this
+                # hashes the payload once per tracker event, not per product
                 if HexStr(trackerevent.data_hash) != trackerevent.compute_hash():
                     ProductNotification.objects.create(
                         productevent=productevent,
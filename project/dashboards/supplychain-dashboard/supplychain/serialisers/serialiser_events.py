@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from supplychain.models import TrackerEvent, ProductEvent
+from supplychain.models import TrackerEvent, TelemetryReading, ProductEvent
 
 class TrackerEventSerializer(serializers.ModelSerializer):
     """
@@ -22,6 +22,22 @@ class TrackerEventSerializer(serializers.ModelSerializer):
         ]
 
 
+class TelemetryReadingSerializer(serializers.ModelSerializer):
+    """
+    Serializer for the typed sensor values of a telemetry TrackerEvent.
+    """
+    message_id = serializers.UUIDField(source='trackerevent_id', read_only=True)
+
+    class Meta:
+        model = TelemetryReading
+        fields = [
+            'message_id',
+            'tracker',
+            'timestamp',
+        ] + TelemetryReading.VALUE_FIELDS
+        read_only_fields = fields
+
+
 class ProductEventSerializer(serializers.ModelSerializer):
     """
     Serializer for lifecycle events attached to a Product.
@@ -66,6 +82,16 @@ class EventFilterSerializer(serializers.Serializer):
     )
 
 
+class ReadingFilterSerializer(EventFilterSerializer):
+    """
+    Query parameters for the telemetry reading endpoints.
+    """
+    tracker = serializers.IntegerField(
+        required=False,
+        help_text="Only readings from this tracker."
+    )
+
+
 class VerifyHashInputSerializer(serializers.Serializer):
     """
     Input payload for block‐hash verification.
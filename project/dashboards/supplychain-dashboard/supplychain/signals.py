@@ -3,8 +3,8 @@ from django.dispatch import receiver
 
 from supplychain.models import ProductOrder, ProductOrderStatus, ProductEvent, TrackerEvent
 
-from supplychain.scripts.productevent_builder import create_productevent_from_trackerevent
-from notifications.scripts.productevent_notifications import create_notifications_from_productevent
+from telemetry.models import IngestTask
+from telemetry.scripts.ingest.task_queue import enqueue
 
 @receiver(post_save, sender=ProductOrder)
 def create_initial_order_status(sender, instance, created, **kwargs):
@@ -19,9 +19,9 @@ def create_initial_order_status(sender, instance, created, **kwargs):
 @receiver(post_save, sender=ProductEvent)
 def productevent_post_save(sender, instance, created, **kwargs):
     if created:
-        create_notifications_from_productevent(instance)
+        enqueue(IngestTask.STAGE_NOTIFICATIONS, [instance.pk])
 
 @receiver(post_save, sender=TrackerEvent)
 def tracker_event_post_save(sender, instance, created, **kwargs):
     if created:
-        create_productevent_from_trackerevent(instance)
+        enqueue(IngestTask.STAGE_PRODUCT_EVENTS, [instance.pk])
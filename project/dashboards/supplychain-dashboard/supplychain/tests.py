@@ -1,3 +1,133 @@
+import uuid
+
+from unittest import mock
+
 from django.test import TestCase
 
-# Create your tests here.
+from notifications.models import TrackerNotification
+from supplychain.models import Gateway, TelemetryReading, Tracker, TrackerEvent
+from telemetry.models import IngestTask
+from telemetry.scripts.ingest import task_queue
+from telemetry.scripts.ingest.gateway_ingest import gateway_raw_data_ingest
+from telemetry.scripts.ingest.stages import REMOTE_CALLS, STAGES
+from telemetry.scripts.ingest.tracker_ingest import tracker_raw_data_ingest_from_gatewayevent
+
+
+def reading(temperature: str = "20.00", **extra):
+    return {
+        "messageId": str(uuid.uuid4()),
+        "deviceId": "dev-1",
+        "timestamp": "2025-01-01T00:00:00",
+        "uptime": "1",
+        "location": {"latitude": "27.5", "ns": "S", "longitude": "153.0", "ew": "E", "altitude_m": "3.0"},
+        "environment": {"temperature_c": temperature, "humidity_percent": "1.00", "pressure_hpa": "1000.0", "gas_ppm": "1.00"},
+        "acceleration": {"x_mps2": "0.000", "y_mps2": "0.000", "z_mps2": "9.810"},
+        **extra,
+    }
+
+
+def batch(*readings):
+    return {
+        "header": {
+            "messageId": str(uuid.uuid4()),
+            "gatewayId": "GW-01",
+            "schemaVersion": "1",
+            "messageType": "batch_telemetry",
+        },
+        "payload": {"timestamp": "2025-01-01T00:00:00", "readings": list(readings)},
+        "signature": {"alg": "HS256", "keyId": "k", "value": ""},
+    }
+
+
+def tasks(stage):
+    return IngestTask.objects.filter(stage=stage).count()
+
+
+class TrackerIngestTests(TestCase):
+    def setUp(self):
+        Gateway.objects.create(gateway_key="GW-01")
+        self.tracker = Tracker.objects.create(tracker_key="dev-1")
+
+    def ingest(self, envelope):
+        event, created = gateway_raw_data_ingest(envelope)
+        self.assertTrue(created)
+        task_queue.run_worker([IngestTask.STAGE_TRACKER_EVENTS], STAGES, once=True)
+        return event
+
+    def test_batch_readings_become_events_and_typed_readings(self):
+        first, second = reading("20.50"), reading("-3.25")
+
+        self.ingest(batch(first, second))
+
+        self.assertEqual(
+            set(TrackerEvent.objects.values_list("message_id", flat=True)),
+            {uuid.UUID(first["messageId"]), uuid.UUID(second["messageId"])},
+        )
+        self.assertEqual(
+            sorted(TelemetryReading.objects.values_list("temperature_c", flat=True)), [-3.25, 20.5]
+        )
+        self.assertEqual(TelemetryReading.objects.filter(tracker=self.tracker, latitude=-27.5).count(), 2)
+        self.assertEqual(tasks(IngestTask.STAGE_ANCHOR), 2)
+        self.assertEqual(tasks(IngestTask.STAGE_PRODUCT_EVENTS), 2)
+        self.assertEqual(tasks(IngestTask.STAGE_TRACKER_EVENTS), 0)
+
+    def test_redelivered_readings_add_nothing(self):
+        event = self.ingest(batch(reading(), reading()))
+
+        self.assertEqual(tracker_raw_data_ingest_from_gatewayevent(event), [])
+        self.assertEqual(TrackerEvent.objects.count(), 2)
+        self.assertEqual(tasks(IngestTask.STAGE_ANCHOR), 2)
+
+    def test_invalid_reading_is_skipped(self):
+        bad = reading("n/a")
+
+        self.ingest(batch(reading(), bad))
+
+        self.assertEqual(TrackerEvent.objects.count(), 1)
+        self.assertFalse(TrackerEvent.objects.filter(message_id=bad["messageId"]).exists())
+
+    def test_hash_mismatch_is_reported_and_not_anchored(self):
+        self.ingest(batch(reading(hash="00" * 32)))
+
+        self.assertEqual(TrackerNotification.objects.count(), 1)
+        self.assertEqual(tasks(IngestTask.STAGE_ANCHOR), 0)
+        self.assertEqual(tasks(IngestTask.STAGE_PRODUCT_EVENTS), 1)
+
+
+class AnchorStageTests(TestCase):
+    def setUp(self):
+        Gateway.objects.create(gateway_key="GW-01")
+        Tracker.objects.create(tracker_key="dev-1")
+        gateway_raw_data_ingest(batch(reading()))
+        task_queue.run_worker([IngestTask.STAGE_TRACKER_EVENTS], STAGES, once=True)
+        self.event = TrackerEvent.objects.get()
+
+    def anchor(self):
+        return task_queue.run_worker([IngestTask.STAGE_ANCHOR], STAGES, REMOTE_CALLS, once=True)
+
+    @mock.patch("supplychain.scripts.iota_client.iota_build_and_post_block", return_value=("0xblock", None))
+    def test_block_id_is_stored(self, post):
+        self.assertEqual(self.anchor(), 1)
+
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.block_id, "0xblock")
+        self.assertEqual(post.call_args.kwargs["message_id"], str(self.event.message_id))
+        self.assertEqual(tasks(IngestTask.STAGE_ANCHOR), 0)
+
+    @mock.patch("supplychain.scripts.iota_client.iota_build_and_post_block", side_effect=ConnectionError("node down"))
+    def test_failed_post_is_retried(self, post):
+        with self.assertLogs(task_queue.logger, "ERROR"):
+            self.assertEqual(self.anchor(), 0)
+
+        self.event.refresh_from_db()
+        self.assertIsNone(self.event.block_id)
+        task = IngestTask.objects.get(stage=IngestTask.STAGE_ANCHOR)
+        self.assertEqual((task.status, task.last_error), (IngestTask.STATUS_PENDING, "node down"))
+
+    @mock.patch("supplychain.scripts.iota_client.iota_build_and_post_block")
+    def test_anchored_event_is_not_posted_again(self, post):
+        TrackerEvent.objects.filter(pk=self.event.pk).update(block_id="0xearlier")
+
+        self.anchor()
+
+        post.assert_not_called()
@@ -2,12 +2,14 @@ from rest_framework.decorators import api_view
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action, permission_classes
 from rest_framework.response import Response
-from django.db.models import Q
+from django.db.models import Avg, Count, Max, Min, Q
 from django_filters.rest_framework import DjangoFilterBackend
 
-from supplychain.models import TrackerEvent, ProductEvent
+from supplychain.models import TrackerEvent, TelemetryReading, ProductEvent
 from supplychain.serialisers.serialiser_events import (
     TrackerEventSerializer, 
+    TelemetryReadingSerializer,
+    ReadingFilterSerializer,
     ProductEventSerializer,
     VerifyHashInputSerializer,
     VerifyHashResultSerializer
@@ -36,6 +38,57 @@ class TrackerEventViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    def get_reading_queryset(self, request):
+        """
+        TelemetryReadings in the ?start=&end= window, for ?tracker= if given.
+        """
+        params = ReadingFilterSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+
+        qs = TelemetryReading.objects.filter(
+            timestamp__gte=params.validated_data['start'],
+            timestamp__lt=params.validated_data['end'],
+        )
+
+        if 'tracker' in params.validated_data:
+            qs = qs.filter(tracker_id=params.validated_data['tracker'])
+
+        return qs
+
+    @action(detail=False, methods=['get'], url_path='readings')
+    def readings(self, request):
+        """
+        GET /api/trackerevents/readings/?start={iso}&end={iso}[&tracker={id}]
+        list the typed sensor values of telemetry events in the window.
+        """
+        qs = self.get_reading_queryset(request).order_by('timestamp')
+
+        # Apply pagination if requested
+        page = self.paginate_queryset(qs)
+        if page is not None:
+            serializer = TelemetryReadingSerializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        serializer = TelemetryReadingSerializer(qs, many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'], url_path='readings/summary')
+    def readings_summary(self, request):
+        """
+        GET /api/trackerevents/readings/summary/?start={iso}&end={iso}[&tracker={id}]
+        count, and min, max and mean of each sensor value, over the window.
+        """
+        aggregates = {}
+
+        for field in TelemetryReading.VALUE_FIELDS:
+            aggregates[f'{field}_min'] = Min(field)
+            aggregates[f'{field}_max'] = Max(field)
+            aggregates[f'{field}_avg'] = Avg(field)
+
+        summary = self.get_reading_queryset(request).aggregate(count=Count('pk'), **aggregates)
+
+        return Response(summary, status=status.HTTP_200_OK)
+
 class ProductEventViewSet(viewsets.ModelViewSet):
     queryset = ProductEvent.objects.select_related('product', 'trackerevent', 'recorded_by')
     serializer_class = ProductEventSerializer
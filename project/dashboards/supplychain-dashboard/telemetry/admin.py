@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from telemetry.models import GatewayEventRaw
+from telemetry.models import GatewayEventRaw, IngestTask
 @admin.register(GatewayEventRaw)
 class GatewayEventRaw(admin.ModelAdmin):
     list_display = ('message_id', 'gateway_id', 'message_type')
@@ -8,3 +8,8 @@ class GatewayEventRaw(admin.ModelAdmin):
     search_fields = ('gateway_id',)
 
 
+@admin.register(IngestTask)
+class IngestTaskAdmin(admin.ModelAdmin):
+    list_display = ('stage', 'object_id', 'status', 'attempts', 'available_timestamp', 'last_error')
+    list_filter = ('stage', 'status')
+    search_fields = ('object_id',)
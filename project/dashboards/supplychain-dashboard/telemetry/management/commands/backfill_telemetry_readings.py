@@ -0,0 +1,61 @@
+"""
+Django management command to write TelemetryReadings for telemetry
+TrackerEvents ingested before the table existed.
+
+Usage:
+    python manage.py backfill_telemetry_readings
+    python manage.py backfill_telemetry_readings --chunk 5000
+
+Events are read in primary key order, a chunk at a time, and the readings
+of each chunk inserted with one query. Events whose payload does not
+validate are reported and skipped. Running it again only fills the gaps.
+"""
+from django.core.management.base import BaseCommand
+
+from supplychain.models import TelemetryReading, TrackerEvent
+from telemetry.scripts.ingest.tracker_ingest import build_telemetry_reading
+from telemetry.types import TelemetryPayload, compile_validator
+
+class Command(BaseCommand):
+    help = 'Write TelemetryReadings for telemetry TrackerEvents that have none'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk',
+            type=int,
+            default=2000,
+            help='Events read per query'
+        )
+
+    def handle(self, *args, **options):
+        validate = compile_validator(TelemetryPayload)
+
+        events = TrackerEvent.objects.filter(
+            event_type=TrackerEvent.EVENT_TYPE_TELEMETRY,
+            reading__isnull=True,
+        ).order_by('pk').only('message_id', 'tracker_id', 'timestamp', 'payload')
+
+        written = skipped = 0
+        last_pk = None
+
+        while True:
+            chunk = events.filter(pk__gt=last_pk) if last_pk is not None else events
+            chunk = list(chunk[:options['chunk']])
+
+            if not chunk:
+                break
+
+            last_pk = chunk[-1].pk
+            readings = []
+
+            for tracker_event in chunk:
+                try:
+                    readings.append(build_telemetry_reading(tracker_event, validate(tracker_event.payload)))
+                except ValueError as e:
+                    skipped += 1
+                    self.stderr.write(f"TrackerEvent {tracker_event.pk}: {e}")
+
+            TelemetryReading.objects.bulk_create(readings, ignore_conflicts=True)
+            written += len(readings)
+
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} telemetry readings, skipped {skipped} events'))
@@ -0,0 +1,63 @@
+"""
+Django management command to run ingest pipeline workers.
+
+Usage:
+    python manage.py ingest_worker
+    python manage.py ingest_worker --stage anchor --batch 20
+
+Each process serves the stages it is given (all by default); run more
+processes for a stage to scale it. Any number of workers can share the
+queue, including on different hosts.
+"""
+from django.core.management.base import BaseCommand
+
+from telemetry.models import IngestTask
+from telemetry.scripts.ingest import task_queue
+from telemetry.scripts.ingest.stages import REMOTE_CALLS, STAGES
+
+class Command(BaseCommand):
+    help = 'Claim and run queued ingest tasks (tracker events, anchoring, product events, notifications)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--stage',
+            action='append',
+            choices=[stage for stage, _ in IngestTask.STAGE_CHOICES],
+            help='Stage to serve; repeat for several. Defaults to every stage.'
+        )
+        parser.add_argument(
+            '--batch',
+            type=int,
+            default=task_queue.DEFAULT_BATCH_SIZE,
+            help='Tasks claimed per query'
+        )
+        parser.add_argument(
+            '--poll',
+            type=float,
+            default=task_queue.DEFAULT_POLL_S,
+            help='Seconds to wait when no task is due'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit when no task is due instead of polling'
+        )
+
+    def handle(self, *args, **options):
+        stages = options['stage'] or list(STAGES)
+
+        self.stdout.write(f"Serving ingest stages: {', '.join(stages)}")
+
+        try:
+            done = task_queue.run_worker(
+                stages,
+                STAGES,
+                REMOTE_CALLS,
+                batch_size=options['batch'],
+                poll=options['poll'],
+                once=options['once'],
+            )
+        except KeyboardInterrupt:
+            return
+
+        self.stdout.write(self.style.SUCCESS(f'Ran {done} ingest tasks'))
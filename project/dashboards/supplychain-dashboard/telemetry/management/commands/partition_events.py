@@ -0,0 +1,92 @@
+"""
+Django management command to maintain the monthly partitions of the
+TrackerEvent, TelemetryReading and GatewayEventRaw tables (PostgreSQL only).
+
+Usage:
+    python manage.py partition_events --convert
+    python manage.py partition_events --ahead 3 --retain 24
+    python manage.py partition_events --retain 24 --detach-only --dry-run
+
+--convert partitions tables that are not partitioned yet; run it once,
+after migrate, in a quiet period. After that, run the command daily (or
+at least monthly) so next month's partition exists before readings for
+it arrive; any that arrive first land in the default partition and move
+when their month is created. See telemetry/scripts/partitions.py.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from telemetry.scripts import partitions
+
+class Command(BaseCommand):
+    help = 'Create upcoming monthly partitions of the event tables and detach or drop expired ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--convert',
+            action='store_true',
+            help='Convert event tables that are not partitioned yet'
+        )
+        parser.add_argument(
+            '--ahead',
+            type=int,
+            default=partitions.DEFAULT_MONTHS_AHEAD,
+            help='Months of partitions to keep ready after the current one'
+        )
+        parser.add_argument(
+            '--retain',
+            type=int,
+            help='Remove partitions that ended more than this many months ago. Default: keep all'
+        )
+        parser.add_argument(
+            '--detach-only',
+            action='store_true',
+            help='Detach expired partitions, leaving them as plain tables, instead of dropping them'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Print the SQL instead of running it'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError("Partitioning needs PostgreSQL.")
+
+        if options['retain'] is not None and options['retain'] < 1:
+            raise CommandError("--retain must be at least 1 month.")
+
+        now = timezone.now()
+
+        for model in partitions.PARTITIONED_MODELS:
+            table = model._meta.db_table
+
+            if partitions.is_partitioned(table):
+                statements = partitions.ensure_partitions_sql(table, now, options['ahead'])
+            elif options['convert']:
+                statements = partitions.convert_sql(table, now, options['ahead'])
+            else:
+                raise CommandError(f"{table} is not partitioned. Run with --convert first.")
+
+            if options['retain'] is not None and partitions.is_partitioned(table):
+                statements += partitions.expire_partitions_sql(table, now, options['retain'], drop=not options['detach_only'])
+
+            self.run(table, statements, options['dry_run'])
+
+    def run(self, table, statements, dry_run):
+        if not statements:
+            self.stdout.write(f"{table}: up to date")
+            return
+
+        if dry_run:
+            self.stdout.write(f"-- {table}")
+            for statement in statements:
+                self.stdout.write(f"{statement};")
+            return
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+
+        self.stdout.write(self.style.SUCCESS(f"{table}: ran {len(statements)} statements"))
@@ -1,5 +1,6 @@
 from supplychain.models import Gateway
 from django.db import models
+from django.utils import timezone
 
 class GatewayEventRaw(models.Model):
     """
@@ -19,7 +20,8 @@ class GatewayEventRaw(models.Model):
     ]
 
     message_id = models.UUIDField(
-        help_text="Unique event identifier."
+        unique=True,
+        help_text="Unique event identifier; redeliveries are ignored."
     )
 
     gateway_key = models.CharField(
@@ -74,4 +76,85 @@ class GatewayEventRaw(models.Model):
         return f"{self.message_type} @ {self.timestamp.isoformat()} for {self.gateway_id}"
 
 
+class IngestTask(models.Model):
+    """
+        A unit of work for one stage of the ingest pipeline, queued in the database
+        and run by the ingest_worker management command.
+    """
+    STAGE_TRACKER_EVENTS = "tracker_events"
+    STAGE_ANCHOR = "anchor"
+    STAGE_PRODUCT_EVENTS = "product_events"
+    STAGE_NOTIFICATIONS = "notifications"
+
+    STAGE_CHOICES = [
+        (STAGE_TRACKER_EVENTS, "GatewayEventRaw to TrackerEvents"),
+        (STAGE_ANCHOR, "Anchor TrackerEvent on IOTA"),
+        (STAGE_PRODUCT_EVENTS, "TrackerEvent to ProductEvents"),
+        (STAGE_NOTIFICATIONS, "ProductEvent requirement notifications"),
+    ]
+
+    STATUS_PENDING = "pending"
+    STATUS_RUNNING = "running"
+    STATUS_FAILED = "failed"
+
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pending"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    stage = models.CharField(
+        max_length=20,
+        choices=STAGE_CHOICES,
+        help_text="Stage that processes this task."
+    )
+
+    object_id = models.CharField(
+        max_length=64,
+        help_text="Primary key (message_id for gateway events) of the record the stage works on."
+    )
+
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDING,
+        help_text="Pending until a worker claims it; failed once out of attempts."
+    )
+
+    attempts = models.PositiveIntegerField(
+        default=0,
+        help_text="Times a worker has claimed this task."
+    )
+
+    available_timestamp = models.DateTimeField(
+        default=timezone.now,
+        help_text="Earliest time a worker may claim this task."
+    )
 
+    locked_timestamp = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="When a worker claimed this task."
+    )
+
+    last_error = models.TextField(
+        blank=True,
+        default="",
+        help_text="Error from the last failed attempt."
+    )
+
+    created_timestamp = models.DateTimeField(
+        auto_now_add=True,
+        help_text="When this task was queued."
+    )
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['stage', 'status', 'available_timestamp']),
+        ]
+        verbose_name = "Ingest Task"
+        verbose_name_plural = "Ingest Tasks"
+
+    def __str__(self):
+        return f"{self.stage} {self.object_id} ({self.status})"
@@ -0,0 +1,286 @@
+import codecs
+import itertools
+import json
+import re
+import zlib
+
+import msgpack
+
+from typing import Any, Iterable, Iterator
+
+from rest_framework import status
+from rest_framework.exceptions import ParseError, UnsupportedMediaType
+from rest_framework.parsers import BaseParser, JSONParser
+
+CONTENT_TYPE_JSON = "application/json"
+CONTENT_TYPE_MSGPACK = "application/msgpack"
+CONTENT_TYPE_NDJSON = "application/x-ndjson"
+CONTENT_ENCODING_DEFLATE = "deflate"
+
+# charset labels the IoT Hub client puts in content_encoding
+IDENTITY_ENCODINGS = {"", "identity", "utf-8", "utf8"}
+
+# bulk bodies are read this much at a time
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# largest single envelope in a bulk body; a longer unparsable run is an
+# error rather than something to keep buffering
+MAX_ELEMENT_BYTES = 1024 * 1024
+
+# most a deflate body may inflate to, for one message and for a whole bulk
+# request; a few KB of deflate can otherwise expand to gigabytes
+MAX_INFLATED_BYTES = 16 * 1024 * 1024
+MAX_BULK_INFLATED_BYTES = 512 * 1024 * 1024
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+class BodyTooLarge(ParseError):
+    """
+    A compressed body that inflates past its limit.
+    """
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = "Request body too large."
+    default_code = "body_too_large"
+
+
+def read_body(stream, parser_context, limit: int = MAX_INFLATED_BYTES) -> bytes:
+    """
+    Read the request body, inflating it if the gateway compressed it.
+
+    Raises:
+        BodyTooLarge: If the body inflates to more than limit bytes.
+    """
+    body = stream.read() if stream is not None else b""
+
+    request = (parser_context or {}).get("request")
+    encoding = request.META.get("HTTP_CONTENT_ENCODING", "").strip().lower() if request else ""
+
+    if encoding == CONTENT_ENCODING_DEFLATE:
+        inflater = zlib.decompressobj()
+        try:
+            # one byte over the limit is enough to know the body is too large
+            body = inflater.decompress(body, limit + 1)
+        except zlib.error as e:
+            raise ParseError(f"Invalid deflate body - {e}")
+
+        if len(body) > limit:
+            raise BodyTooLarge(f"Body inflates to more than {limit} bytes")
+        if not inflater.eof:
+            raise ParseError("Invalid deflate body - incomplete or truncated stream")
+
+        return body
+
+    if encoding not in IDENTITY_ENCODINGS:
+        raise UnsupportedMediaType(f"Content-Encoding {encoding}")
+
+    return body
+
+
+class TelemetryJSONParser(JSONParser):
+    """
+    JSON telemetry, optionally deflate-compressed.
+    """
+    def parse(self, stream, media_type=None, parser_context=None):
+        body = read_body(stream, parser_context)
+
+        try:
+            return json.loads(body)
+        except ValueError as e:
+            raise ParseError(f"JSON parse error - {e}")
+
+
+class MessagePackParser(BaseParser):
+    """
+    MessagePack telemetry, optionally deflate-compressed.
+    """
+    media_type = CONTENT_TYPE_MSGPACK
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        body = read_body(stream, parser_context)
+
+        try:
+            return msgpack.unpackb(body)
+        except (msgpack.UnpackException, ValueError) as e:
+            raise ParseError(f"MessagePack parse error - {e}")
+
+
+def read_chunks(
+        stream,
+        encoding: str,
+        chunk_size: int = STREAM_CHUNK_SIZE,
+        limit: int = MAX_BULK_INFLATED_BYTES,
+    ) -> Iterator[bytes]:
+    """
+    Read a request body piece by piece, inflating it as it arrives if the
+    gateway compressed it. Inflated pieces are at most chunk_size bytes.
+
+    Raises:
+        BodyTooLarge: If the body inflates to more than limit bytes.
+    """
+    encoding = (encoding or "").strip().lower()
+
+    if encoding == CONTENT_ENCODING_DEFLATE:
+        inflater = zlib.decompressobj()
+    elif encoding in IDENTITY_ENCODINGS:
+        inflater = None
+    else:
+        raise UnsupportedMediaType(f"Content-Encoding {encoding}")
+
+    inflated = 0
+
+    while stream is not None:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+
+        if not inflater:
+            yield chunk
+            continue
+
+        while chunk:
+            try:
+                piece = inflater.decompress(chunk, chunk_size)
+            except zlib.error as e:
+                raise ParseError(f"Invalid deflate body - {e}")
+            chunk = inflater.unconsumed_tail
+
+            inflated += len(piece)
+            if inflated > limit:
+                raise BodyTooLarge(f"Body inflates to more than {limit} bytes")
+            if piece:
+                yield piece
+
+    if inflater:
+        tail = inflater.flush()
+        if inflated + len(tail) > limit:
+            raise BodyTooLarge(f"Body inflates to more than {limit} bytes")
+        if tail:
+            yield tail
+
+
+def iter_ndjson(chunks: Iterable[bytes], max_element: int = MAX_ELEMENT_BYTES) -> Iterator[Any]:
+    """
+    Decode newline-delimited JSON one line at a time.
+
+    A line that is not valid JSON is yielded as its ValueError, so the
+    caller can reject that message and carry on with the next.
+    """
+    buf = b""
+
+    for chunk in itertools.chain(chunks, [b"\n"]):
+        buf += chunk
+        lines = buf.split(b"\n")
+        buf = lines.pop()
+
+        if len(buf) > max_element:
+            raise ParseError(f"NDJSON line longer than {max_element} bytes")
+
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                yield e
+
+
+def iter_json_array(chunks: Iterable[bytes], max_element: int = MAX_ELEMENT_BYTES) -> Iterator[Any]:
+    """
+    Decode the elements of a top-level JSON array as they arrive, holding
+    no more than about one element and one chunk of the body at a time.
+    """
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder("utf-8")()
+    buf = ""
+    pos = 0
+    state = "start"    # start, first, value, separator, done
+
+    for chunk in itertools.chain(chunks, [None]):
+        eof = chunk is None
+        try:
+            buf = buf[pos:] + text.decode(chunk or b"", final=eof)
+        except UnicodeDecodeError as e:
+            raise ParseError(f"JSON parse error - {e}")
+        pos = 0
+
+        while True:
+            pos = _WHITESPACE.match(buf, pos).end()
+            if pos == len(buf):
+                break
+
+            char = buf[pos]
+
+            if state == "done":
+                raise ParseError("JSON parse error - data after the closing ']'")
+            if state == "start":
+                if char != "[":
+                    raise ParseError("Bulk JSON body must be an array")
+                pos += 1
+                state = "first"
+                continue
+            if char == "]" and state in ("first", "separator"):
+                pos += 1
+                state = "done"
+                continue
+            if state == "separator":
+                if char != ",":
+                    raise ParseError(f"JSON parse error - expected ',' or ']', got {char!r}")
+                pos += 1
+                state = "value"
+                continue
+
+            try:
+                value, end = decoder.raw_decode(buf, pos)
+            except ValueError as e:
+                # usually an element split across chunks
+                if eof:
+                    raise ParseError(f"JSON parse error - {e}")
+                if len(buf) - pos > max_element:
+                    raise ParseError(f"JSON array element longer than {max_element} bytes")
+                break
+
+            if end == len(buf) and not eof:
+                # a bare number may continue in the next chunk
+                break
+
+            pos = end
+            state = "separator"
+            yield value
+
+    if state != "done":
+        raise ParseError("JSON parse error - unterminated array")
+
+
+def iter_msgpack(chunks: Iterable[bytes], max_element: int = MAX_ELEMENT_BYTES) -> Iterator[Any]:
+    """
+    Decode a stream of concatenated MessagePack envelopes.
+    """
+    unpacker = msgpack.Unpacker(max_buffer_size=max_element + STREAM_CHUNK_SIZE)
+
+    try:
+        for chunk in chunks:
+            unpacker.feed(chunk)
+            yield from unpacker
+    except (msgpack.UnpackException, ValueError) as e:
+        raise ParseError(f"MessagePack parse error - {e}")
+
+
+def iter_envelopes(request, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[Any]:
+    """
+    Decode the envelopes of a bulk request incrementally: a JSON array,
+    NDJSON or concatenated MessagePack, optionally deflate-compressed.
+    """
+    media_type = (request.content_type or "").split(";", 1)[0].strip().lower()
+    encoding = request.META.get("HTTP_CONTENT_ENCODING", "")
+
+    if media_type == CONTENT_TYPE_NDJSON:
+        decode = iter_ndjson
+    elif media_type == CONTENT_TYPE_JSON:
+        decode = iter_json_array
+    elif media_type == CONTENT_TYPE_MSGPACK:
+        decode = iter_msgpack
+    else:
+        raise UnsupportedMediaType(media_type)
+
+    return decode(read_chunks(request.stream, encoding, chunk_size))
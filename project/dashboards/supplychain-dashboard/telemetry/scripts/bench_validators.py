@@ -0,0 +1,141 @@
+"""
+Benchmark telemetry payload validation.
+
+Compares matches_typed_dict (top-level keys only), a reference checker
+that walks the type hints on every call, and compile_validator(), after
+checking the last two agree on a set of valid and broken payloads.
+
+Example
+
+python -m telemetry.scripts.bench_validators --payloads 200000
+"""
+
+import argparse
+import copy
+import time
+
+from typing import Any, List, Union, get_args, get_origin, get_type_hints
+
+from telemetry.types import GatewayData, TelemetryPayload, compile_validator, matches_typed_dict
+
+from typing_extensions import is_typeddict
+
+import types
+
+SAMPLE_PAYLOAD = {
+    "deviceId": "tracker-0001",
+    "timestamp": "2025-05-29T13:27:32",
+    "uptime": "61",
+    "location": {"latitude": "27.5001869", "ns": "S", "longitude": "153.0141296", "ew": "E", "altitude_m": "31.0"},
+    "environment": {"temperature_c": "25.55", "humidity_percent": "58.50", "pressure_hpa": "102.1", "gas_ppm": "14.00"},
+    "acceleration": {"x_mps2": "0.038", "y_mps2": "-0.268", "z_mps2": "-9.690"},
+}
+
+SAMPLE_ENVELOPE = {
+    "header": {
+        "messageId": "5f0c6c1e-8d8a-4f0e-9a57-3c1f7f1f4c2a",
+        "gatewayId": "gateway-0001",
+        "schemaVersion": "1.0",
+        "messageType": "telemetry",
+    },
+    "payload": SAMPLE_PAYLOAD,
+    "signature": {"alg": "ES256", "keyId": "tracker-0001", "value": "00"},
+}
+
+def broken(path: List[str], value: Any) -> dict:
+    """SAMPLE_PAYLOAD with the field at `path` replaced, or removed if value is ..."""
+    payload = copy.deepcopy(SAMPLE_PAYLOAD)
+    target = payload
+    for key in path[:-1]:
+        target = target[key]
+    if value is ...:
+        del target[path[-1]]
+    else:
+        target[path[-1]] = value
+    return payload
+
+EDGE_CASES = [
+    ("sample", SAMPLE_PAYLOAD),
+    ("extra messageId", dict(SAMPLE_PAYLOAD, messageId="5f0c6c1e-8d8a-4f0e-9a57-3c1f7f1f4c2a")),
+    ("latitude float", broken(["location", "latitude"], 27.5)),
+    ("latitude 'north'", broken(["location", "latitude"], "north")),
+    ("latitude null", broken(["location", "latitude"], None)),
+    ("no gas_ppm", broken(["environment", "gas_ppm"], ...)),
+    ("acceleration string", broken(["acceleration"], "0,0,0")),
+    ("uptime int", broken(["uptime"], 61)),
+    ("no deviceId", broken(["deviceId"], ...)),
+    ("not an object", "not an object"),
+]
+
+def reference_validate(value: Any, tp: Any) -> Any:
+    """compile_validator's checks, resolving the type hints on every call."""
+    if is_typeddict(tp):
+        if not isinstance(value, dict):
+            raise ValueError(tp.__name__)
+        result = dict(value)
+        for key, hint in get_type_hints(tp).items():
+            if key in value:
+                result[key] = reference_validate(value[key], hint)
+            elif key in tp.__required_keys__:
+                raise ValueError(key)
+        return result
+
+    if get_origin(tp) in (list, List):
+        if not isinstance(value, list):
+            raise ValueError(tp)
+        return [reference_validate(item, get_args(tp)[0]) for item in value]
+
+    if get_origin(tp) in (Union, types.UnionType):
+        for arg in get_args(tp):
+            try:
+                return reference_validate(value, arg)
+            except ValueError:
+                pass
+        raise ValueError(tp)
+
+    if tp in (float, int) and type(value) in (float, int, str):
+        return tp(value)
+
+    if not isinstance(value, tp) or isinstance(value, bool):
+        raise ValueError(tp)
+
+    return value
+
+def outcome(fn, payload):
+    """Result of fn(payload), with any validation error reduced to its type."""
+    try:
+        return fn(payload)
+    except ValueError:
+        return ValueError
+
+def run(name: str, fn, data, payloads: int) -> None:
+    """Time fn over `payloads` calls on data and print validations/s."""
+    start = time.perf_counter()
+    for _ in range(payloads):
+        fn(data)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<36} {elapsed:8.3f}s {payloads / elapsed:12.0f} validations/s")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark telemetry payload validation")
+    parser.add_argument("--payloads", type=int, default=200000, help="Validations per run")
+    args = parser.parse_args()
+
+    validate_telemetry = compile_validator(TelemetryPayload)
+    validate_envelope = compile_validator(GatewayData)
+
+    for label, payload in EDGE_CASES:
+        old = outcome(lambda p: reference_validate(p, TelemetryPayload), payload)
+        new = outcome(validate_telemetry, payload)
+        status = "ok" if old == new else "DIFFERS"
+        print(f"{status:<8} {'valid' if new is not ValueError else 'invalid':<8} {label}")
+
+    top_level = lambda p: isinstance(p, dict) and matches_typed_dict(p, TelemetryPayload)
+
+    run("matches_typed_dict (keys only)", top_level, SAMPLE_PAYLOAD, args.payloads)
+    run("reference (hints per call)", lambda p: reference_validate(p, TelemetryPayload), SAMPLE_PAYLOAD, args.payloads)
+    run("compile_validator", validate_telemetry, SAMPLE_PAYLOAD, args.payloads)
+    run("compile_validator (GatewayData)", validate_envelope, SAMPLE_ENVELOPE, args.payloads)
+
+if __name__ == "__main__":
+    main()
@@ -1,35 +1,82 @@
-from telemetry.models import GatewayEventRaw
-from telemetry.types import GatewayData, Header, Signature, TelemetryPayload, BatchTelemetryPayload, EventPayload, HeartbeatPayload, matches_typed_dict
+from django.db import transaction
 
-from supplychain.models import Gateway
+from telemetry.models import GatewayEventRaw, IngestTask
+from telemetry.types import GatewayData, Header, Signature, TelemetryPayload, BatchTelemetryPayload, EventPayload, HeartbeatPayload, compile_validator
+
+from telemetry.scripts.ingest.idempotent import bulk_insert_once, insert_once
+from telemetry.scripts.ingest.key_cache import GATEWAYS, CachedKey
+from telemetry.scripts.ingest.task_queue import enqueue
 
 from datetime import datetime
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+import logging
+import uuid
+
+logger = logging.getLogger(__name__)
+
+STATUS_CREATED = "created"
+STATUS_DUPLICATE = "duplicate"
+STATUS_REJECTED = "rejected"
 
-def gateway_raw_data_ingest(data: GatewayData) -> GatewayEventRaw:
+# envelopes validated and inserted per bulk_create
+BULK_BATCH_SIZE = 500
+
+REQUIRED_FIELDS = ['header', 'payload', 'signature']
+
+# message types that carry tracker readings
+TRACKER_MESSAGE_TYPES = [
+    GatewayEventRaw.MESSAGE_TYPE_TELEMETRY,
+    GatewayEventRaw.MESSAGE_TYPE_BATCH_TELEMETRY,
+]
+
+def validate_gateway_data(data: GatewayData, gateways: Mapping[str, CachedKey]) -> GatewayEventRaw:
     """
-    Ingests raw gateway data into the GatewayEventRaw model.
+    Validates raw gateway data and builds its GatewayEventRaw, without saving it.
 
     Args:
-        data (dict): The raw data to be ingested, expected to contain
-                     'message_id', 'gateway_id', 'message_type', 'payload', and 'timestamp'.
+        data (dict): The envelope, with 'header', 'payload' and 'signature'.
+        gateways (Mapping[str, CachedKey]): Known gateways by gateway_key; at
+                     least the one named in the header, if it exists.
 
     Returns:
-        GatewayEventRaw: The created GatewayEventRaw instance.
+        GatewayEventRaw: The unsaved GatewayEventRaw instance.
+
+    Raises:
+        ValueError: If the envelope is invalid.
     """
+    # 0. Validate envelope
+    if not isinstance(data, dict):
+        raise ValueError("Invalid data format")
+
+    for field in REQUIRED_FIELDS:
+        if field not in data:
+            raise ValueError(f"Missing required field: {field}")
+
     # 1. Validate header fields
-    if not matches_typed_dict(data['header'], Header):
-        raise ValueError("Invalid header format. Must match Header TypedDict.")
+    try:
+        compile_validator(Header)(data['header'])
+    except ValueError as e:
+        raise ValueError(f"Invalid header format. {e}")
 
     header = data['header']
 
+    try:
+        message_id = uuid.UUID(str(header['messageId']))
+    except ValueError:
+        raise ValueError(f"Invalid messageId: {header['messageId']}. Must be a UUID.")
+
     # 2. Validate signature fields
-    if not matches_typed_dict(data['signature'], Signature):
-        raise ValueError("Invalid signature format. Must match Signature TypedDict.")
+    try:
+        compile_validator(Signature)(data['signature'])
+    except ValueError as e:
+        raise ValueError(f"Invalid signature format. {e}")
 
     signature = data['signature']
 
     # 3. Validate gateway_id is in database
-    gateway = Gateway.objects.filter(gateway_key=header['gatewayId']).first()
+    gateway = gateways.get(header['gatewayId'])
 
     if not gateway:
         raise ValueError(f"Gateway with ID {header['gatewayId']} does not exist.")
@@ -47,12 +94,16 @@ def gateway_raw_data_ingest(data: GatewayData) -> GatewayEventRaw:
 
     # 5. Validate payload structure based on message type
     # Telemetry and Batch Telemetry are not handled here, as they are not part of the GatewayEventRaw model.
-    if header['messageType'] == GatewayEventRaw.MESSAGE_TYPE_EVENT:
-        if not matches_typed_dict(data['payload'], EventPayload):
-            raise ValueError("Invalid payload format for event message type.")
-    elif header['messageType'] == GatewayEventRaw.MESSAGE_TYPE_HEARTBEAT:
-        if not matches_typed_dict(data['payload'], HeartbeatPayload):
-            raise ValueError("Invalid payload format for heartbeat message type.")
+    if not isinstance(data['payload'], dict):
+        raise ValueError("Invalid payload format. Must be an object.")
+
+    try:
+        if header['messageType'] == GatewayEventRaw.MESSAGE_TYPE_EVENT:
+            compile_validator(EventPayload)(data['payload'])
+        elif header['messageType'] == GatewayEventRaw.MESSAGE_TYPE_HEARTBEAT:
+            compile_validator(HeartbeatPayload)(data['payload'])
+    except ValueError as e:
+        raise ValueError(f"Invalid payload format for {header['messageType']} message type. {e}")
 
     payload = data['payload']
 
@@ -72,15 +123,117 @@ def gateway_raw_data_ingest(data: GatewayData) -> GatewayEventRaw:
     except ValueError:
         raise ValueError("Invalid timestamp format. Must be an ISO 8601 string.")
 
-    # 7. Create a new GatewayEventRaw instance
-    event, _ = GatewayEventRaw.objects.get_or_create(
-        message_id=header['messageId'],
+    return GatewayEventRaw(
+        message_id=message_id,
         gateway_key=header['gatewayId'],
         message_type=header['messageType'],
-        gateway=gateway,
+        gateway_id=gateway.id,
         payload=payload,
         timestamp=timestamp,
         signature=signature,
     )
 
-    return event
+def gateway_key_of(data: Any) -> Optional[str]:
+    """
+    The gatewayId an envelope claims, if it has one.
+    """
+    header = data.get('header') if isinstance(data, dict) else None
+    gateway_key = header.get('gatewayId') if isinstance(header, dict) else None
+    return gateway_key if isinstance(gateway_key, str) else None
+
+def queue_tracker_ingest(events: Iterable[GatewayEventRaw]) -> None:
+    """
+    Queues the tracker readings of newly stored gateway events for the
+    tracker_events stage.
+    """
+    enqueue(IngestTask.STAGE_TRACKER_EVENTS, [
+        event.message_id for event in events if event.message_type in TRACKER_MESSAGE_TYPES
+    ])
+
+def gateway_raw_data_ingest(data: GatewayData) -> Tuple[GatewayEventRaw, bool]:
+    """
+    Ingests raw gateway data into the GatewayEventRaw model.
+
+    Args:
+        data (dict): The raw data to be ingested, expected to contain
+                     'message_id', 'gateway_id', 'message_type', 'payload', and 'timestamp'.
+
+    Returns:
+        Tuple[GatewayEventRaw, bool]: The GatewayEventRaw instance, and False if
+                     a message with its messageId was already stored.
+    """
+    gateways = GATEWAYS.get_many([gateway_key_of(data)])
+
+    event = validate_gateway_data(data, gateways)
+
+    # 7. Create a new GatewayEventRaw instance, unless it is a redelivery
+    created = insert_once(event)
+
+    if not created:
+        logger.info(f"Message {event.message_id} already ingested")
+
+    return event, created
+
+def gateway_raw_data_ingest_bulk(messages: Iterable[Any], batch_size: int = BULK_BATCH_SIZE) -> Iterator[Dict[str, Any]]:
+    """
+    Ingests many gateway envelopes, batch_size at a time: at most one query
+    for their uncached gateways and one INSERT ... ON CONFLICT DO NOTHING
+    RETURNING the message ids it stored.
+
+    Args:
+        messages (Iterable): Decoded envelopes, e.g. from a streamed request
+                     body. A ValueError in their place (a message that could
+                     not be decoded) is reported as rejected.
+        batch_size (int): Envelopes per batch.
+
+    Returns:
+        Iterator[dict]: One result per message, in order, with its 'index',
+                     'messageId', 'status' (created, duplicate or rejected)
+                     and, when rejected, the 'error'.
+    """
+    messages = enumerate(messages)
+
+    while True:
+        batch = list(islice(messages, batch_size))
+        if not batch:
+            return
+
+        yield from _ingest_batch(batch)
+
+def _ingest_batch(batch: List[Tuple[int, Any]]) -> List[Dict[str, Any]]:
+    """
+    Validates and stores one batch of envelopes; see gateway_raw_data_ingest_bulk.
+    """
+    gateways = GATEWAYS.get_many(gateway_key_of(data) for _, data in batch)
+
+    results = {}
+    events = []
+
+    for index, data in batch:
+        try:
+            if isinstance(data, ValueError):
+                raise ValueError(f"Invalid message - {data}")
+            event = validate_gateway_data(data, gateways)
+        except ValueError as e:
+            header = data.get('header') if isinstance(data, dict) else None
+            message_id = header.get('messageId') if isinstance(header, dict) else None
+            results[index] = {"index": index, "messageId": message_id, "status": STATUS_REJECTED, "error": str(e)}
+            continue
+
+        events.append((index, event))
+
+    # a message already stored, or repeated within the batch, is a duplicate;
+    # no post_save is sent, so queue the next stage here
+    with transaction.atomic():
+        created = bulk_insert_once(GatewayEventRaw, [event for _, event in events])
+        queue_tracker_ingest(created)
+
+    created = {id(event) for event in created}
+
+    for index, event in events:
+        status = STATUS_CREATED if id(event) in created else STATUS_DUPLICATE
+        results[index] = {"index": index, "messageId": str(event.message_id), "status": status}
+
+    logger.info(f"Bulk ingested {len(created)} of {len(batch)} gateway messages")
+
+    return [results[index] for index, _ in batch]
@@ -0,0 +1,92 @@
+"""
+    Insert-once helpers for records keyed on a unique message_id.
+
+    Gateways and IoT Hub redeliver messages, so ingest inserts and treats a
+    conflict on message_id as a duplicate, instead of get_or_create's SELECT
+    comparing every field (JSON included) followed by an INSERT.
+"""
+
+from django.db import IntegrityError, connection, models, transaction
+
+from typing import List
+
+def insert_once(instance: models.Model) -> bool:
+    """
+    INSERT one row in a savepoint; post_save is sent as usual.
+
+    Returns:
+        bool: False if a row with the same message_id already exists.
+    """
+    try:
+        with transaction.atomic():
+            instance.save(force_insert=True)
+    except IntegrityError:
+        # only a message_id conflict is a duplicate; re-raise anything else
+        if not type(instance).objects.filter(message_id=instance.message_id).exists():
+            raise
+        return False
+
+    return True
+
+def bulk_insert_once(model: type[models.Model], instances: List[models.Model]) -> List[models.Model]:
+    """
+    INSERT ... ON CONFLICT DO NOTHING RETURNING message_id for a batch, so
+    the database alone decides which rows are new. No post_save is sent.
+
+    The conflict has no target: message_id is the only unique key, and on a
+    partitioned table (see telemetry.scripts.partitions) it is
+    (message_id, timestamp), which a target would have to spell out.
+
+    Returns:
+        List[models.Model]: The instances this statement inserted. One whose
+        message_id is already stored, is inserted concurrently or repeats
+        an earlier instance of the batch is left out.
+    """
+    if not instances:
+        return []
+
+    opts = model._meta
+    message_id = opts.get_field('message_id')
+    qn = connection.ops.quote_name
+
+    # an auto-incremented primary key is left to the database and read back
+    fields = [field for field in opts.concrete_fields if field is not opts.auto_field]
+    returning = [message_id] + ([opts.auto_field] if opts.auto_field else [])
+
+    columns = ', '.join(qn(field.column) for field in fields)
+    row = '(' + ', '.join(['%s'] * len(fields)) + ')'
+    batch_size = max(connection.ops.bulk_batch_size(fields, instances), 1)
+
+    # message_id -> generated primary key, if any
+    inserted = {}
+
+    with connection.cursor() as cursor:
+        for start in range(0, len(instances), batch_size):
+            batch = instances[start:start + batch_size]
+            params = [
+                field.get_db_prep_save(field.pre_save(instance, True), connection)
+                for instance in batch for field in fields
+            ]
+            cursor.execute(
+                f"INSERT INTO {qn(model._meta.db_table)} ({columns}) "
+                f"VALUES {', '.join([row] * len(batch))} "
+                f"ON CONFLICT DO NOTHING RETURNING {', '.join(qn(field.column) for field in returning)}",
+                params,
+            )
+            for value, *pk in cursor.fetchall():
+                inserted[message_id.to_python(value)] = pk
+
+    created = []
+
+    # a message_id repeated in the batch was inserted from its first instance
+    for instance in instances:
+        key = message_id.to_python(instance.message_id)
+        if key in inserted:
+            pk = inserted.pop(key)
+            if pk:
+                setattr(instance, opts.auto_field.attname, pk[0])
+            instance._state.adding = False
+            instance._state.db = connection.alias
+            created.append(instance)
+
+    return created
@@ -0,0 +1,129 @@
+"""
+    Per-process cache of gateway and tracker keys to their ids and owners.
+
+    Ingest resolves the gatewayId of every message and the deviceId of every
+    reading. The set of gateways and trackers changes rarely, so each process
+    keeps a bounded LRU of key -> (id, owner_id), and remembers unknown keys
+    too, so a misconfigured device does not cost a query per message.
+
+    Saving or deleting a Gateway or Tracker invalidates its entries in the
+    process that made the change (see telemetry.signals). Other processes
+    only notice when an entry expires, so entries have a TTL, and unknown
+    keys a shorter one, to pick up newly registered devices quickly.
+"""
+
+from django.db import models
+
+from supplychain.models import Gateway, Tracker
+
+from collections import OrderedDict
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+import threading
+import time
+
+DEFAULT_MAX_ENTRIES = 10_000
+DEFAULT_TTL_S = 300.0
+DEFAULT_NEGATIVE_TTL_S = 30.0
+
+class CachedKey(NamedTuple):
+    id: int
+    owner_id: Optional[int]
+
+class KeyCache:
+    """
+    Bounded LRU mapping a model's unique key field to CachedKey, or to None
+    for keys that do not exist.
+    """
+
+    def __init__(
+            self,
+            model: type[models.Model],
+            key_field: str,
+            max_entries: int = DEFAULT_MAX_ENTRIES,
+            ttl: float = DEFAULT_TTL_S,
+            negative_ttl: float = DEFAULT_NEGATIVE_TTL_S,
+        ):
+        self.model = model
+        self.key_field = key_field
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+
+        self.hits = 0
+        self.misses = 0
+
+        self._entries: "OrderedDict[str, Tuple[Optional[CachedKey], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[CachedKey]:
+        """
+        The id and owner for a key, or None if no such record exists.
+        """
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, CachedKey]:
+        """
+        Resolve many keys, looking up every uncached key in one IN query.
+
+        Returns:
+            Dict[str, CachedKey]: Entries for the keys that exist.
+        """
+        now = time.monotonic()
+        found: Dict[str, CachedKey] = {}
+        missing = set()
+
+        with self._lock:
+            for key in keys:
+                if key is None or key in found:
+                    continue
+
+                cached = self._entries.get(key)
+                if cached is not None and cached[1] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    if cached[0] is not None:
+                        found[key] = cached[0]
+                else:
+                    missing.add(key)
+
+        if not missing:
+            return found
+
+        self.misses += len(missing)
+
+        rows = self.model.objects.filter(**{f"{self.key_field}__in": missing}).values_list(
+            self.key_field, 'pk', 'owner_id'
+        )
+        resolved = {key: CachedKey(pk, owner_id) for key, pk, owner_id in rows}
+        found.update(resolved)
+
+        with self._lock:
+            for key in missing:
+                entry = resolved.get(key)
+                self._entries[key] = (entry, now + (self.ttl if entry else self.negative_ttl))
+                self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        return found
+
+    def invalidate(self, key: Optional[str] = None, pk: Optional[int] = None) -> None:
+        """
+        Forget a key, and any key cached for record pk (its key may have
+        changed). With neither, clear the cache.
+        """
+        with self._lock:
+            if key is None and pk is None:
+                self._entries.clear()
+                return
+
+            self._entries.pop(key, None)
+
+            if pk is not None:
+                for stale in [k for k, (entry, _) in self._entries.items() if entry and entry.id == pk]:
+                    del self._entries[stale]
+
+GATEWAYS = KeyCache(Gateway, 'gateway_key')
+TRACKERS = KeyCache(Tracker, 'tracker_key')
@@ -0,0 +1,87 @@
+"""
+    Handlers for the ingest pipeline stages run by ingest_worker.
+
+    Each takes the primary key of the record its stage works on. Records
+    created here queue the next stage through post_save (TrackerEvent and
+    ProductEvent) or explicitly (anchoring), within the task's transaction.
+
+    Network round-trips go in REMOTE_CALLS instead, which run before the
+    transaction and hand their result to the stage's handler, so no task
+    row stays locked while waiting on a remote node.
+"""
+
+from supplychain.models import ProductEvent, TrackerEvent
+from supplychain.scripts.productevent_builder import create_productevent_from_trackerevent
+from notifications.scripts.productevent_notifications import create_notifications_from_productevent
+
+from telemetry.models import GatewayEventRaw, IngestTask
+from telemetry.scripts.ingest.tracker_ingest import (
+    tracker_raw_data_ingest_from_gatewayevent,
+    anchor_tracker_event,
+    save_tracker_event_anchor,
+)
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+def ingest_tracker_events(object_id: str) -> None:
+    """
+    GatewayEventRaw -> TrackerEvents, each queued for anchoring.
+    """
+    gatewayeventraw = GatewayEventRaw.objects.filter(message_id=object_id).first()
+
+    if not gatewayeventraw:
+        raise ValueError(f"GatewayEventRaw {object_id} does not exist.")
+
+    tracker_raw_data_ingest_from_gatewayevent(gatewayeventraw)
+
+def post_anchor(object_id: str) -> str:
+    """
+    Anchor a TrackerEvent's hash, checked at ingest, on IOTA (remote call).
+    """
+    tracker_event = TrackerEvent.objects.filter(pk=object_id).first()
+
+    if not tracker_event:
+        raise ValueError(f"TrackerEvent {object_id} does not exist.")
+
+    return anchor_tracker_event(tracker_event)
+
+def anchor(object_id: str, block_id: str) -> None:
+    """
+    Store the IOTA block id post_anchor got for a TrackerEvent.
+    """
+    save_tracker_event_anchor(object_id, block_id)
+
+def ingest_product_events(object_id: str) -> None:
+    """
+    TrackerEvent -> ProductEvents for the orders its tracker is assigned to.
+    """
+    tracker_event = TrackerEvent.objects.select_related('tracker').filter(pk=object_id).first()
+
+    if not tracker_event:
+        raise ValueError(f"TrackerEvent {object_id} does not exist.")
+
+    create_productevent_from_trackerevent(tracker_event)
+
+def notify(object_id: str) -> None:
+    """
+    ProductEvent -> notifications for the order requirements it touches.
+    """
+    productevent = ProductEvent.objects.select_related('product').filter(pk=object_id).first()
+
+    if not productevent:
+        raise ValueError(f"ProductEvent {object_id} does not exist.")
+
+    create_notifications_from_productevent(productevent)
+
+STAGES = {
+    IngestTask.STAGE_TRACKER_EVENTS: ingest_tracker_events,
+    IngestTask.STAGE_ANCHOR: anchor,
+    IngestTask.STAGE_PRODUCT_EVENTS: ingest_product_events,
+    IngestTask.STAGE_NOTIFICATIONS: notify,
+}
+
+REMOTE_CALLS = {
+    IngestTask.STAGE_ANCHOR: post_anchor,
+}
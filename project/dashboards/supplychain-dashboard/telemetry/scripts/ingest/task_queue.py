@@ -0,0 +1,184 @@
+"""
+    Durable, database-backed work queue for the ingest pipeline.
+
+    Each stage of ingest (GatewayEventRaw -> TrackerEvents -> IOTA anchor,
+    ProductEvents -> notifications) is an IngestTask row naming the stage
+    and the record to work on. Workers claim tasks with SELECT ... FOR UPDATE
+    SKIP LOCKED, so any number of them can serve the same stages, and run
+    each task in a transaction together with the tasks it queues for the
+    next stage. A stage's network round-trip, if any, runs before that
+    transaction, so it holds no lock or connection state open. A failed
+    task is retried with exponential backoff; a task whose worker died is
+    claimed again once its lease runs out.
+"""
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from telemetry.models import IngestTask
+
+from datetime import timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+BACKOFF_S = 5.0
+
+# a running task not finished within this long is assumed abandoned
+LEASE_S = 300.0
+
+DEFAULT_BATCH_SIZE = 10
+DEFAULT_POLL_S = 1.0
+
+def enqueue(stage: str, object_ids: Iterable) -> List[IngestTask]:
+    """
+    Queue work for a stage; call inside the transaction that created the records.
+
+    Args:
+        stage (str): One of the IngestTask.STAGE_* values.
+        object_ids (Iterable): Primary keys of the records to process.
+
+    Returns:
+        List[IngestTask]: The queued tasks.
+    """
+    tasks = [IngestTask(stage=stage, object_id=str(object_id)) for object_id in object_ids]
+
+    if not tasks:
+        return []
+
+    return IngestTask.objects.bulk_create(tasks)
+
+def claim(stages: Iterable[str], limit: int = DEFAULT_BATCH_SIZE, lease: float = LEASE_S) -> List[IngestTask]:
+    """
+    Claim up to `limit` due tasks of the given stages, oldest first.
+
+    Tasks locked by another worker are skipped rather than waited for.
+    """
+    now = timezone.now()
+
+    with transaction.atomic():
+        tasks = list(
+            IngestTask.objects.select_for_update(skip_locked=True).filter(
+                Q(status=IngestTask.STATUS_PENDING, available_timestamp__lte=now)
+                | Q(status=IngestTask.STATUS_RUNNING, locked_timestamp__lt=now - timedelta(seconds=lease)),
+                stage__in=list(stages),
+            ).order_by('id')[:limit]
+        )
+
+        IngestTask.objects.filter(pk__in=[task.pk for task in tasks]).update(
+            status=IngestTask.STATUS_RUNNING,
+            locked_timestamp=now,
+            attempts=F('attempts') + 1,
+        )
+
+    for task in tasks:
+        task.status = IngestTask.STATUS_RUNNING
+        task.locked_timestamp = now
+        task.attempts += 1
+
+    return tasks
+
+def run_task(
+        task: IngestTask,
+        handlers: Dict[str, Callable[..., None]],
+        remote_calls: Optional[Dict[str, Callable[[str], Any]]] = None,
+    ) -> bool:
+    """
+    Run one claimed task. On success the task is deleted in the same
+    transaction as the handler's writes. A ValueError marks it failed for
+    good (the input is invalid); any other error schedules a retry.
+
+    Args:
+        task (IngestTask): The claimed task.
+        handlers (Dict[str, Callable]): Handler per stage, run in the
+                     task's transaction.
+        remote_calls (Dict[str, Callable]): Network call per stage, run
+                     first, outside any transaction; its result is passed
+                     to the handler after the object id.
+
+    Returns:
+        bool: True if the handler succeeded.
+    """
+    handler = handlers.get(task.stage)
+    remote_call = (remote_calls or {}).get(task.stage)
+
+    if handler is None:
+        fail(task, f"No handler for stage {task.stage}")
+        return False
+
+    try:
+        args = (remote_call(task.object_id),) if remote_call else ()
+
+        with transaction.atomic():
+            handler(task.object_id, *args)
+            IngestTask.objects.filter(pk=task.pk).delete()
+    except ValueError as e:
+        logger.error(f"{task} is invalid: {e}")
+        fail(task, str(e))
+        return False
+    except Exception as e:
+        logger.error(f"{task} failed on attempt {task.attempts}: {e}", exc_info=True)
+        retry(task, str(e))
+        return False
+
+    return True
+
+def retry(task: IngestTask, error: str) -> None:
+    """
+    Put a task back with exponential backoff, or fail it once it is out of attempts.
+    """
+    if task.attempts >= MAX_ATTEMPTS:
+        fail(task, error)
+        return
+
+    task.status = IngestTask.STATUS_PENDING
+    task.available_timestamp = timezone.now() + timedelta(seconds=BACKOFF_S * 2 ** (task.attempts - 1))
+    task.last_error = error
+    task.save(update_fields=['status', 'available_timestamp', 'last_error'])
+
+def fail(task: IngestTask, error: str) -> None:
+    """
+    Keep a task as failed, for inspection in the admin.
+    """
+    task.status = IngestTask.STATUS_FAILED
+    task.last_error = error
+    task.save(update_fields=['status', 'last_error'])
+
+def run_worker(
+        stages: Iterable[str],
+        handlers: Dict[str, Callable[..., None]],
+        remote_calls: Optional[Dict[str, Callable[[str], Any]]] = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        poll: float = DEFAULT_POLL_S,
+        once: bool = False,
+    ) -> int:
+    """
+    Claim and run tasks of the given stages until stopped, sleeping `poll`
+    seconds whenever none are due.
+
+    Args:
+        remote_calls (Dict[str, Callable]): See run_task.
+        once (bool): Return as soon as no task is due, e.g. for tests.
+
+    Returns:
+        int: Tasks that succeeded.
+    """
+    stages = list(stages)
+    done = 0
+
+    while True:
+        tasks = claim(stages, batch_size)
+
+        if not tasks:
+            if once:
+                return done
+            time.sleep(poll)
+            continue
+
+        for task in tasks:
+            done += run_task(task, handlers, remote_calls)
@@ -1,16 +1,20 @@
 from iota_sdk import HexStr
-from supplychain.models import Gateway, TrackerEvent, Tracker
+from supplychain.models import Gateway, TelemetryReading, TrackerEvent
 from supplychain.scripts import compute_event_hash
 
 from notifications.models import TrackerNotification
 
-from telemetry.models import GatewayEventRaw
-from telemetry.types import TelemetryPayload, BatchTelemetryPayload, EventPayload, HeartbeatPayload, matches_typed_dict
+from telemetry.models import GatewayEventRaw, IngestTask
+from telemetry.scripts.ingest.idempotent import bulk_insert_once, insert_once
+from telemetry.scripts.ingest.key_cache import TRACKERS, CachedKey
+from telemetry.scripts.ingest.task_queue import enqueue
+from telemetry.types import TelemetryPayload, BatchTelemetryPayload, EventPayload, HeartbeatPayload, compile_validator
 
-from typing import List
+from typing import List, Mapping, Optional, Tuple
 from datetime import datetime
 
 import logging
+import uuid
 
 logger = logging.getLogger(__name__)
 
@@ -21,58 +25,115 @@ def tracker_raw_data_ingest_from_gatewayevent(gatewayeventraw: GatewayEventRaw)
         gatewayeventraw (GatewayEventRaw): The raw gateway event data to be ingested.
 
     Returns:
-        TrackerEvent: The created TrackerEvent instance.
+        List[TrackerEvent]: The created TrackerEvent instances.
     """
     if gatewayeventraw.message_type == GatewayEventRaw.MESSAGE_TYPE_BATCH_TELEMETRY:
-            return tracker_raw_data_ingest_batch(gatewayeventraw, gatewayeventraw.pay)
+        return tracker_raw_data_ingest_batch(gatewayeventraw, gatewayeventraw.payload)
     elif gatewayeventraw.message_type == GatewayEventRaw.MESSAGE_TYPE_TELEMETRY:
-        return [tracker_raw_data_ingest(gatewayeventraw, gatewayeventraw.payload)]
+        tracker_event = tracker_raw_data_ingest(gatewayeventraw, gatewayeventraw.payload)
+        return [tracker_event] if tracker_event else []
 
     return []
 
+def reading_message_id(gatewayeventraw: GatewayEventRaw, payload: TelemetryPayload, index: int) -> uuid.UUID:
+    """
+    The message id of one reading in a batch: its own messageId, which the
+    gateway copies from the tracker's message, or for older gateways one
+    derived from the batch id and position, so a redelivered batch maps to
+    the same ids.
+    """
+    try:
+        return uuid.UUID(str(payload['messageId']))
+    except (KeyError, ValueError):
+        return uuid.uuid5(uuid.UUID(str(gatewayeventraw.message_id)), str(index))
+
 def tracker_raw_data_ingest_batch(gatewayeventraw: GatewayEventRaw, payload: BatchTelemetryPayload) -> List[TrackerEvent]:
     """
-    Ingests batch telemetry data into the TrackerEvent model.
+    Ingests batch telemetry data into the TrackerEvent model as a set: one
+    lookup for the batch's uncached trackers, one INSERT ... ON CONFLICT
+    DO NOTHING for the readings, one for their TelemetryReadings and one
+    INSERT per downstream stage.
 
     Args:
+        gatewayeventraw (GatewayEventRaw): The batch_telemetry gateway event.
         payload (BatchTelemetryPayload): The batch telemetry payload to be ingested.
 
     Returns:
         List[TrackerEvent]: A list of created TrackerEvent instances.
     """
+    if not isinstance(payload, dict) or not isinstance(payload.get('readings'), list):
+        raise ValueError("Invalid payload format. Must match BatchTelemetryPayload TypedDict.")
+
+    readings = payload['readings']
+
+    trackers = TRACKERS.get_many(
+        reading.get('deviceId') for reading in readings if isinstance(reading, dict)
+    )
+
     trackerevents = []
+    telemetryreadings = {}
+    claims = {}
 
-    for reading in payload['readings']:
+    for index, reading in enumerate(readings):
         try:
-            trackerevent = tracker_raw_data_ingest(gatewayeventraw, reading)
-        except ValueError as e:
+            trackerevent, telemetryreading = build_tracker_event(
+                gatewayeventraw, reading, trackers, reading_message_id(gatewayeventraw, reading, index)
+            )
+        except (ValueError, TypeError) as e:
             logger.error(f"Failed to ingest reading {reading}: {e}")
             continue
 
         trackerevents.append(trackerevent)
+        telemetryreadings[trackerevent.message_id] = telemetryreading
+        # each reading carries its own signature; the envelope's is the first reading's
+        claims[trackerevent.message_id] = claimed_hash(reading, reading.get('signature'))
+
+    # bulk_create sends no post_save, so queue both next stages here
+    created = bulk_insert_once(TrackerEvent, trackerevents)
+    TelemetryReading.objects.bulk_create(
+        [telemetryreadings[trackerevent.message_id] for trackerevent in created], ignore_conflicts=True
+    )
+    enqueue(IngestTask.STAGE_ANCHOR, [trackerevent.pk for trackerevent in verify_claimed_hashes(created, claims)])
+    enqueue(IngestTask.STAGE_PRODUCT_EVENTS, [trackerevent.pk for trackerevent in created])
+
+    if len(created) < len(trackerevents):
+        logger.info(f"{len(trackerevents) - len(created)} readings of {gatewayeventraw.message_id} already ingested")
 
-    return trackerevents
+    return created
 
-def tracker_raw_data_ingest(gatewayeventraw: GatewayEventRaw, payload: TelemetryPayload) -> TrackerEvent:
+def build_tracker_event(
+        gatewayeventraw: GatewayEventRaw,
+        payload: TelemetryPayload,
+        trackers: Mapping[str, CachedKey],
+        message_id: uuid.UUID,
+    ) -> Tuple[TrackerEvent, TelemetryReading]:
     """
-    Ingests telemetry data into the TrackerEvent model.
+    Validates one reading and builds its TrackerEvent and TelemetryReading,
+    without saving them.
 
     Args:
-        gateway (Gateway): The gateway associated with the telemetry data.
-        payload (TelemetryPayload): The telemetry payload to be ingested.
+        gatewayeventraw (GatewayEventRaw): The gateway event carrying the reading.
+        payload (TelemetryPayload): The reading.
+        trackers (Mapping[str, CachedKey]): Known trackers by tracker_key.
+        message_id (UUID): The reading's message id.
 
     Returns:
-        TrackerEvent: The created TrackerEvent instance.
+        Tuple[TrackerEvent, TelemetryReading]: The unsaved instances.
+
+    Raises:
+        ValueError: If the reading is invalid or its tracker is unknown.
     """
     # 1. Validate that tracker exists
-    tracker = Tracker.objects.filter(tracker_key=payload['deviceId']).first()
+    tracker = trackers.get(payload.get('deviceId')) if isinstance(payload, dict) else None
 
     if not tracker:
-        raise ValueError(f"Tracker with ID {payload['deviceId']} does not exist.")
+        raise ValueError(f"Tracker with ID {payload.get('deviceId') if isinstance(payload, dict) else None} does not exist.")
 
-    # 2. Validate payload structure
-    if not matches_typed_dict(payload, TelemetryPayload):
-        raise ValueError("Invalid payload format. Must match TelemetryPayload TypedDict.")
+    # 2. Validate payload structure, down to the sensor values
+    try:
+        values = compile_validator(TelemetryPayload)(payload)
+    except ValueError as e:
+        raise ValueError(f"Invalid payload format. {e}")
 
 
     time = ""
@@ -93,39 +154,170 @@ def tracker_raw_data_ingest(gatewayeventraw: GatewayEventRaw, payload: Telemetry
     except ValueError:
         raise ValueError("Invalid timestamp format. Must be an ISO 8601 string.")
 
-    print(gatewayeventraw.signature.get('value', ''))
-
-    hash = compute_event_hash.compute_tracker_hash(payload)
+    # the one place the digest is computed; later stages use data_hash
+    try:
+        hash = compute_event_hash.compute_tracker_hash(payload)
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"Invalid payload format. Missing {e}")
 
-    # 5. Create TrackerEvent instance
-    tracker_event, created = TrackerEvent.objects.get_or_create(
-        message_id=gatewayeventraw.message_id,
-        tracker=tracker,
-        gateway=gatewayeventraw.gateway,
+    tracker_event = TrackerEvent(
+        message_id=message_id,
+        tracker_id=tracker.id,
+        gateway_id=gatewayeventraw.gateway_id,
         event_type=TrackerEvent.EVENT_TYPE_TELEMETRY,
         payload=payload,
         timestamp=timestamp,
         data_hash=HexStr(hash),
     )
 
-    if not created:
-        logger.error(f"Payload already ingested for {tracker_event.message_id}")
-        return tracker_event
+    return tracker_event, build_telemetry_reading(tracker_event, values)
 
-    try:
-        if HexStr(hash) != tracker_event.compute_hash():
-            TrackerNotification.objects.create(
-                tracker=tracker,
-                message=f"Payload hash mismatch for tracker {tracker.tracker_key}. Expected {tracker_event.compute_hash()}, got {hash}.",
-                timestamp=timestamp,
-                notication_type=TrackerNotification.NOTICATION_TYPE_ALERT,
-            )
+def signed(value: float, hemisphere: str, negative: str) -> float:
+    """
+    A coordinate the firmware sends as a magnitude and a hemisphere letter,
+    as a signed number. Values with any other letter are kept as sent.
+    """
+    return -abs(value) if hemisphere.upper() == negative else value
+
+def build_telemetry_reading(tracker_event: TrackerEvent, values: TelemetryPayload) -> TelemetryReading:
+    """
+    Builds the typed TelemetryReading for a tracker event, without saving it.
+
+    Args:
+        tracker_event (TrackerEvent): The tracker event of the reading.
+        values (TelemetryPayload): Its payload as returned by the compiled
+                     validator, with the sensor values as floats.
+
+    Returns:
+        TelemetryReading: The unsaved TelemetryReading instance.
+    """
+    location = values['location']
+    environment = values['environment']
+    acceleration = values['acceleration']
+
+    return TelemetryReading(
+        trackerevent=tracker_event,
+        tracker_id=tracker_event.tracker_id,
+        timestamp=tracker_event.timestamp,
+        latitude=signed(location['latitude'], location['ns'], 'S'),
+        longitude=signed(location['longitude'], location['ew'], 'W'),
+        altitude_m=location['altitude_m'],
+        temperature_c=environment['temperature_c'],
+        humidity_percent=environment['humidity_percent'],
+        pressure_hpa=environment['pressure_hpa'],
+        gas_ppm=environment['gas_ppm'],
+        x_mps2=acceleration['x_mps2'],
+        y_mps2=acceleration['y_mps2'],
+        z_mps2=acceleration['z_mps2'],
+    )
+
+def tracker_raw_data_ingest(gatewayeventraw: GatewayEventRaw, payload: TelemetryPayload) -> Optional[TrackerEvent]:
+    """
+    Ingests telemetry data into the TrackerEvent model.
+
+    Args:
+        gatewayeventraw (GatewayEventRaw): The gateway event carrying the telemetry data.
+        payload (TelemetryPayload): The telemetry payload to be ingested.
+
+    Returns:
+        TrackerEvent: The created TrackerEvent instance, or None if it was
+                      already ingested.
+    """
+    device_id = payload.get('deviceId') if isinstance(payload, dict) else None
+
+    tracker_event, telemetry_reading = build_tracker_event(
+        gatewayeventraw, payload, TRACKERS.get_many([device_id]), gatewayeventraw.message_id
+    )
+
+    # 5. Create TrackerEvent instance, unless it is a redelivery
+    if not insert_once(tracker_event):
+        logger.info(f"Payload already ingested for {tracker_event.message_id}")
+        return None
+
+    telemetry_reading.save(force_insert=True)
+
+    # 6. Check the hash against the tracker's, and anchor on IOTA in a stage of its own
+    claims = {tracker_event.message_id: claimed_hash(payload, gatewayeventraw.signature)}
+    enqueue(IngestTask.STAGE_ANCHOR, [event.pk for event in verify_claimed_hashes([tracker_event], claims)])
 
-            logger.error(f"Payload hash mismatch for tracker {tracker.tracker_key}. Expected {tracker_event.compute_hash()}, got {hash}.")
-        else:
-            # Upload the tracker event to the blockchain
-            block_id = tracker_event.anchor_on_iota()
-            logger.info(f"Anchored tracker event {tracker_event.message_id} as IOTA block {block_id}")
-    except Exception as e:
-        logger.error(f"{e}")
     return tracker_event
+
+def claimed_hash(payload: TelemetryPayload, signature: Optional[dict]) -> Optional[str]:
+    """
+    The digest the tracker sent with a reading, lower-cased: payload['hash']
+    if present, otherwise the signature value. None if it sent neither.
+    """
+    claimed = payload.get('hash') or (signature.get('value') if isinstance(signature, dict) else None)
+    return str(claimed).lower() if claimed else None
+
+def verify_claimed_hashes(tracker_events: List[TrackerEvent], claims: Mapping[uuid.UUID, Optional[str]]) -> List[TrackerEvent]:
+    """
+    Compares each event's data_hash, computed once at ingest, with the
+    digest its tracker claimed, and raises a TrackerNotification for each
+    mismatch. Events whose tracker sent no digest pass unchecked.
+
+    Args:
+        tracker_events (List[TrackerEvent]): Newly inserted tracker events.
+        claims (Mapping[UUID, Optional[str]]): Claimed digests by message id.
+
+    Returns:
+        List[TrackerEvent]: The events to anchor on IOTA.
+    """
+    verified = []
+    notifications = []
+
+    for tracker_event in tracker_events:
+        claimed = claims.get(tracker_event.message_id)
+
+        if claimed is None or claimed == tracker_event.data_hash.lower():
+            verified.append(tracker_event)
+            continue
+
+        message = (
+            f"Payload hash mismatch for tracker {tracker_event.payload.get('deviceId')}. "
+            f"Expected {tracker_event.data_hash}, got {claimed}."
+        )
+        notifications.append(TrackerNotification(
+            tracker_id=tracker_event.tracker_id,
+            message=message,
+            timestamp=tracker_event.timestamp,
+            notication_type=TrackerNotification.NOTICATION_TYPE_ALERT,
+        ))
+
+        logger.error(message)
+
+    TrackerNotification.objects.bulk_create(notifications)
+
+    return verified
+
+def anchor_tracker_event(tracker_event: TrackerEvent) -> str:
+    """
+    Anchors a TrackerEvent's data_hash on IOTA, without saving the block
+    id; see save_tracker_event_anchor. The hash was computed and checked
+    against the tracker's at ingest, so it is not recomputed here.
+
+    Args:
+        tracker_event (TrackerEvent): The tracker event to anchor.
+
+    Returns:
+        str: The IOTA block id.
+    """
+    if tracker_event.block_id:
+        return tracker_event.block_id
+
+    # Upload the tracker event to the blockchain
+    block_id = tracker_event.anchor_on_iota(save=False)
+    logger.info(f"Anchored tracker event {tracker_event.message_id} as IOTA block {block_id}")
+
+    return block_id
+
+def save_tracker_event_anchor(tracker_event_id, block_id: str) -> None:
+    """
+    Stores the IOTA block id of an anchored TrackerEvent, unless it already
+    has one from an earlier attempt.
+
+    Args:
+        tracker_event_id: The tracker event's primary key.
+        block_id (str): The IOTA block id.
+    """
+    TrackerEvent.objects.filter(pk=tracker_event_id, block_id__isnull=True).update(block_id=block_id)
@@ -0,0 +1,275 @@
+"""
+    Monthly range partitioning of the event tables on timestamp (PostgreSQL).
+
+    TrackerEvent, its TelemetryReading and GatewayEventRaw get a row per
+    reading and are queried by time window. Partitioned by month, a query
+    with a timestamp range only scans the partitions it overlaps, and
+    retention detaches or drops whole partitions instead of DELETEing rows.
+
+    Layout of a converted table <t>:
+        <t>_legacy     the rows from before the conversion, up to its month
+        <t>_pYYYY_MM   one partition per month (UTC), created ahead of time
+        <t>_default    rows outside every range, e.g. from a bad device
+                       clock; moved into their month when it is created
+
+    PostgreSQL requires unique constraints on a partitioned table to
+    include the partition key, so the primary key and message_id
+    uniqueness become (..., timestamp), and foreign keys into these tables
+    are dropped (ProductEvent.trackerevent and TelemetryReading.trackerevent
+    have db_constraint=False). The ORM is unaffected: the model's pk is
+    still unique in practice and insert_once/bulk_insert_once still see a
+    redelivery as a conflict.
+
+    Each function returns the SQL to run, so the command can show it first.
+"""
+
+from django.db import connection
+
+from supplychain.models import TelemetryReading, TrackerEvent
+from telemetry.models import GatewayEventRaw
+
+from datetime import datetime, timezone
+from typing import List, NamedTuple, Optional
+
+import re
+
+PARTITIONED_MODELS = [GatewayEventRaw, TrackerEvent, TelemetryReading]
+
+PARTITION_KEY = 'timestamp'
+
+LEGACY_SUFFIX = '_legacy'
+DEFAULT_SUFFIX = '_default'
+
+DEFAULT_MONTHS_AHEAD = 3
+
+class Partition(NamedTuple):
+    name: str
+    # None for MINVALUE, or for both on the default partition
+    lower: Optional[datetime]
+    upper: Optional[datetime]
+    is_default: bool = False
+
+def month_start(moment: datetime, months: int = 0) -> datetime:
+    """
+    Midnight UTC on the first of moment's month, moved by `months`.
+    """
+    moment = moment.astimezone(timezone.utc)
+    index = moment.year * 12 + moment.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=timezone.utc)
+
+def partition_name(table: str, lower: datetime) -> str:
+    return f"{table}_p{lower:%Y_%m}"
+
+def qn(name: str) -> str:
+    return connection.ops.quote_name(name)
+
+def literal(moment: datetime) -> str:
+    return f"'{moment.isoformat()}'"
+
+def is_partitioned(table: str) -> bool:
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [table])
+        row = cursor.fetchone()
+
+    return bool(row) and row[0] == 'p'
+
+def partitions(table: str) -> List[Partition]:
+    """
+    The partitions of a partitioned table, ordered by lower bound.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+            FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = %s::regclass
+            """,
+            [table],
+        )
+        rows = cursor.fetchall()
+
+    found = []
+
+    for name, bound in rows:
+        if bound == 'DEFAULT':
+            found.append(Partition(name, None, None, is_default=True))
+            continue
+
+        match = re.match(r"FOR VALUES FROM \((.+)\) TO \((.+)\)$", bound)
+        lower, upper = (
+            None if value == 'MINVALUE' else datetime.fromisoformat(value.strip("'"))
+            for value in match.groups()
+        )
+        found.append(Partition(name, lower, upper))
+
+    return sorted(found, key=lambda p: (p.is_default, p.lower or datetime.min.replace(tzinfo=timezone.utc)))
+
+def create_partition_sql(table: str, lower: datetime, upper: datetime) -> List[str]:
+    """
+    Create a month partition as a plain table, move any rows for it out of
+    the default partition, and attach it. Attaching takes a SHARE UPDATE
+    EXCLUSIVE lock on the parent, so reads and inserts carry on.
+    """
+    name = partition_name(table, lower)
+    where = f"{qn(PARTITION_KEY)} >= {literal(lower)} AND {qn(PARTITION_KEY)} < {literal(upper)}"
+
+    return [
+        f"CREATE TABLE {qn(name)} (LIKE {qn(table)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE)",
+        f"WITH moved AS (DELETE FROM {qn(table + DEFAULT_SUFFIX)} WHERE {where} RETURNING *) "
+        f"INSERT INTO {qn(name)} SELECT * FROM moved",
+        f"ALTER TABLE {qn(table)} ATTACH PARTITION {qn(name)} FOR VALUES FROM ({literal(lower)}) TO ({literal(upper)})",
+    ]
+
+def ensure_partitions_sql(table: str, now: datetime, months_ahead: int = DEFAULT_MONTHS_AHEAD) -> List[str]:
+    """
+    SQL creating the partitions missing from this month to months_ahead
+    months from now.
+    """
+    existing = [p for p in partitions(table) if not p.is_default]
+    statements = []
+
+    for offset in range(months_ahead + 1):
+        lower, upper = month_start(now, offset), month_start(now, offset + 1)
+
+        # the legacy partition may already cover the first months
+        if any((p.lower is None or p.lower < upper) and lower < p.upper for p in existing):
+            continue
+
+        statements += create_partition_sql(table, lower, upper)
+
+    return statements
+
+def expire_partitions_sql(table: str, now: datetime, retain_months: int, drop: bool = True) -> List[str]:
+    """
+    SQL detaching, and unless drop is False dropping, every partition that
+    ends before the first of the month retain_months months ago.
+
+    A detached partition is an ordinary table, left for archiving.
+    """
+    cutoff = month_start(now, -retain_months)
+    statements = []
+
+    for partition in partitions(table):
+        if partition.is_default or partition.upper > cutoff:
+            continue
+
+        statements.append(f"ALTER TABLE {qn(table)} DETACH PARTITION {qn(partition.name)}")
+        if drop:
+            statements.append(f"DROP TABLE {qn(partition.name)}")
+
+    return statements
+
+def convert_sql(table: str, now: datetime, months_ahead: int = DEFAULT_MONTHS_AHEAD) -> List[str]:
+    """
+    SQL turning a plain table into a partitioned one, in one transaction.
+
+    The table is renamed to <t>_legacy and attached to a new partitioned <t>
+    for everything before next month; rows dated later move to <t>_default.
+    Indexes keep their names, so later migrations still find them. Building
+    the widened unique indexes reads the whole table under an exclusive
+    lock, so run this once, in a quiet period.
+    """
+    legacy = table + LEGACY_SUFFIX
+    default = table + DEFAULT_SUFFIX
+    upper = month_start(now, 1)
+
+    with connection.cursor() as cursor:
+        # indexes, with their constraint if they back one, and their columns
+        cursor.execute(
+            """
+            SELECT i.relname, pg_get_indexdef(i.oid), con.conname, con.contype,
+                   ARRAY(
+                       SELECT a.attname
+                       FROM unnest(x.indkey::int2[]) WITH ORDINALITY AS k(attnum, ord)
+                       JOIN pg_attribute a ON a.attrelid = x.indrelid AND a.attnum = k.attnum
+                       ORDER BY k.ord
+                   )
+            FROM pg_index x
+            JOIN pg_class i ON i.oid = x.indexrelid
+            LEFT JOIN pg_constraint con ON con.conindid = x.indexrelid AND con.conrelid = x.indrelid
+            WHERE x.indrelid = %s::regclass
+            """,
+            [table],
+        )
+        indexes = cursor.fetchall()
+
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f'",
+            [table],
+        )
+        foreign_keys = cursor.fetchall()
+
+        cursor.execute(
+            "SELECT conrelid::regclass::text, conname FROM pg_constraint WHERE confrelid = %s::regclass AND contype = 'f'",
+            [table],
+        )
+        referencing = cursor.fetchall()
+
+        cursor.execute(
+            "SELECT attname FROM pg_attribute WHERE attrelid = %s::regclass AND attidentity <> '' AND NOT attisdropped",
+            [table],
+        )
+        identities = [row[0] for row in cursor.fetchall()]
+
+        maxima = {}
+        for column in identities:
+            cursor.execute(f"SELECT max({qn(column)}) FROM {qn(table)}")
+            maxima[column] = cursor.fetchone()[0]
+
+    statements = [f"LOCK TABLE {qn(table)} IN ACCESS EXCLUSIVE MODE"]
+
+    # 1. Foreign keys can only reference a partitioned table's full unique key
+    statements += [f"ALTER TABLE {qn(other)} DROP CONSTRAINT {qn(name)}" for other, name in referencing]
+
+    # 2. Free the index names for the new table: the unique ones are rebuilt
+    #    with the partition key, the others are matched up again on attach
+    for index_name, _, constraint, kind, _ in indexes:
+        if constraint:
+            statements.append(f"ALTER TABLE {qn(table)} DROP CONSTRAINT {qn(constraint)}")
+        else:
+            statements.append(f"ALTER INDEX {qn(index_name)} RENAME TO {qn(index_name[:63 - len(LEGACY_SUFFIX)] + LEGACY_SUFFIX)}")
+
+    statements.append(f"ALTER TABLE {qn(table)} RENAME TO {qn(legacy)}")
+
+    # 3. Partitioned tables cannot have identity columns before PostgreSQL
+    #    17; use a sequence carrying on from the legacy ids instead
+    statements += [f"ALTER TABLE {qn(legacy)} ALTER COLUMN {qn(column)} DROP IDENTITY" for column in identities]
+
+    statements.append(
+        f"CREATE TABLE {qn(table)} (LIKE {qn(legacy)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE) "
+        f"PARTITION BY RANGE ({qn(PARTITION_KEY)})"
+    )
+
+    for column in identities:
+        sequence = f"{table}_{column}_seq"
+        statements.append(f"CREATE SEQUENCE {qn(sequence)} OWNED BY {qn(table)}.{qn(column)}")
+        if maxima[column] is not None:
+            statements.append(f"SELECT setval('{qn(sequence)}', {int(maxima[column])})")
+        statements.append(f"ALTER TABLE {qn(table)} ALTER COLUMN {qn(column)} SET DEFAULT nextval('{qn(sequence)}')")
+
+    # 4. Rows dated after this month go to the default partition, the rest
+    #    stay where they are in the legacy one
+    statements += [
+        f"CREATE TABLE {qn(default)} PARTITION OF {qn(table)} DEFAULT",
+        f"WITH moved AS (DELETE FROM {qn(legacy)} WHERE {qn(PARTITION_KEY)} >= {literal(upper)} RETURNING *) "
+        f"INSERT INTO {qn(default)} SELECT * FROM moved",
+        f"ALTER TABLE {qn(table)} ATTACH PARTITION {qn(legacy)} FOR VALUES FROM (MINVALUE) TO ({literal(upper)})",
+    ]
+
+    # 5. Keys, indexes and foreign keys on the parent, which every partition gets
+    for index_name, definition, constraint, kind, columns in indexes:
+        if constraint:
+            key = ", ".join(qn(column) for column in columns + ([PARTITION_KEY] if PARTITION_KEY not in columns else []))
+            statements.append(
+                f"ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(constraint)} {'PRIMARY KEY' if kind == 'p' else 'UNIQUE'} ({key})"
+            )
+        else:
+            statements.append(re.sub(r" ON (ONLY )?\S+ USING ", f" ON {qn(table)} USING ", definition, count=1))
+
+    statements += [f"ALTER TABLE {qn(table)} ADD CONSTRAINT {qn(name)} {definition}" for name, definition in foreign_keys]
+
+    # 6. This month's partition is the legacy one; create the months after it
+    for offset in range(1, months_ahead + 1):
+        statements += create_partition_sql(table, month_start(now, offset), month_start(now, offset + 1))
+
+    return statements
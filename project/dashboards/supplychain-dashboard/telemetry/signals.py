@@ -1,8 +1,11 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
+from supplychain.models import Gateway, Tracker
+
 from telemetry.models import GatewayEventRaw
-from telemetry.scripts.ingest.tracker_ingest import tracker_raw_data_ingest_from_gatewayevent
+from telemetry.scripts.ingest.gateway_ingest import queue_tracker_ingest
+from telemetry.scripts.ingest.key_cache import GATEWAYS, TRACKERS
 
 import logging
 
@@ -11,12 +14,22 @@ logger = logging.getLogger(__name__)
 @receiver(post_save, sender=GatewayEventRaw)
 def gatewayeventraw_post_save(sender, instance, created, **kwargs):
     """
-        After we create a new GatewayEventRaw, we want to trigger the 
-        creation of tracker events based on the raw data.
+        After we create a new GatewayEventRaw, we queue the creation of
+        tracker events from the raw data for the ingest workers.
     """
     if created:
-        try:
-            tracker_raw_data_ingest_from_gatewayevent(instance)
-        except Exception as e:
-            logger.error(f"Creating tracker raw event cause {e}")
+        queue_tracker_ingest([instance])
+
+@receiver([post_save, post_delete], sender=Gateway)
+def gateway_changed(sender, instance, **kwargs):
+    """
+        Drop the gateway from this process's ingest key cache.
+    """
+    GATEWAYS.invalidate(instance.gateway_key, instance.pk)
 
+@receiver([post_save, post_delete], sender=Tracker)
+def tracker_changed(sender, instance, **kwargs):
+    """
+        Drop the tracker from this process's ingest key cache.
+    """
+    TRACKERS.invalidate(instance.tracker_key, instance.pk)
@@ -1,3 +1,350 @@
-from django.test import TestCase
+import io
+import json
+import threading
+import uuid
+import zlib
 
-# Create your tests here.
+from datetime import timedelta
+from unittest import skipUnless
+
+from django.db import connection, transaction
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase
+from django.utils import timezone
+from rest_framework_api_key.models import APIKey
+
+from supplychain.models import Gateway
+from telemetry.models import GatewayEventRaw, IngestTask
+from telemetry.parsers import (
+    MAX_INFLATED_BYTES,
+    BodyTooLarge,
+    ParseError,
+    iter_json_array,
+    iter_ndjson,
+    read_body,
+    read_chunks,
+)
+from telemetry.scripts.ingest import gateway_ingest, task_queue
+from telemetry.scripts.ingest.idempotent import bulk_insert_once, insert_once
+
+
+def deflate_request(body: bytes):
+    return RequestFactory().post("/", body, content_type="application/json", HTTP_CONTENT_ENCODING="deflate")
+
+
+def splits(body: bytes):
+    """The body cut into two chunks at every position."""
+    for i in range(len(body) + 1):
+        yield [body[:i], body[i:]]
+
+
+def heartbeat(message_id=None, gateway_id="GW-01"):
+    return {
+        "header": {
+            "messageId": str(message_id or uuid.uuid4()),
+            "gatewayId": gateway_id,
+            "schemaVersion": "1",
+            "messageType": "heartbeat",
+        },
+        "payload": {"deviceId": "dev-1", "uptime": 1, "firmwareVersion": "1", "timestamp": "2025-01-01T00:00:00"},
+        "signature": {"alg": "HS256", "keyId": "k", "value": "AB"},
+    }
+
+
+def raw_event(message_id=None):
+    return GatewayEventRaw(
+        message_id=message_id or uuid.uuid4(),
+        gateway_key="GW-01",
+        message_type=GatewayEventRaw.MESSAGE_TYPE_HEARTBEAT,
+        payload={},
+        timestamp=timezone.now(),
+        signature={},
+    )
+
+
+class DeflateLimitTests(SimpleTestCase):
+    def test_read_body_inflates_within_limit(self):
+        body = b'{"a": 1}'
+        compressed = zlib.compress(body)
+        request = deflate_request(compressed)
+
+        self.assertEqual(read_body(io.BytesIO(compressed), {"request": request}, limit=len(body)), body)
+
+    def test_read_body_rejects_body_over_limit(self):
+        compressed = zlib.compress(bytes(10_000))
+        request = deflate_request(compressed)
+
+        with self.assertRaises(BodyTooLarge) as caught:
+            read_body(io.BytesIO(compressed), {"request": request}, limit=9_999)
+        self.assertEqual(caught.exception.status_code, 413)
+
+    def test_read_body_rejects_truncated_body(self):
+        compressed = zlib.compress(b'{"a": 1}' * 100)[:-6]
+        request = deflate_request(compressed)
+
+        with self.assertRaises(ParseError):
+            read_body(io.BytesIO(compressed), {"request": request})
+
+    def test_read_chunks_bounds_each_piece_and_the_total(self):
+        body = bytes(range(256)) * 1000
+        stream = io.BytesIO(zlib.compress(body))
+
+        pieces = list(read_chunks(stream, "deflate", chunk_size=4096, limit=len(body)))
+        self.assertEqual(b"".join(pieces), body)
+        self.assertLessEqual(max(map(len, pieces)), 4096)
+
+        stream = io.BytesIO(zlib.compress(body))
+        with self.assertRaises(BodyTooLarge):
+            list(read_chunks(stream, "deflate", chunk_size=4096, limit=len(body) - 1))
+
+
+class StreamingDecoderTests(SimpleTestCase):
+    elements = [{"a": 1, "s": "xé]"}, [1, 2], 12345, "str,ing", None]
+
+    def test_json_array_at_every_chunk_boundary(self):
+        body = json.dumps(self.elements).encode("utf-8")
+
+        for chunks in splits(body):
+            self.assertEqual(list(iter_json_array(chunks)), self.elements)
+
+    def test_empty_json_array(self):
+        self.assertEqual(list(iter_json_array([b" [ ", b"] "])), [])
+
+    def test_json_array_errors(self):
+        for body in (b'{"a": 1}', b'[1, 2', b'[1 2]', b'[1] 2', b'[{"a": }]'):
+            with self.subTest(body=body), self.assertRaises(ParseError):
+                list(iter_json_array([body]))
+
+    def test_json_array_element_too_long(self):
+        with self.assertRaises(ParseError):
+            list(iter_json_array([b'["' + b"x" * 100], max_element=50))
+
+    def test_ndjson_at_every_chunk_boundary(self):
+        body = b"".join(json.dumps(element).encode("utf-8") + b"\n" for element in self.elements)
+
+        for chunks in splits(body):
+            self.assertEqual(list(iter_ndjson(chunks)), self.elements)
+
+    def test_ndjson_yields_bad_lines_as_errors(self):
+        out = list(iter_ndjson([b'{"a": 1}\n{bad\n\n', b'[2]']))
+
+        self.assertEqual(out[0], {"a": 1})
+        self.assertIsInstance(out[1], ValueError)
+        self.assertEqual(out[2], [2])
+
+    def test_ndjson_line_too_long(self):
+        with self.assertRaises(ParseError):
+            list(iter_ndjson([b"x" * 100], max_element=50))
+
+
+class InsertOnceTests(TestCase):
+    def test_insert_once(self):
+        message_id = uuid.uuid4()
+
+        self.assertTrue(insert_once(raw_event(message_id)))
+        self.assertFalse(insert_once(raw_event(message_id)))
+        self.assertEqual(GatewayEventRaw.objects.filter(message_id=message_id).count(), 1)
+
+    def test_bulk_insert_once_returns_only_new_rows(self):
+        stored = uuid.uuid4()
+        insert_once(raw_event(stored))
+
+        new = uuid.uuid4()
+        first, repeat = raw_event(new), raw_event(new)
+        created = bulk_insert_once(GatewayEventRaw, [raw_event(stored), first, repeat])
+
+        self.assertEqual(created, [first])
+        self.assertFalse(first._state.adding)
+        self.assertEqual(GatewayEventRaw.objects.count(), 2)
+
+    def test_bulk_insert_once_empty(self):
+        self.assertEqual(bulk_insert_once(GatewayEventRaw, []), [])
+
+
+class TaskQueueTests(TestCase):
+    def test_claim_takes_due_tasks_oldest_first(self):
+        first, second, third = task_queue.enqueue(IngestTask.STAGE_ANCHOR, ["a", "b", "c"])
+        IngestTask.objects.filter(pk=second.pk).update(available_timestamp=timezone.now() + timedelta(hours=1))
+        task_queue.enqueue(IngestTask.STAGE_NOTIFICATIONS, ["d"])
+
+        claimed = task_queue.claim([IngestTask.STAGE_ANCHOR], limit=5)
+
+        self.assertEqual([task.object_id for task in claimed], ["a", "c"])
+        self.assertEqual(
+            list(IngestTask.objects.filter(pk=first.pk).values_list("status", "attempts")),
+            [(IngestTask.STATUS_RUNNING, 1)],
+        )
+        self.assertEqual(task_queue.claim([IngestTask.STAGE_ANCHOR]), [])
+
+    def test_expired_lease_is_claimed_again(self):
+        task_queue.enqueue(IngestTask.STAGE_ANCHOR, ["a"])
+        task_queue.claim([IngestTask.STAGE_ANCHOR])
+
+        self.assertEqual(task_queue.claim([IngestTask.STAGE_ANCHOR]), [])
+
+        (task,) = task_queue.claim([IngestTask.STAGE_ANCHOR], lease=-1)
+        self.assertEqual(task.attempts, 2)
+
+    def test_success_deletes_the_task(self):
+        task_queue.enqueue(IngestTask.STAGE_ANCHOR, ["a"])
+        (task,) = task_queue.claim([IngestTask.STAGE_ANCHOR])
+        seen = []
+
+        ok = task_queue.run_task(
+            task,
+            {IngestTask.STAGE_ANCHOR: lambda object_id, block_id: seen.append((object_id, block_id))},
+            {IngestTask.STAGE_ANCHOR: lambda object_id: f"block-{object_id}"},
+        )
+
+        self.assertTrue(ok)
+        self.assertEqual(seen, [("a", "block-a")])
+        self.assertFalse(IngestTask.objects.exists())
+
+    def test_error_is_retried_with_backoff_then_failed(self):
+        task_queue.enqueue(IngestTask.STAGE_ANCHOR, ["a"])
+
+        def broken(object_id):
+            raise RuntimeError("node unreachable")
+
+        for attempt in range(1, task_queue.MAX_ATTEMPTS + 1):
+            IngestTask.objects.update(available_timestamp=timezone.now())
+            (task,) = task_queue.claim([IngestTask.STAGE_ANCHOR])
+            self.assertEqual(task.attempts, attempt)
+            with self.assertLogs(task_queue.logger, "ERROR"):
+                self.assertFalse(task_queue.run_task(task, {IngestTask.STAGE_ANCHOR: broken}))
+
+            task.refresh_from_db()
+            if attempt < task_queue.MAX_ATTEMPTS:
+                self.assertEqual(task.status, IngestTask.STATUS_PENDING)
+                self.assertGreater(task.available_timestamp, timezone.now())
+
+        self.assertEqual(task.status, IngestTask.STATUS_FAILED)
+        self.assertEqual(task.last_error, "node unreachable")
+
+    def test_invalid_input_fails_at_once(self):
+        task_queue.enqueue(IngestTask.STAGE_ANCHOR, ["a"])
+        (task,) = task_queue.claim([IngestTask.STAGE_ANCHOR])
+
+        def invalid(object_id):
+            raise ValueError("no such record")
+
+        with self.assertLogs(task_queue.logger, "ERROR"):
+            self.assertFalse(task_queue.run_task(task, {IngestTask.STAGE_ANCHOR: invalid}))
+        task.refresh_from_db()
+        self.assertEqual(task.status, IngestTask.STATUS_FAILED)
+
+    def test_handler_writes_roll_back_with_a_failed_task(self):
+        task_queue.enqueue(IngestTask.STAGE_ANCHOR, ["a"])
+        (task,) = task_queue.claim([IngestTask.STAGE_ANCHOR])
+
+        def half_done(object_id):
+            task_queue.enqueue(IngestTask.STAGE_NOTIFICATIONS, ["b"])
+            raise RuntimeError("failed after queueing")
+
+        with self.assertLogs(task_queue.logger, "ERROR"):
+            task_queue.run_task(task, {IngestTask.STAGE_ANCHOR: half_done})
+        self.assertFalse(IngestTask.objects.filter(stage=IngestTask.STAGE_NOTIFICATIONS).exists())
+
+
+@skipUnless(connection.features.has_select_for_update_skip_locked, "needs SELECT ... FOR UPDATE SKIP LOCKED")
+class ConcurrentClaimTests(TransactionTestCase):
+    def test_claim_skips_tasks_locked_by_another_worker(self):
+        first, second = task_queue.enqueue(IngestTask.STAGE_ANCHOR, ["a", "b"])
+        locked = threading.Event()
+        release = threading.Event()
+
+        def other_worker():
+            try:
+                with transaction.atomic():
+                    list(IngestTask.objects.select_for_update().filter(pk=first.pk))
+                    locked.set()
+                    release.wait(5)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=other_worker)
+        thread.start()
+        try:
+            self.assertTrue(locked.wait(5))
+            claimed = task_queue.claim([IngestTask.STAGE_ANCHOR])
+        finally:
+            release.set()
+            thread.join()
+
+        self.assertEqual([task.pk for task in claimed], [second.pk])
+
+
+class ApiKeyTestCase(TestCase):
+    def setUp(self):
+        Gateway.objects.create(gateway_key="GW-01")
+        _, key = APIKey.objects.create_key(name="test")
+        self.client.defaults["HTTP_AUTHORIZATION"] = f"Api-Key {key}"
+
+
+class TelemetryViewTests(ApiKeyTestCase):
+    url = "/api/telemetry/gateway/"
+
+    def test_accepted_then_duplicate(self):
+        body = json.dumps(heartbeat())
+
+        self.assertEqual(self.client.post(self.url, body, content_type="application/json").status_code, 202)
+        resp = self.client.post(self.url, body, content_type="application/json")
+
+        self.assertEqual(resp.json(), {"status": "duplicate"})
+
+    def test_deflate_bomb_is_refused(self):
+        body = zlib.compress(b" " * (MAX_INFLATED_BYTES + 1))
+
+        resp = self.client.post(self.url, body, content_type="application/json", HTTP_CONTENT_ENCODING="deflate")
+
+        self.assertEqual(resp.status_code, 413)
+
+
+class BulkViewTests(ApiKeyTestCase):
+    url = "/api/telemetry/gateway/bulk/"
+
+    def test_ndjson_results_by_index(self):
+        repeated = heartbeat()
+        messages = [heartbeat(), repeated, repeated, heartbeat(gateway_id="GW-XX")]
+        body = b"".join(json.dumps(message).encode() + b"\n" for message in messages) + b"{bad\n"
+
+        resp = self.client.post(self.url, body, content_type="application/x-ndjson")
+
+        self.assertEqual(resp.status_code, 202)
+        data = resp.json()
+        self.assertEqual((data["created"], data["duplicates"], data["rejected"]), (2, 1, 2))
+        self.assertEqual(
+            [result["status"] for result in data["results"]],
+            ["created", "created", "duplicate", "rejected", "rejected"],
+        )
+        self.assertEqual(GatewayEventRaw.objects.count(), 2)
+
+    def test_redelivered_json_array_is_all_duplicates(self):
+        body = json.dumps([heartbeat(), heartbeat()])
+
+        self.client.post(self.url, body, content_type="application/json")
+        resp = self.client.post(self.url, body, content_type="application/json")
+
+        self.assertEqual(resp.json()["duplicates"], 2)
+
+    def test_deflate_body(self):
+        body = zlib.compress(json.dumps([heartbeat()]).encode())
+
+        resp = self.client.post(self.url, body, content_type="application/json", HTTP_CONTENT_ENCODING="deflate")
+
+        self.assertEqual(resp.json()["created"], 1)
+
+    def test_truncated_body_keeps_earlier_batches(self):
+        messages = [heartbeat() for _ in range(gateway_ingest.BULK_BATCH_SIZE + 1)]
+        body = json.dumps(messages).encode()[:-1]
+
+        resp = self.client.post(self.url, body, content_type="application/json")
+
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(resp.json()["created"], gateway_ingest.BULK_BATCH_SIZE)
+
+    def test_requires_api_key(self):
+        del self.client.defaults["HTTP_AUTHORIZATION"]
+
+        resp = self.client.post(self.url, "[]", content_type="application/json")
+
+        self.assertIn(resp.status_code, (401, 403))
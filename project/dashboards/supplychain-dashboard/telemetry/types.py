@@ -1,5 +1,9 @@
-from typing import TypedDict, List, Type, Dict
-from typing_extensions import TypedDict as TypedDictClass
+from typing import TypedDict, Any, Callable, List, Type, Dict, Union, get_args, get_origin, get_type_hints
+from typing_extensions import TypedDict as TypedDictClass, is_typeddict
+
+from functools import lru_cache
+
+import types
 
 class Header(TypedDict):
     messageId: str
@@ -118,3 +122,147 @@ def matches_typed_dict(data: Dict, td_cls: Type[TypedDictClass], *, strict: bool
         return False
 
     return True
+
+
+#########
+# Compiled validators
+#########
+
+# validate(data) -> a copy of data with numbers coerced, or ValueError
+Validator = Callable[[Any], Any]
+
+@lru_cache(maxsize=None)
+def compile_validator(td_cls: Type[TypedDictClass], *, strict: bool = False) -> Validator:
+    """
+    Compiles td_cls into a function that checks a value against it, nested
+    TypedDicts, lists and unions included, in one pass.
+
+    Fields typed float or int also accept the numeric strings the firmware
+    sends. The validator returns a copy with those values converted and
+    leaves `data` untouched: the payload hash is computed over the strings
+    exactly as the tracker printed them.
+
+    Type hints and key sets are resolved once per TypedDict and the result
+    is cached, so this is cheap to call per message.
+
+    Args:
+        td_cls (Type[TypedDict]): The TypedDict to validate against.
+        strict (bool): Reject keys td_cls does not declare.
+
+    Returns:
+        Validator: Takes the value, returns the coerced copy, and raises
+                   ValueError naming the offending field otherwise.
+    """
+    return _compile(td_cls, td_cls.__name__, strict)
+
+def _compile(tp: Any, path: str, strict: bool) -> Validator:
+    """
+    The validator for one type hint; `path` names the field in errors.
+    """
+    if is_typeddict(tp):
+        return _compile_typed_dict(tp, path, strict)
+
+    origin = get_origin(tp)
+
+    if origin in (list, List):
+        (item_tp,) = get_args(tp) or (Any,)
+        check_item = _compile(item_tp, f"{path}[]", strict)
+
+        def check_list(value):
+            if not isinstance(value, list):
+                raise ValueError(f"{path}: expected a list, got {type(value).__name__}")
+            return [check_item(item) for item in value]
+
+        return check_list
+
+    if origin in (Union, types.UnionType):
+        alternatives = [_compile(arg, path, strict) for arg in get_args(tp)]
+        names = " | ".join(getattr(arg, "__name__", str(arg)) for arg in get_args(tp))
+
+        def check_union(value):
+            errors = []
+            for check in alternatives:
+                try:
+                    return check(value)
+                except ValueError as e:
+                    errors.append(str(e))
+            raise ValueError(f"{path}: matches none of {names} ({'; '.join(errors)})")
+
+        return check_union
+
+    if tp is float:
+        def check_float(value):
+            kind = type(value)
+            if kind is float:
+                return value
+            if kind is int or kind is str:
+                try:
+                    return float(value)
+                except ValueError:
+                    pass
+            raise ValueError(f"{path}: expected a number, got {value!r}")
+
+        return check_float
+
+    if tp is int:
+        def check_int(value):
+            kind = type(value)
+            if kind is int:
+                return value
+            if kind is str:
+                try:
+                    return int(value)
+                except ValueError:
+                    pass
+            raise ValueError(f"{path}: expected an integer, got {value!r}")
+
+        return check_int
+
+    if tp is str:
+        def check_str(value):
+            if type(value) is not str:
+                raise ValueError(f"{path}: expected a string, got {value!r}")
+            return value
+
+        return check_str
+
+    if isinstance(tp, type) and tp is not object:
+        def check_type(value):
+            if not isinstance(value, tp):
+                raise ValueError(f"{path}: expected {tp.__name__}, got {value!r}")
+            return value
+
+        return check_type
+
+    # Any, and hints this compiler does not know: accept as is
+    return lambda value: value
+
+def _compile_typed_dict(td_cls: Type[TypedDictClass], path: str, strict: bool) -> Validator:
+    """
+    The validator for a TypedDict: each declared field's validator, and the
+    required and known key sets, resolved up front.
+    """
+    hints = get_type_hints(td_cls)
+    required = frozenset(td_cls.__required_keys__)
+    known = frozenset(hints)
+    fields = tuple((key, _compile(hint, f"{path}.{key}", strict)) for key, hint in hints.items())
+
+    def check_dict(value):
+        if not isinstance(value, dict):
+            raise ValueError(f"{path}: expected an object, got {type(value).__name__}")
+
+        # extra keys (a reading's messageId and signature) are kept as they are
+        result = dict(value)
+
+        for key, check in fields:
+            if key in value:
+                result[key] = check(value[key])
+            elif key in required:
+                raise ValueError(f"{path}: missing required field '{key}'")
+
+        if strict and not known.issuperset(value):
+            raise ValueError(f"{path}: unexpected fields {sorted(set(value) - known)}")
+
+        return result
+
+    return check_dict
@@ -1,7 +1,8 @@
 
 from django.urls import path
-from telemetry.views import TelemetryView
+from telemetry.views import TelemetryBulkView, TelemetryView
 
 urlpatterns = [
     path('telemetry/gateway/', TelemetryView.as_view(), name='telemetry-gateway'),
+    path('telemetry/gateway/bulk/', TelemetryBulkView.as_view(), name='telemetry-gateway-bulk'),
 ]
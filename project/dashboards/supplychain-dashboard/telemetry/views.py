@@ -1,9 +1,11 @@
 from rest_framework.compat import requests
+from rest_framework.exceptions import ParseError
 from rest_framework.permissions import AllowAny
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework_api_key.permissions import HasAPIKey
 
+from telemetry.parsers import MessagePackParser, TelemetryJSONParser, iter_envelopes
 from telemetry.scripts.ingest import gateway_ingest
 
 import logging
@@ -12,6 +14,8 @@ logger = logging.getLogger(__name__)
 
 class TelemetryView(APIView):
     permission_classes = [HasAPIKey]
+    # gateways may send MessagePack and/or deflate-compressed bodies
+    parser_classes = [TelemetryJSONParser, MessagePackParser]
 
     def post(self, request):
         data = request.data
@@ -26,9 +30,55 @@ class TelemetryView(APIView):
                 return Response({"error": f"Missing required field: {field}"}, status=400)
 
         try:
-            gateway_ingest.gateway_raw_data_ingest(data)
+            _, created = gateway_ingest.gateway_raw_data_ingest(data)
         except ValueError as e:
             logger.info(f"{e}")
             return Response({"error": str(e)}, status=400)
 
-        return Response({"status": "ok"})
+        if not created:
+            return Response({"status": "duplicate"})
+
+        # tracker events, anchoring and notifications follow in the ingest workers
+        return Response({"status": "accepted"}, status=202)
+
+
+class TelemetryBulkView(APIView):
+    """
+    Many gateway envelopes per request: a JSON array, NDJSON or
+    concatenated MessagePack, optionally deflate-compressed. The body is
+    decoded as it is read and stored in batches, and the response reports
+    every message's status by its index in the body.
+    """
+    permission_classes = [HasAPIKey]
+
+    def post(self, request):
+        # request.data would read the whole body; stream it instead
+        envelopes = iter_envelopes(request)
+        results = []
+
+        try:
+            for result in gateway_ingest.gateway_raw_data_ingest_bulk(envelopes):
+                results.append(result)
+        except ParseError as e:
+            # batches stored before the body broke off are kept
+            logger.info(f"Bulk body unreadable after {len(results)} messages: {e.detail}")
+            return Response({"error": str(e.detail), **self.summary(results)}, status=e.status_code)
+
+        return Response(self.summary(results), status=202)
+
+    @staticmethod
+    def summary(results):
+        counts = {
+            gateway_ingest.STATUS_CREATED: 0,
+            gateway_ingest.STATUS_DUPLICATE: 0,
+            gateway_ingest.STATUS_REJECTED: 0,
+        }
+        for result in results:
+            counts[result["status"]] += 1
+
+        return {
+            "created": counts[gateway_ingest.STATUS_CREATED],
+            "duplicates": counts[gateway_ingest.STATUS_DUPLICATE],
+            "rejected": counts[gateway_ingest.STATUS_REJECTED],
+            "results": results,
+        }
@@ -7,25 +7,40 @@ import datetime
 
 from azure.iot.hub import IoTHubRegistryManager
 from azure.iot.device import IoTHubDeviceClient, Message
+from azure.iot.device.exceptions import ClientError
 from typing import Callable, Dict, Any, Optional
 from dotenv import load_dotenv
 from datetime import datetime
 
+from uplink_encoding import encode_message, CONTENT_TYPE_JSON
+
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 load_dotenv()
 
+# send_telemetry errors meaning the hub is unreachable, not that the message is bad
+TRANSPORT_ERRORS = (ClientError,)
+
 class AzureIoTHubMqttClient:
     """
     Simple wrapper around Azure IoT Hub DeviceClient (uses MQTT by default)
-    to send JSON-encoded telemetry.
+    to send JSON-encoded telemetry, or a compact encoding from uplink_encoding.
     """
 
-    def __init__(self, message_callback: Optional[Callable] = None, connection_string: Optional[str] = None) -> None:
+    def __init__(
+        self,
+        message_callback: Optional[Callable] = None,
+        connection_string: Optional[str] = None,
+        content_type: str = CONTENT_TYPE_JSON,
+        compress: bool = False,
+    ) -> None:
         """
         If connection_string is None, reads from environment variable
         IOTHUB_DEVICE_CONNECTION_STRING.
+
+        content_type and compress select the telemetry encoding; see
+        uplink_encoding.encode_message().
         """
         conn_str = connection_string or os.getenv("IOTHUB_DEVICE_CONNECTION_STRING")
         if not conn_str:
@@ -37,6 +52,9 @@ class AzureIoTHubMqttClient:
         if message_callback:
             self.message_callback = message_callback
 
+        self.content_type = content_type
+        self.compress = compress
+
         # create client (under the hood, connects via MQTT on port 8883)
         self.client = IoTHubDeviceClient.create_from_connection_string(conn_str)
         self.client.on_message_received = self.receive_telemetry
@@ -45,16 +63,17 @@ class AzureIoTHubMqttClient:
 
     def send_telemetry(self, data: Dict[str, Any]) -> None:
         """
-            Send a single telemetry message (dict→JSON) to the IoT Hub.
+            Send a single telemetry message to the IoT Hub, encoded as
+            configured (JSON by default).
         """
-        # Serialize dictionary to JSON string
-        payload = json.dumps(data)
+        payload, content_type, content_encoding = encode_message(data, self.content_type, self.compress)
         msg = Message(payload)
-        msg.content_encoding = "utf-8"
-        msg.content_type = "application/json"
+        msg.content_type = content_type
+        if content_encoding:
+            msg.content_encoding = content_encoding
 
         # Send synchronously
-        logger.debug("Sending telemetry: %s", payload)
+        logger.debug("Sending telemetry (%s, %s, %d bytes): %s", content_type, content_encoding, len(payload), data)
         self.client.send_message(msg)
         logger.info("Telemetry successfully sent.")
 
@@ -0,0 +1,183 @@
+"""
+Collect telemetry readings into batch_telemetry envelopes.
+
+A batch is flushed when it reaches a reading count, when adding another
+reading would push the encoded envelope over a byte budget (kept under
+the IoT Hub 256 KiB message limit), or when its oldest reading has
+waited longer than the maximum latency. Non-telemetry messages are
+passed straight through.
+"""
+
+import json
+import logging
+import time
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+from uuid import uuid4
+
+logger = logging.getLogger(__name__)
+
+MESSAGE_TYPE_TELEMETRY = "telemetry"
+MESSAGE_TYPE_BATCH_TELEMETRY = "batch_telemetry"
+
+SCHEMA_VERSION = "1.0"
+
+# IoT Hub rejects device-to-cloud messages over 256 KiB
+IOTHUB_MAX_MESSAGE_BYTES = 256 * 1024
+
+DEFAULT_MAX_READINGS = 100
+DEFAULT_MAX_BYTES = IOTHUB_MAX_MESSAGE_BYTES - 16 * 1024
+DEFAULT_MAX_LATENCY_S = 5.0
+
+# room for the header, signature and payload keys around the readings
+_ENVELOPE_OVERHEAD = 512
+
+
+@dataclass
+class _Batch:
+    """Readings waiting to be sent for one gateway id."""
+    signature: Dict[str, Any]
+    opened: float
+    readings: List[Dict[str, Any]] = field(default_factory=list)
+    size: int = _ENVELOPE_OVERHEAD
+
+
+class TelemetryBatcher:
+    """
+    Group telemetry messages per gateway into batch_telemetry envelopes.
+
+    Attributes:
+        max_readings: Readings per envelope before it is flushed.
+        max_bytes: Encoded envelope size before it is flushed.
+        max_latency: Seconds the oldest reading may wait before a flush.
+    """
+
+    def __init__(
+        self,
+        max_readings: int = DEFAULT_MAX_READINGS,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        max_latency: float = DEFAULT_MAX_LATENCY_S,
+        gateway_id: Optional[str] = None,
+    ):
+        """
+        Initialize TelemetryBatcher.
+
+        Args:
+            max_readings: Readings per envelope before it is flushed.
+            max_bytes: Encoded envelope size before it is flushed.
+            max_latency: Seconds the oldest reading may wait before a flush.
+            gateway_id: Used when a message header has no gatewayId.
+        """
+        if max_readings <= 0:
+            raise ValueError("max_readings must be positive")
+        if max_bytes <= _ENVELOPE_OVERHEAD:
+            raise ValueError(f"max_bytes must exceed {_ENVELOPE_OVERHEAD}")
+
+        self.max_readings = max_readings
+        self.max_bytes = max_bytes
+        self.max_latency = max_latency
+        self.gateway_id = gateway_id
+
+        self._batches: Dict[str, _Batch] = {}
+
+    @property
+    def pending(self) -> int:
+        """Readings held in open batches."""
+        return sum(len(batch.readings) for batch in self._batches.values())
+
+    def add(self, msg: Dict[str, Any], now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Add one parsed message.
+
+        Args:
+            msg: Message with header, payload and signature.
+            now: time.monotonic() value, for callers that already have one.
+
+        Returns:
+            Messages ready to send: the message itself if it is not
+            telemetry, and any batch that this reading closed.
+        """
+        header = msg.get("header") or {}
+        payload = msg.get("payload")
+
+        if header.get("messageType", MESSAGE_TYPE_TELEMETRY) != MESSAGE_TYPE_TELEMETRY or not isinstance(payload, dict):
+            return [msg]
+
+        now = time.monotonic() if now is None else now
+        gateway_id = header.get("gatewayId") or self.gateway_id or ""
+
+        # readings become TrackerEvents individually, so each keeps its own id
+        payload.setdefault("messageId", header.get("messageId") or str(uuid4()))
+        # and its own signature: each tracker hash covers only its reading
+        if msg.get("signature"):
+            payload.setdefault("signature", msg["signature"])
+        size = len(json.dumps(payload)) + 2
+
+        ready = []
+
+        batch = self._batches.get(gateway_id)
+        if batch and batch.size + size > self.max_bytes:
+            ready.append(self._close(gateway_id))
+            batch = None
+
+        if batch is None:
+            batch = self._batches[gateway_id] = _Batch(signature=msg.get("signature") or {}, opened=now)
+
+        batch.readings.append(payload)
+        batch.size += size
+
+        if len(batch.readings) >= self.max_readings or batch.size >= self.max_bytes:
+            ready.append(self._close(gateway_id))
+
+        return ready
+
+    def time_until_flush(self, now: Optional[float] = None) -> Optional[float]:
+        """
+        Seconds until the oldest open batch reaches max_latency, or None
+        when nothing is pending.
+        """
+        if not self._batches:
+            return None
+
+        now = time.monotonic() if now is None else now
+        oldest = min(batch.opened for batch in self._batches.values())
+
+        return max(0.0, oldest + self.max_latency - now)
+
+    def flush_expired(self, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Close every batch whose oldest reading has waited max_latency."""
+        now = time.monotonic() if now is None else now
+
+        expired = [
+            gateway_id for gateway_id, batch in self._batches.items()
+            if now - batch.opened >= self.max_latency
+        ]
+
+        return [self._close(gateway_id) for gateway_id in expired]
+
+    def flush_all(self) -> List[Dict[str, Any]]:
+        """Close every open batch, e.g. on shutdown."""
+        return [self._close(gateway_id) for gateway_id in list(self._batches)]
+
+    def _close(self, gateway_id: str) -> Dict[str, Any]:
+        """Remove the batch for gateway_id and wrap it in an envelope."""
+        batch = self._batches.pop(gateway_id)
+
+        logger.debug("Flushing batch of %d readings (%d bytes) for %s", len(batch.readings), batch.size, gateway_id)
+
+        return {
+            "header": {
+                "messageId": str(uuid4()),
+                "gatewayId": gateway_id,
+                "schemaVersion": SCHEMA_VERSION,
+                "messageType": MESSAGE_TYPE_BATCH_TELEMETRY,
+            },
+            "payload": {
+                # GatewayEventRaw.timestamp is the oldest reading in the batch
+                "timestamp": batch.readings[0].get("timestamp"),
+                "readings": batch.readings,
+            },
+            # the first reading's, for the envelope; every reading carries its own
+            "signature": batch.signature,
+        }
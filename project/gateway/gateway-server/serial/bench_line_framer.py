@@ -0,0 +1,106 @@
+"""
+Benchmark line framing throughput on a synthetic tracker capture.
+
+Compares the old bytearray.partition() loop against LineFramer, both when
+the serial port is drained in small reads and when a tracker dumps a
+backlog that lands in the buffer in one go. Before timing, checks that
+the line after an oversized one is framed intact.
+
+Example
+
+python3 bench_line_framer.py --size-mb 4 --chunk 1024
+"""
+
+import argparse
+import logging
+import time
+
+from line_framer import LineFramer
+
+SAMPLE_LINE = (
+    b'[00:01:02.345,000] <inf> tracker: '
+    b'{"header":{},"payload":{"timestamp":"2025-05-29T13:27:32","uptime":"61",'
+    b'"location":{"latitude":"27.5001869","ns":"S","longitude":"153.0141296","ew":"E","altitude_m":"31.0"},'
+    b'"environment":{"temperature_c":"25.55","humidity_percent":"58.50","pressure_hpa":"102.1","gas_ppm":"14.00"},'
+    b'"acceleration":{"x_mps2":"0.038","y_mps2":"-0.268","z_mps2":"-9.690"}},"signature":{},}\r\n'
+)
+
+
+def build_capture(size: int) -> bytes:
+    """Repeat SAMPLE_LINE until the capture is at least `size` bytes."""
+    return SAMPLE_LINE * (size // len(SAMPLE_LINE) + 1)
+
+
+def frame_partition(capture: bytes, chunk: int) -> int:
+    """Frame the capture with the previous parse_buffer loop."""
+    lines = 0
+    buf = bytearray()
+    for offset in range(0, len(capture), chunk):
+        buf.extend(capture[offset:offset + chunk])
+        while b"\n" in buf:
+            line, _, buf = buf.partition(b"\n")
+            lines += 1
+    return lines
+
+
+def frame_lineframer(capture: bytes, chunk: int) -> int:
+    """Frame the capture with LineFramer."""
+    lines = 0
+    framer = LineFramer()
+    view = memoryview(capture)
+    for offset in range(0, len(capture), chunk):
+        for line in framer.feed(view[offset:offset + chunk]):
+            lines += 1
+    return lines
+
+
+def check_overflow() -> None:
+    """
+    Check that the line after an oversized one survives, including when an
+    overflow splits a multi-byte delimiter.
+    """
+    logging.disable(logging.WARNING)
+    for delimiter in (b"\n", b"\r\n"):
+        for long_size in range(14, 20):
+            capture = b"a" * long_size + delimiter + b"ok" + delimiter
+            for chunk in range(1, len(capture) + 1):
+                framer = LineFramer(capacity=16, delimiter=delimiter)
+                lines = [
+                    bytes(line)
+                    for offset in range(0, len(capture), chunk)
+                    for line in framer.feed(capture[offset:offset + chunk])
+                ]
+                expected = [b"ok"] if long_size + len(delimiter) > 16 else [b"a" * long_size, b"ok"]
+                assert lines == expected, (delimiter, long_size, chunk, lines)
+    logging.disable(logging.NOTSET)
+
+
+def run(name: str, fn, capture: bytes, chunk: int) -> None:
+    """Time one framing strategy and print lines/s."""
+    start = time.perf_counter()
+    lines = fn(capture, chunk)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{name:<12} chunk={chunk:<10} lines={lines:<8} "
+        f"{elapsed:8.3f}s {lines / elapsed:12.0f} lines/s {len(capture) / elapsed / 1e6:8.1f} MB/s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark serial line framing")
+    parser.add_argument("--size-mb", type=float, default=4.0, help="Capture size in MB")
+    parser.add_argument("--chunk", type=int, default=1024, help="Serial read size in bytes")
+    args = parser.parse_args()
+
+    check_overflow()
+
+    capture = build_capture(int(args.size_mb * 1e6))
+    print(f"Capture: {len(capture)} bytes, {len(SAMPLE_LINE)} bytes/line")
+
+    for chunk in (args.chunk, len(capture)):
+        run("partition", frame_partition, capture, chunk)
+        run("LineFramer", frame_lineframer, capture, chunk)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark JSON extraction from tracker log lines.
+
+Compares the previous str-based cleanup (re.sub per line, a per-character
+generator to drop control characters, json.loads) with extract_json(),
+after checking both produce the same result on a set of awkward lines.
+
+Example
+
+python3 bench_message_parser.py --lines 200000
+"""
+
+import argparse
+import json
+import re
+import time
+
+import message_parser
+
+from message_parser import extract_json
+
+SAMPLE_LINE = (
+    b'\x1b[0m[00:01:02.345,000] <inf> tracker: '
+    b'{"header":{},"payload":{"timestamp":"2025-05-29T13:27:32","uptime":"61",'
+    b'"location":{"latitude":"27.5001869","ns":"S","longitude":"153.0141296","ew":"E","altitude_m":"31.0"},'
+    b'"environment":{"temperature_c":"25.55","humidity_percent":"58.50","pressure_hpa":"102.1","gas_ppm":"14.00"},'
+    b'"acceleration":{"x_mps2":"0.038","y_mps2":"-0.268","z_mps2":"-9.690"}},"signature":{},}\r'
+)
+
+EDGE_CASES = [
+    SAMPLE_LINE,
+    b'no json here',
+    b'prefix {"a":1,  \t}',
+    b'{"a":{"b":"c",\r\n},}',
+    b'{"a":"x\x00y\x07z"}',
+    b'{"a":1,\x1c}',
+    b'{"a":[1,2,]}',
+    b'{"a":"caf\xc3\xa9"}',
+    b'{"a":"bad \xff utf8"}',
+    b'{"truncated":',
+]
+
+
+def legacy_extract(line: bytes):
+    """The str-based path parse_buffer used before extract_json()."""
+    text = line.decode("utf-8", errors="ignore").strip()
+    idx = text.find("{")
+    if idx < 0:
+        return None
+    json_text = text[idx:]
+    json_text = re.sub(r",\s*}", "}", json_text)
+    json_text = "".join(ch for ch in json_text if ord(ch) >= 0x20)
+    return json.loads(json_text)
+
+
+def outcome(fn, line: bytes):
+    """Result of fn(line), with any parse error reduced to its type."""
+    try:
+        return fn(line)
+    except ValueError:
+        return ValueError
+
+
+def run(name: str, fn, lines: int) -> None:
+    """Time fn over `lines` copies of SAMPLE_LINE and print lines/s."""
+    start = time.perf_counter()
+    for _ in range(lines):
+        fn(SAMPLE_LINE)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<24} {elapsed:8.3f}s {lines / elapsed:12.0f} lines/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark tracker JSON extraction")
+    parser.add_argument("--lines", type=int, default=200000, help="Lines to parse per run")
+    args = parser.parse_args()
+
+    for line in EDGE_CASES:
+        old, new = outcome(legacy_extract, line), outcome(extract_json, line)
+        status = "ok" if old == new else "DIFFERS"
+        print(f"{status:<8} {line[:48]!r}")
+
+    run("legacy str path", legacy_extract, args.lines)
+    if message_parser.orjson is not None:
+        run("extract_json (orjson)", extract_json, args.lines)
+        message_parser.orjson = None
+    run("extract_json (json)", extract_json, args.lines)
+
+
+if __name__ == "__main__":
+    main()
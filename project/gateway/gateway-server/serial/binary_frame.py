@@ -0,0 +1,372 @@
+"""
+Binary tracker frames: versioned, length-prefixed and CRC-checked.
+
+Instead of printing every reading as JSON with each number formatted as
+a string, the gateway firmware can write the tracker's fixed-point
+values as one binary frame:
+
+    offset  size  field
+    0       2     sync, A5 5A
+    2       1     frame version (1)
+    3       1     frame type (1 = telemetry)
+    4       2     body length, little-endian
+    6       n     body
+    6 + n   4     CRC-32 (IEEE, as zlib.crc32 and Zephyr's crc32_ieee)
+                  of bytes 2 .. 6 + n, little-endian
+
+A version 1 telemetry body is the 16-byte messageId followed by
+tracker_payload_t from my_json.h, packed (no padding), in the struct's
+field order:
+
+    messageId 16s, timestamp I, uptime I, lat i, ns c, lon i, ew c,
+    alt h, temp h, humid h, press h, gas h, x h, y h, z h, hash 32s,
+    dev_id h
+
+FrameDecoder finds frames in the byte stream and checks their CRC;
+decode_frame() unpacks one with a precompiled struct straight from the
+framer's buffer into a TelemetryFrame tuple of integers. parse_frame()
+then converts it with to_message() right away, in the parse stage, into
+the usual header/payload/signature message, with every value formatted
+exactly as the firmware's snprintf would. The conversion comes first
+because FrameVerifier recomputes the tracker hash over those formatted
+values, and the dedup window, batcher and spool all handle messages.
+What binary framing saves is scanning and decoding JSON text; the
+formatting is still paid once per reading.
+
+Bytes outside frames, such as log output, are skipped.
+
+Example
+
+decoder = FrameDecoder()
+for frame in decoder.feed(chunk):
+    parse_frame(frame, received)
+"""
+
+import functools
+import logging
+import struct
+import time
+import zlib
+
+from typing import Any, Callable, Dict, Iterator, NamedTuple, Optional
+
+from batch_uplink import MESSAGE_TYPE_TELEMETRY, SCHEMA_VERSION
+
+logger = logging.getLogger(__name__)
+
+SYNC = b"\xa5\x5a"
+FRAME_VERSION = 1
+FRAME_TYPE_TELEMETRY = 1
+
+FRAMING_LINES = "lines"
+FRAMING_BINARY = "binary"
+FRAMINGS = (FRAMING_LINES, FRAMING_BINARY)
+
+DEFAULT_CAPACITY = 16 * 1024
+DEFAULT_MAX_BODY = 1024
+
+# header and signature constants the gateway firmware fills in
+FIRMWARE_GATEWAY_ID = "GW-01"
+FIRMWARE_SIG_ALG = "HS256"
+FIRMWARE_KEY_ID = "key-001"
+
+_HEADER = struct.Struct("<2sBBH")
+_CRC = struct.Struct("<I")
+_TELEMETRY_V1 = struct.Struct("<16sIIicic8h32sh")
+
+# the firmware's snprintf precisions for lat, lon, alt, temp, humid,
+# press, gas, x, y, z, formatted in one go
+_VALUES = "%.7f %.7f %.1f %.2f %.2f %.1f %.2f %.3f %.3f %.3f"
+
+
+class TelemetryFrame(NamedTuple):
+    """One telemetry reading in the tracker's fixed-point units."""
+    message_id: bytes    # UUID bytes
+    timestamp: int       # unix seconds
+    uptime: int
+    lat: int             # degrees * 1e7
+    ns: bytes
+    lon: int             # degrees * 1e7
+    ew: bytes
+    alt: int             # metres * 10
+    temp: int            # °C * 100
+    humid: int           # % * 100
+    press: int           # hPa * 10
+    gas: int             # ppm * 100
+    x: int               # m/s² * 1000
+    y: int
+    z: int
+    hash: bytes          # SHA-256 of the tracker's payload snippet
+    dev_id: int
+
+
+class FrameDecoder:
+    """
+    Find CRC-checked binary frames in a byte stream without copying.
+
+    Has the same feed() interface as LineFramer. Each yielded memoryview
+    is a whole frame, sync to CRC, and is only valid until the next
+    frame is requested.
+
+    Attributes:
+        bytes_fed: Total bytes passed to feed().
+        frames_framed: Frames whose CRC matched.
+        crc_errors: Frames dropped for a CRC mismatch.
+        invalid: Frame headers with an unknown version or a body longer
+            than max_body.
+        skipped: Bytes discarded outside frames.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, max_body: int = DEFAULT_MAX_BODY):
+        """
+        Initialize FrameDecoder.
+
+        Args:
+            capacity: Size of the preallocated buffer.
+            max_body: Longest body accepted; longer length fields are
+                treated as noise.
+        """
+        if capacity < _HEADER.size + max_body + _CRC.size:
+            raise ValueError("FrameDecoder capacity must hold the largest frame")
+
+        self._buf = bytearray(capacity)
+        self._view = memoryview(self._buf)
+        self._capacity = capacity
+        self.max_body = max_body
+
+        self._start = 0    # first byte not yet consumed
+        self._end = 0      # one past the last byte written
+
+        self.bytes_fed = 0
+        self.frames_framed = 0
+        self.crc_errors = 0
+        self.invalid = 0
+        self.skipped = 0
+
+    @property
+    def pending(self) -> int:
+        """Number of buffered bytes belonging to an incomplete frame."""
+        return self._end - self._start
+
+    def reset(self) -> None:
+        """Drop any buffered partial frame."""
+        self._start = self._end = 0
+
+    def feed(self, data) -> Iterator[memoryview]:
+        """
+        Append data and yield every frame it completes.
+
+        The generator must be exhausted before feed() is called again,
+        otherwise the unconsumed part of data is lost.
+
+        Args:
+            data: Any bytes-like object (bytes, bytearray, memoryview).
+
+        Yields:
+            memoryview slices of the internal buffer, one per frame.
+        """
+        data = memoryview(data).cast("B")
+        self.bytes_fed += len(data)
+
+        while data:
+            n = self._reserve(len(data))
+            self._view[self._end:self._end + n] = data[:n]
+            self._end += n
+            data = data[n:]
+
+            yield from self._drain()
+
+    def _reserve(self, wanted: int) -> int:
+        """
+        Make room at the tail of the buffer for up to `wanted` bytes.
+
+        Returns:
+            Number of bytes that can be written at self._end.
+        """
+        if self._start == self._end:
+            self._start = self._end = 0
+
+        free = self._capacity - self._end
+        if free >= wanted or not self._start:
+            return min(wanted, free)
+
+        # slide the partial frame to the front; it is shorter than the largest frame
+        size = self._end - self._start
+        self._view[:size] = self._view[self._start:self._end]
+        self._start = 0
+        self._end = size
+
+        return min(wanted, self._capacity - size)
+
+    def _drain(self) -> Iterator[memoryview]:
+        """Yield the complete frames currently in the buffer."""
+        buf = self._buf
+        view = self._view
+
+        while True:
+            start = self._start
+            idx = buf.find(SYNC, start, self._end)
+            if idx < 0:
+                # a trailing first sync byte may be completed by the next read
+                keep = 1 if self._end > start and buf[self._end - 1] == SYNC[0] else 0
+                self.skipped += self._end - keep - start
+                self._start = self._end - keep
+                return
+
+            self.skipped += idx - start
+            self._start = idx
+
+            if self._end - idx < _HEADER.size:
+                return
+
+            _, version, _, length = _HEADER.unpack_from(buf, idx)
+            if version != FRAME_VERSION or length > self.max_body:
+                # not a frame we can read; look for the next sync
+                self.invalid += 1
+                self._start = idx + 1
+                continue
+
+            crc_at = idx + _HEADER.size + length
+            end = crc_at + _CRC.size
+            if end > self._end:
+                return
+
+            if zlib.crc32(view[idx + len(SYNC):crc_at]) != _CRC.unpack_from(buf, crc_at)[0]:
+                logger.debug("Dropping binary frame with a bad CRC.")
+                self.crc_errors += 1
+                self._start = idx + 1
+                continue
+
+            self._start = end
+            self.frames_framed += 1
+            yield view[idx:end]
+
+
+def is_frame(data: bytes | memoryview) -> bool:
+    """True if data starts with the binary frame sync word."""
+    return data[:len(SYNC)] == SYNC
+
+
+def decode_frame(frame: bytes | memoryview) -> Optional[TelemetryFrame]:
+    """
+    Unpack a CRC-checked frame from FrameDecoder.
+
+    Returns:
+        The reading, or None for a frame type this gateway does not know.
+    """
+    _, _, kind, length = _HEADER.unpack_from(frame)
+
+    if kind != FRAME_TYPE_TELEMETRY or length != _TELEMETRY_V1.size:
+        logger.debug("Skipping binary frame of type %d (%d bytes).", kind, length)
+        return None
+
+    return TelemetryFrame._make(_TELEMETRY_V1.unpack_from(frame, _HEADER.size))
+
+
+def encode_frame(reading: TelemetryFrame) -> bytes:
+    """Pack a reading as a version 1 telemetry frame, e.g. for testing."""
+    body = _TELEMETRY_V1.pack(*reading)
+    header = _HEADER.pack(SYNC, FRAME_VERSION, FRAME_TYPE_TELEMETRY, len(body))
+    crc = zlib.crc32(header[len(SYNC):] + body)
+
+    return header + body + _CRC.pack(crc)
+
+
+@functools.lru_cache(maxsize=1024)
+def _format_time(timestamp: int) -> str:
+    # trackers report every few seconds, so the same second recurs across them
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(timestamp))
+
+
+def _format_uuid(data: bytes) -> str:
+    h = data.hex()
+    return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+
+
+def format_payload(reading: TelemetryFrame) -> Dict[str, Any]:
+    """
+    The TelemetryPayload for a reading, formatted as the firmware's
+    fill_json_packet_from_tracker_payload() does.
+    """
+    lat, lon, alt, temp, humid, press, gas, x, y, z = (_VALUES % (
+        reading.lat / 1e7, reading.lon / 1e7, reading.alt / 10.0,
+        reading.temp / 100.0, reading.humid / 100.0, reading.press / 10.0, reading.gas / 100.0,
+        reading.x / 1000.0, reading.y / 1000.0, reading.z / 1000.0,
+    )).split(" ")
+
+    return {
+        "deviceId": f"dev-{reading.dev_id}",
+        "timestamp": _format_time(reading.timestamp),
+        "uptime": str(reading.uptime),
+        "location": {
+            "latitude": lat,
+            "ns": reading.ns.decode("ascii", errors="replace"),
+            "longitude": lon,
+            "ew": reading.ew.decode("ascii", errors="replace"),
+            "altitude_m": alt,
+        },
+        "environment": {
+            "temperature_c": temp,
+            "humidity_percent": humid,
+            "pressure_hpa": press,
+            "gas_ppm": gas,
+        },
+        "acceleration": {
+            "x_mps2": x,
+            "y_mps2": y,
+            "z_mps2": z,
+        },
+    }
+
+
+def to_message(reading: TelemetryFrame, gateway_id: str = FIRMWARE_GATEWAY_ID) -> Dict[str, Any]:
+    """The message the firmware would have printed as JSON for this reading."""
+    return {
+        "header": {
+            "messageId": _format_uuid(reading.message_id),
+            "gatewayId": gateway_id,
+            "schemaVersion": SCHEMA_VERSION,
+            "messageType": MESSAGE_TYPE_TELEMETRY,
+        },
+        "payload": format_payload(reading),
+        "signature": {
+            "alg": FIRMWARE_SIG_ALG,
+            "keyId": FIRMWARE_KEY_ID,
+            "value": reading.hash.hex().upper(),
+        },
+    }
+
+
+def parse_frame(
+    frame: bytes | memoryview,
+    received: Callable,
+    echo: Optional[Callable[[bytes], None]] = None,
+) -> bool:
+    """
+    Binary counterpart of parse_line(): decode one frame, convert it
+    with to_message() and pass the message to the received callback.
+
+    Args:
+        frame: One frame from FrameDecoder.
+        received: Callable invoked with the message.
+        echo: Callable given a one-line summary for display; None shows
+            nothing.
+
+    Returns:
+        False if the frame could not be unpacked, otherwise True.
+    """
+    try:
+        reading = decode_frame(frame)
+    except struct.error as e:
+        logger.error("Malformed binary frame; ignoring. %s", e)
+        return False
+
+    if reading is None:
+        return True
+
+    if echo:
+        echo(f"[frame] dev-{reading.dev_id} t={reading.timestamp} uptime={reading.uptime}".encode("ascii"))
+
+    received(to_message(reading))
+
+    return True
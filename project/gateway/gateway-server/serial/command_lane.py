@@ -0,0 +1,260 @@
+"""
+CommandLane: the single, prioritised writer for one serial port.
+
+Cloud-to-device commands arrive on the IoT Hub client's MQTT thread and
+interactive input on the prompt thread. Instead of writing to the UART
+from whichever thread they arrive on, both are submitted to the port's
+lane, and one writer thread sends them in priority order, one at a
+time. Control commands go ahead of anything else waiting.
+
+A command with an `ack` pattern is held in flight until the port's
+reader sees a matching line (or one matching `nak`), and is resent up
+to `retries` times on timeout. Replies are matched by the reader as
+lines are framed, before they join the queue towards the parser and
+uplink, so command latency does not grow with the telemetry backlog.
+
+Example
+
+lane = CommandLane(port.ser.write, name=port.name)
+lane.start()
+lane.submit(Command("set_device 7", ack=re.compile(rb"Dev ID will change to: 7")))
+for line in framer.feed(chunk):
+    lane.observe(line)
+"""
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Pattern, Tuple
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_CONTROL = 0
+PRIORITY_INTERACTIVE = 10
+
+DEFAULT_ACK_TIMEOUT_S = 2.0
+DEFAULT_RETRIES = 1
+DEFAULT_MAX_PENDING = 64
+
+STATUS_ACKED = "acked"
+STATUS_REJECTED = "rejected"
+STATUS_TIMEOUT = "timeout"
+STATUS_SENT = "sent"
+STATUS_FAILED = "failed"
+STATUS_DROPPED = "dropped"
+STATUSES = (STATUS_ACKED, STATUS_REJECTED, STATUS_TIMEOUT, STATUS_SENT, STATUS_FAILED, STATUS_DROPPED)
+
+
+@dataclass
+class Command:
+    """
+    One line for the device, and how to recognise its reply.
+
+    `status`, `reply`, `attempts` and `latency` are filled in by the lane;
+    `on_done` is called once status is final, from the writer thread, or
+    from the submitting thread for a dropped command.
+    """
+    line: str
+    priority: int = PRIORITY_CONTROL
+    ack: Optional[Pattern[bytes]] = None
+    nak: Optional[Pattern[bytes]] = None
+    timeout: float = DEFAULT_ACK_TIMEOUT_S
+    retries: int = DEFAULT_RETRIES
+    on_done: Optional[Callable[["Command"], None]] = None
+
+    status: Optional[str] = None
+    reply: Optional[bytes] = None
+    attempts: int = 0
+    submitted: float = 0.0
+    latency: Optional[float] = None
+
+
+class CommandLane:
+    """
+    Priority queue and writer thread for one serial port.
+
+    Attributes:
+        name: Port name, for logs and metrics.
+        counts: Finished commands by status.
+        retried: Commands resent after an acknowledgement timeout.
+    """
+
+    def __init__(
+        self,
+        write: Callable[[bytes], object],
+        name: str = "serial",
+        max_pending: int = DEFAULT_MAX_PENDING,
+        expect_acks: bool = True,
+        on_done: Optional[Callable[[Command], None]] = None,
+    ):
+        """
+        Initialize CommandLane.
+
+        Args:
+            write: Writes raw bytes to the port, e.g. Serial.write.
+            name: Port name, for logs and metrics.
+            max_pending: Commands waiting before submit() refuses more.
+            expect_acks: Wait for ack patterns; False when the port's
+                reader cannot see text replies (binary framing).
+            on_done: Called with every finished command, after its own
+                on_done, e.g. to record metrics. It runs on the writer
+                thread (or the submitter's, for drops), so it must not
+                update single-writer state directly.
+        """
+        self.name = name
+        self.max_pending = max_pending
+        self.expect_acks = expect_acks
+
+        self.counts = dict.fromkeys(STATUSES, 0)
+        self.retried = 0
+
+        self._write = write
+        self._on_done = on_done
+        self._heap: List[Tuple[int, int, Command]] = []
+        self._seq = itertools.count()
+        self._inflight: Optional[Command] = None
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name=f"commands-{name}", daemon=True)
+
+    @property
+    def pending(self) -> int:
+        """Commands waiting to be written."""
+        return len(self._heap)
+
+    def start(self) -> None:
+        """Start the writer thread."""
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the writer; a command in flight is finished first, the rest are dropped."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread.is_alive():
+            self._thread.join()
+
+        for _, _, command in self._heap:
+            self._finish(command, STATUS_DROPPED)
+        self._heap = []
+
+    def submit(self, command: Command) -> bool:
+        """
+        Queue a command; safe to call from any thread.
+
+        Returns:
+            False if the lane is full or stopped and the command was dropped.
+        """
+        command.submitted = time.monotonic()
+
+        with self._cond:
+            if not self._stopping and len(self._heap) < self.max_pending:
+                heapq.heappush(self._heap, (command.priority, next(self._seq), command))
+                self._cond.notify_all()
+                return True
+
+        logger.warning("Command lane %s is full; dropping %r.", self.name, command.line)
+        self._finish(command, STATUS_DROPPED)
+        return False
+
+    def observe(self, line: bytes | memoryview) -> None:
+        """
+        Check a line read from the port against the command in flight.
+
+        Called by the reader for every framed line; returns at once when
+        no reply is awaited.
+        """
+        command = self._inflight
+        if command is None:
+            return
+
+        if command.ack and command.ack.search(line):
+            status = STATUS_ACKED
+        elif command.nak and command.nak.search(line):
+            status = STATUS_REJECTED
+        else:
+            return
+
+        with self._cond:
+            if self._inflight is command and command.status is None:
+                command.status = status
+                command.reply = bytes(line)
+                self._cond.notify_all()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._heap and not self._stopping:
+                    self._cond.wait()
+                if self._stopping:
+                    return
+                _, _, command = heapq.heappop(self._heap)
+
+            self._finish(command, self._send(command))
+
+    def _send(self, command: Command) -> str:
+        """Write a command, retrying until it is acknowledged; returns its status."""
+        data = (command.line + "\n").encode("utf-8")
+        wait = self.expect_acks and command.ack is not None
+
+        for attempt in range(command.retries + 1):
+            if attempt:
+                self.retried += 1
+                logger.warning("No reply to %r on %s; resending.", command.line, self.name)
+
+            with self._cond:
+                self._inflight = command if wait else None
+
+            command.attempts += 1
+            try:
+                self._write(data)
+            except Exception as e:
+                logger.error("Writing %r to %s failed: %s", command.line, self.name, e)
+                with self._cond:
+                    self._inflight = None
+                return STATUS_FAILED
+
+            logger.debug("Sent: %s", command.line)
+            if not wait:
+                return STATUS_SENT
+
+            deadline = time.monotonic() + command.timeout
+            with self._cond:
+                while command.status is None and not self._stopping:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                self._inflight = None
+                if command.status is not None:
+                    return command.status
+                if self._stopping:
+                    break
+
+        return STATUS_TIMEOUT
+
+    def _finish(self, command: Command, status: str) -> None:
+        command.status = status
+        command.latency = time.monotonic() - command.submitted
+        # drops are counted on the submitting thread, the rest on the writer
+        with self._cond:
+            self.counts[status] += 1
+
+        if status == STATUS_ACKED:
+            logger.info("%s acknowledged %r after %.0f ms.", self.name, command.line, command.latency * 1000)
+        elif status == STATUS_REJECTED:
+            logger.warning("%s rejected %r: %s", self.name, command.line,
+                           str(command.reply, "utf-8", errors="ignore").strip())
+        elif status == STATUS_TIMEOUT:
+            logger.error("No reply to %r on %s after %d attempts.", command.line, self.name, command.attempts)
+
+        for callback in (command.on_done, self._on_done):
+            if callback:
+                try:
+                    callback(command)
+                except Exception as e:
+                    logger.error("Command callback raised: %s", e, exc_info=True)
@@ -0,0 +1,140 @@
+"""
+ConsoleSink: show gateway lines on the terminal without slowing ingestion.
+
+Readers hand lines to offer(), which only appends to a bounded deque.
+A display thread renders them with prompt_toolkit at no more than
+`max_rate` lines per second, optionally showing only one line in every
+`sample_every`. When the terminal falls behind, the oldest waiting
+lines are discarded and a summary says how many were skipped, so a slow
+terminal costs display lines, never serial data.
+
+Example
+
+console = ConsoleSink(max_rate=20, sample_every=10)
+console.start()
+parse_line(line, received, echo=console.offer)
+"""
+
+import logging
+import threading
+import time
+
+from collections import deque
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_RATE = 20.0
+DEFAULT_SAMPLE_EVERY = 1
+DEFAULT_CAPACITY = 256
+
+
+def print_ansi(text: str) -> None:
+    """Print a line with its ANSI colour codes through prompt_toolkit."""
+    # imported on first use so headless gateways never load prompt_toolkit
+    from prompt_toolkit import print_formatted_text
+    from prompt_toolkit.formatted_text import ANSI
+
+    print_formatted_text(ANSI(text))
+
+
+class ConsoleSink:
+    """
+    Rate-limited, sampled terminal output on its own thread.
+
+    Attributes:
+        shown: Lines rendered.
+        sampled_out: Lines skipped by sampling.
+        dropped: Lines discarded because the display fell behind.
+    """
+
+    def __init__(
+        self,
+        max_rate: float = DEFAULT_MAX_RATE,
+        sample_every: int = DEFAULT_SAMPLE_EVERY,
+        capacity: int = DEFAULT_CAPACITY,
+        write: Optional[Callable[[str], None]] = None,
+    ):
+        """
+        Initialize ConsoleSink.
+
+        Args:
+            max_rate: Lines rendered per second at most; 0 for no limit.
+            sample_every: Show one line in every this many.
+            capacity: Lines waiting for display before the oldest are dropped.
+            write: Renders one line; defaults to print_ansi().
+        """
+        self.interval = 1.0 / max_rate if max_rate else 0.0
+        self.sample_every = max(1, sample_every)
+        self.write = write or print_ansi
+
+        self.shown = 0
+        self.sampled_out = 0
+        self.dropped = 0
+
+        self._lines: deque = deque(maxlen=capacity)
+        self._seen = 0
+        self._ready = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="console", daemon=True)
+
+    def offer(self, line: bytes | memoryview) -> None:
+        """
+        Queue a raw line for display; never blocks.
+
+        Safe to call from a single reader thread or the event loop.
+        """
+        self._seen += 1
+        if self._seen % self.sample_every:
+            self.sampled_out += 1
+            return
+
+        if len(self._lines) == self._lines.maxlen:
+            self.dropped += 1
+        # copy: a LineFramer view is only valid until the next line
+        self._lines.append(bytes(line))
+        self._ready.set()
+
+    def start(self) -> None:
+        """Start the display thread."""
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the display thread, discarding lines not yet shown."""
+        self._stop_event.set()
+        self._ready.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        reported = 0
+        next_at = time.monotonic()
+
+        while not self._stop_event.is_set():
+            self._ready.wait()
+            self._ready.clear()
+
+            while self._lines and not self._stop_event.is_set():
+                delay = next_at - time.monotonic()
+                if delay > 0:
+                    # lines arriving meanwhile may push out the oldest
+                    self._stop_event.wait(delay)
+                    continue
+
+                try:
+                    line = self._lines.popleft()
+                except IndexError:
+                    break
+
+                if self.dropped != reported:
+                    self._render(f"… {self.dropped - reported} lines not shown (console rate limit)")
+                    reported = self.dropped
+
+                self._render(str(line, "utf-8", errors="ignore").strip())
+                self.shown += 1
+                next_at = max(next_at + self.interval, time.monotonic() - 1.0)
+
+    def _render(self, text: str) -> None:
+        try:
+            self.write(text)
+        except Exception as e:
+            logger.debug("Console write failed: %s", e)
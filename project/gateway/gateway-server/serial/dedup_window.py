@@ -0,0 +1,288 @@
+"""
+Drop duplicate tracker readings on the gateway and optionally put each
+tracker's readings back in timestamp order before the uplink.
+
+Trackers resend readings after a link loss, and overlapping gateways
+hear the same frame. Each telemetry reading is keyed by its deviceId,
+tracker timestamp and hash:
+
+    recent keys    an LRU bounded by entry count and age; a hit is a
+                   certain duplicate
+    older keys     two rotating generations of a Bloom filter, which
+                   remember far more keys in a fixed number of bytes; a
+                   hit is only a probable duplicate (false positive rate
+                   `bloom_error`), so the reading is counted and still
+                   forwarded
+
+Memory is capped at max_entries LRU keys plus two Bloom bit arrays
+(about 240 KB each for 100k keys at a 1e-4 error rate). The server
+ignores any duplicate that gets through, so a Bloom false positive
+never costs a reading.
+
+With a reorder delay, readings are held per tracker in a heap and
+released oldest timestamp first once they have waited that long.
+Non-telemetry messages pass straight through. A tracker's last released
+timestamp is forgotten once it has been idle for max_age.
+"""
+
+import hashlib
+import heapq
+import itertools
+import logging
+import math
+import time
+
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from batch_uplink import MESSAGE_TYPE_TELEMETRY
+from message_hash import claimed_hash
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 4096
+DEFAULT_MAX_AGE_S = 600.0
+DEFAULT_BLOOM_CAPACITY = 100_000
+DEFAULT_BLOOM_ERROR = 1e-4
+DEFAULT_MAX_HELD = 256
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over 16-byte digests.
+
+    Attributes:
+        capacity: Keys it was sized for.
+        count: Keys added.
+    """
+
+    def __init__(self, capacity: int, error: float):
+        self.capacity = capacity
+        self.count = 0
+
+        bits = max(8, int(-capacity * math.log(error) / math.log(2) ** 2))
+        self._size = bits
+        self._hashes = max(1, round(bits / capacity * math.log(2)))
+        self._bits = bytearray((bits + 7) // 8)
+
+    def _positions(self, digest: bytes):
+        # double hashing: k positions from two 64-bit halves
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:16], "little") | 1
+        return ((h1 + i * h2) % self._size for i in range(self._hashes))
+
+    def add(self, digest: bytes) -> None:
+        for pos in self._positions(digest):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, digest: bytes) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(digest))
+
+    @property
+    def size_bytes(self) -> int:
+        return len(self._bits)
+
+
+class DedupWindow:
+    """
+    Duplicate filter and per-tracker reordering buffer for telemetry.
+
+    Attributes:
+        duplicates: Readings dropped because their key was in the LRU.
+        probable_duplicates: Readings forwarded although the Bloom filter
+            had seen their key.
+        late: Readings released after a newer reading of the same
+            tracker had already gone out.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_age: float = DEFAULT_MAX_AGE_S,
+        bloom_capacity: int = DEFAULT_BLOOM_CAPACITY,
+        bloom_error: float = DEFAULT_BLOOM_ERROR,
+        reorder_delay: float = 0.0,
+        max_held: int = DEFAULT_MAX_HELD,
+    ):
+        """
+        Initialize DedupWindow.
+
+        Args:
+            max_entries: Keys kept in the exact LRU.
+            max_age: Seconds a key stays in the exact LRU, and an idle
+                tracker's reordering state is kept.
+            bloom_capacity: Keys per Bloom filter generation; 0 disables
+                the Bloom filter and with it the probable_duplicates count.
+            bloom_error: Target false positive rate per generation.
+            reorder_delay: Seconds each reading is held for reordering;
+                0 releases readings immediately.
+            max_held: Readings held per tracker before the oldest is
+                released early.
+        """
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.bloom_capacity = bloom_capacity
+        self.bloom_error = bloom_error
+        self.reorder_delay = reorder_delay
+        self.max_held = max_held
+
+        self.duplicates = 0
+        self.probable_duplicates = 0
+        self.late = 0
+
+        self._recent: "OrderedDict[bytes, float]" = OrderedDict()
+        self._bloom: List[BloomFilter] = [BloomFilter(bloom_capacity, bloom_error)] if bloom_capacity else []
+
+        # per tracker: heap of (timestamp, seq, arrived, msg)
+        self._held: Dict[str, List[Tuple[str, int, float, Dict[str, Any]]]] = {}
+        # per tracker, least recently released first: (timestamp, released at)
+        self._released: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._seq = itertools.count()
+
+    @property
+    def held(self) -> int:
+        """Readings waiting for reordering."""
+        return sum(len(heap) for heap in self._held.values())
+
+    @property
+    def size_bytes(self) -> int:
+        """Approximate memory used by the Bloom filters."""
+        return sum(bloom.size_bytes for bloom in self._bloom)
+
+    def add(self, msg: Dict[str, Any], now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Offer a parsed message.
+
+        Args:
+            msg: A message from parse_line().
+            now: time.monotonic() value, for callers that already have one.
+
+        Returns:
+            Messages ready for the uplink: nothing for a duplicate, the
+            message itself when not reordering, plus any held readings
+            whose delay has passed.
+        """
+        header = msg.get("header") or {}
+        payload = msg.get("payload")
+
+        if header.get("messageType", MESSAGE_TYPE_TELEMETRY) != MESSAGE_TYPE_TELEMETRY or not isinstance(payload, dict):
+            return [msg]
+
+        now = time.monotonic() if now is None else now
+        device = str(payload.get("deviceId", ""))
+        timestamp = str(payload.get("timestamp", ""))
+
+        if self._is_duplicate(self._key(msg, device, timestamp), now):
+            return []
+
+        if not self.reorder_delay:
+            return [msg]
+
+        heap = self._held.setdefault(device, [])
+        heapq.heappush(heap, (timestamp, next(self._seq), now, msg))
+
+        return self.release_expired(now)
+
+    def time_until_release(self, now: Optional[float] = None) -> Optional[float]:
+        """
+        Seconds until the next held reading is due, or None when nothing
+        is held.
+        """
+        if not self._held:
+            return None
+
+        now = time.monotonic() if now is None else now
+        due = min(heap[0][2] for heap in self._held.values()) + self.reorder_delay
+
+        return max(0.0, due - now)
+
+    def release_expired(self, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Release held readings that have waited reorder_delay, per tracker in timestamp order."""
+        now = time.monotonic() if now is None else now
+        ready = []
+
+        for device in list(self._held):
+            heap = self._held[device]
+            while heap and (heap[0][2] + self.reorder_delay <= now or len(heap) > self.max_held):
+                ready.append(self._release(device, heapq.heappop(heap), now))
+            if not heap:
+                del self._held[device]
+
+        # forget trackers that have gone quiet
+        released = self._released
+        while released:
+            device, (_, at) = next(iter(released.items()))
+            if now - at < self.max_age:
+                break
+            del released[device]
+
+        return ready
+
+    def flush_all(self) -> List[Dict[str, Any]]:
+        """Release every held reading, e.g. on shutdown."""
+        now = time.monotonic()
+        ready = []
+        for device, heap in self._held.items():
+            while heap:
+                ready.append(self._release(device, heapq.heappop(heap), now))
+        self._held = {}
+        return ready
+
+    def _release(self, device: str, item: Tuple[str, int, float, Dict[str, Any]], now: float) -> Dict[str, Any]:
+        timestamp, _, _, msg = item
+        latest, _ = self._released.get(device, ("", now))
+        if timestamp < latest:
+            self.late += 1
+        else:
+            latest = timestamp
+        self._released[device] = (latest, now)
+        self._released.move_to_end(device)
+        return msg
+
+    def _key(self, msg: Dict[str, Any], device: str, timestamp: str) -> bytes:
+        """16-byte digest of deviceId, tracker timestamp and hash."""
+        digest = claimed_hash(msg)
+        if not digest:
+            # unsigned readings: fall back on the uptime counter
+            digest = str((msg.get("payload") or {}).get("uptime", ""))
+        key = f"{device}|{timestamp}|{str(digest).lower()}".encode("utf-8")
+        return hashlib.blake2b(key, digest_size=16).digest()
+
+    def _is_duplicate(self, key: bytes, now: float) -> bool:
+        """Check and record a key."""
+        recent = self._recent
+
+        # age out the LRU from its oldest end
+        while recent:
+            _, seen = next(iter(recent.items()))
+            if now - seen < self.max_age and len(recent) < self.max_entries:
+                break
+            recent.popitem(last=False)
+
+        if key in recent:
+            recent.move_to_end(key)
+            recent[key] = now
+            self.duplicates += 1
+            logger.debug("Dropping duplicate reading.")
+            return True
+
+        recent[key] = now
+
+        if not self._bloom:
+            return False
+
+        # a Bloom hit may be a false positive; the server drops true duplicates
+        if any(key in bloom for bloom in self._bloom):
+            self.probable_duplicates += 1
+            logger.debug("Forwarding probable duplicate reading (Bloom filter hit).")
+
+        current = self._bloom[-1]
+        if key not in current:
+            if current.count >= self.bloom_capacity:
+                # start a new generation; the oldest is forgotten
+                current = BloomFilter(self.bloom_capacity, self.bloom_error)
+                self._bloom = [self._bloom[-1], current]
+            current.add(key)
+
+        return False
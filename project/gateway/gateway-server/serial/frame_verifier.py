@@ -0,0 +1,106 @@
+"""
+FrameVerifier: drop corrupted tracker frames on the gateway.
+
+Recomputes the C-compatible snippet hash for each telemetry frame and
+compares it with the digest the tracker sent. Frames that do not match
+(UART noise, truncated fields) are counted and dropped, or written to a
+size-bounded quarantine file, instead of being sent to the cloud.
+"""
+
+import json
+import logging
+import logging.handlers
+
+from typing import Any, Dict, Optional
+
+from batch_uplink import MESSAGE_TYPE_TELEMETRY
+from message_hash import claimed_hash, compute_payload_hash
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUARANTINE_MAX_BYTES = 10 * 1024 * 1024
+
+
+class FrameVerifier:
+    """
+    Check telemetry frames against their tracker hash.
+
+    Attributes:
+        verified: Frames whose hash matched.
+        mismatched: Frames dropped for a wrong or uncomputable hash.
+        unsigned: Frames that carried no hash.
+    """
+
+    def __init__(
+        self,
+        require_hash: bool = False,
+        quarantine_path: Optional[str] = None,
+        quarantine_max_bytes: int = DEFAULT_QUARANTINE_MAX_BYTES,
+    ):
+        """
+        Initialize FrameVerifier.
+
+        Args:
+            require_hash: Drop telemetry frames that carry no hash.
+            quarantine_path: File to append dropped frames to (one JSON
+                object per line); None discards them.
+            quarantine_max_bytes: Size at which the quarantine file is
+                rotated, keeping one previous file.
+        """
+        self.require_hash = require_hash
+
+        self.verified = 0
+        self.mismatched = 0
+        self.unsigned = 0
+
+        self._quarantine: Optional[logging.Logger] = None
+        if quarantine_path:
+            handler = logging.handlers.RotatingFileHandler(
+                quarantine_path, maxBytes=quarantine_max_bytes, backupCount=1
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+
+            self._quarantine = logging.getLogger(f"{__name__}.quarantine")
+            self._quarantine.addHandler(handler)
+            self._quarantine.setLevel(logging.INFO)
+            self._quarantine.propagate = False
+
+    def check(self, msg: Dict[str, Any]) -> bool:
+        """
+        Return True if msg should be forwarded.
+
+        Non-telemetry messages always pass; telemetry passes when its
+        recomputed hash equals the claimed one (case-insensitively).
+        """
+        header = msg.get("header") or {}
+        if header.get("messageType", MESSAGE_TYPE_TELEMETRY) != MESSAGE_TYPE_TELEMETRY:
+            return True
+
+        expected = claimed_hash(msg)
+        if not expected:
+            self.unsigned += 1
+            if self.require_hash:
+                self._reject(msg, "missing hash")
+                return False
+            return True
+
+        try:
+            actual = compute_payload_hash(msg["payload"])
+        except (KeyError, TypeError, ValueError) as e:
+            self._reject(msg, f"cannot hash payload: {e!r}")
+            return False
+
+        if actual.lower() != str(expected).lower():
+            self._reject(msg, f"hash mismatch, expected {expected} got {actual}")
+            return False
+
+        self.verified += 1
+        return True
+
+    def _reject(self, msg: Dict[str, Any], reason: str) -> None:
+        """Count a bad frame and quarantine it if configured."""
+        self.mismatched += 1
+        logger.warning("Dropping corrupted frame: %s", reason)
+
+        if self._quarantine:
+            self._quarantine.info(json.dumps({"reason": reason, "message": msg}))
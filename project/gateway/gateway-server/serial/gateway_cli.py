@@ -1,11 +1,34 @@
-from serial_client import SerialClient
+import re
 
-def set_device(serial_client: SerialClient, value: int):
+from typing import Callable, Optional
+
+from command_lane import Command
+
+# replies from the gateway firmware's set_device shell command
+SET_DEVICE_ACK = re.compile(rb"Next connection Dev ID will change to: (\d+)")
+SET_DEVICE_NAK = re.compile(rb"Usage: set_device|Value needs to be numerical|Value out of range")
+
+def set_device_command(value: int, on_done: Optional[Callable[[Command], None]] = None) -> Command:
+    """
+    The 'set_device' CLI command as a control Command, acknowledged by
+    the firmware's confirmation line.
+
+    Args:
+        value (int): Device ID value (must be 0–255)
+        on_done: Called with the finished Command.
     """
-    Wrapper to send the 'set_device' CLI command over serial.
+    return Command(f"set_device {value}", ack=SET_DEVICE_ACK, nak=SET_DEVICE_NAK, on_done=on_done)
+
+def set_device(serial_client, value: int) -> bool:
+    """
+    Queue the 'set_device' CLI command on the serial command lane.
 
     Args:
+        serial_client: SerialClient, or anything else with a
+            submit(Command) method such as GatewayPipeline.
         value (int): Device ID value (must be 0–255)
+
+    Returns:
+        False if the command lane was full.
     """
-    cmd = f"set_device {value}"
-    serial_client.write(cmd)
+    return serial_client.submit(set_device_command(value))
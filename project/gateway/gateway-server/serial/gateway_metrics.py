@@ -0,0 +1,302 @@
+"""
+Gateway metrics in Prometheus text format, served over local HTTP.
+
+Hot-path counters are plain integers owned by a single writer thread
+(the event loop, or the MQTT callback thread for C2D commands), so they
+are updated without locks; other threads hand their updates to the
+event loop, as GatewayPipeline does for command latencies. Values that
+components already track, such as LineFramer.bytes_fed or
+Spool.pending, are read by callbacks at scrape time and cost nothing
+between scrapes.
+
+Example
+
+curl http://127.0.0.1:9108/metrics
+"""
+
+import bisect
+import logging
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from binary_frame import FrameDecoder
+from command_lane import STATUSES
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 9108
+
+# seconds; IoT Hub publishes normally take tens to hundreds of ms
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_labels(labels: Optional[Dict[str, str]]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels.items()) + "}"
+
+
+class Counter:
+    """Monotonic counter with a single writer."""
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: int = 1) -> None:
+        self.value += amount
+
+
+class Histogram:
+    """Fixed-bucket histogram with a single writer."""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name: str, labels: Optional[Dict[str, str]]) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f"{name}_bucket{_format_labels({**(labels or {}), 'le': le})} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {self.sum}")
+        lines.append(f"{name}_count{_format_labels(labels)} {self.count}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Collection of metrics rendered together in Prometheus text format.
+
+    Each metric name has a HELP and TYPE line and one or more samples,
+    which are either Counter/Histogram objects or callbacks.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, Tuple[str, str, List[Tuple[Optional[Dict[str, str]], object]]]] = {}
+
+    def _register(self, name: str, help: str, kind: str, source, labels: Optional[Dict[str, str]]) -> None:
+        _, _, samples = self._metrics.setdefault(name, (help, kind, []))
+        samples.append((labels, source))
+
+    def counter(self, name: str, help: str, labels: Optional[Dict[str, str]] = None) -> Counter:
+        """Create and register a Counter."""
+        counter = Counter()
+        self._register(name, help, "counter", counter, labels)
+        return counter
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+        labels: Optional[Dict[str, str]] = None,
+    ) -> Histogram:
+        """Create and register a Histogram."""
+        histogram = Histogram(buckets)
+        self._register(name, help, "histogram", histogram, labels)
+        return histogram
+
+    def callback(
+        self,
+        name: str,
+        help: str,
+        kind: str,
+        fn: Callable[[], float],
+        labels: Optional[Dict[str, str]] = None,
+    ) -> None:
+        """Register a counter or gauge whose value is read at scrape time."""
+        self._register(name, help, kind, fn, labels)
+
+    def render(self) -> str:
+        """Return every metric in Prometheus text exposition format."""
+        lines = []
+        for name, (help, kind, samples) in self._metrics.items():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, source in samples:
+                if isinstance(source, Histogram):
+                    lines.extend(source.samples(name, labels))
+                    continue
+
+                value = source.value if isinstance(source, Counter) else source()
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+class GatewayMetrics:
+    """
+    The metrics reported by the gateway process.
+
+    Attributes:
+        registry: MetricsRegistry holding everything below.
+        parse_failures: Lines whose JSON could not be parsed.
+        messages_sent: Messages delivered by the uplink.
+        send_failures: Uplink sends that raised.
+        uplink_latency: Seconds per uplink send.
+        c2d_commands: Cloud-to-device messages received.
+        command_latency: Seconds from queuing a command to its acknowledgement.
+    """
+
+    def __init__(self):
+        self.registry = MetricsRegistry()
+        registry = self.registry
+
+        self.parse_failures = registry.counter(
+            "gateway_json_parse_failures_total", "Lines whose JSON could not be parsed.")
+        self.messages_sent = registry.counter(
+            "gateway_uplink_messages_sent_total", "Messages delivered by the uplink.")
+        self.send_failures = registry.counter(
+            "gateway_uplink_send_failures_total", "Uplink sends that raised.")
+        self.uplink_latency = registry.histogram(
+            "gateway_uplink_latency_seconds", "Time taken by each uplink send.")
+        self.c2d_commands = registry.counter(
+            "gateway_c2d_commands_total", "Cloud-to-device messages received.")
+        self.command_latency = registry.histogram(
+            "gateway_command_latency_seconds", "Time from queuing a serial command to its acknowledgement.")
+
+    def bind(self, pipeline) -> None:
+        """
+        Register scrape-time callbacks for the counters a GatewayPipeline's
+        components already keep.
+        """
+        registry = self.registry
+
+        for port in pipeline.ports:
+            framer = port.framer
+            labels = {"port": port.name}
+            registry.callback("gateway_serial_bytes_read_total", "Bytes read from a serial port.",
+                              "counter", lambda f=framer: f.bytes_fed, labels)
+            if isinstance(framer, FrameDecoder):
+                registry.callback("gateway_frames_decoded_total", "Binary frames with a valid CRC from a serial port.",
+                                  "counter", lambda f=framer: f.frames_framed, labels)
+                registry.callback("gateway_frame_crc_errors_total", "Binary frames dropped for a CRC mismatch.",
+                                  "counter", lambda f=framer: f.crc_errors, labels)
+                registry.callback("gateway_frame_bytes_skipped_total", "Bytes outside binary frames.",
+                                  "counter", lambda f=framer: f.skipped, labels)
+                continue
+            registry.callback("gateway_lines_framed_total", "Complete lines framed from a serial port.",
+                              "counter", lambda f=framer: f.lines_framed, labels)
+            registry.callback("gateway_line_overflows_total", "Partial lines dropped for exceeding the framer buffer.",
+                              "counter", lambda f=framer: f.overflows, labels)
+
+        for name, lane in pipeline.commands.items():
+            for status in STATUSES:
+                registry.callback("gateway_serial_commands_total", "Serial commands finished, by status.",
+                                  "counter", lambda l=lane, s=status: l.counts[s], {"port": name, "status": status})
+            registry.callback("gateway_serial_commands_pending", "Serial commands waiting to be written.",
+                              "gauge", lambda l=lane: l.pending, {"port": name})
+
+        queues = {pipeline.lines, pipeline.messages, pipeline.outbox}
+        for queue in sorted(queues, key=lambda q: q.name):
+            labels = {"queue": queue.name}
+            registry.callback("gateway_queue_depth", "Items waiting in a pipeline queue.",
+                              "gauge", queue.qsize, labels)
+            registry.callback("gateway_queue_dropped_total", "Items dropped by a drop-oldest queue.",
+                              "counter", lambda q=queue: q.dropped, labels)
+            registry.callback("gateway_queue_spilled_total", "Items written to a queue's spill file.",
+                              "counter", lambda q=queue: q.spilled, labels)
+
+        if pipeline.verifier:
+            verifier = pipeline.verifier
+            for result in ("verified", "mismatched", "unsigned"):
+                registry.callback("gateway_frames_verified_total", "Telemetry frames by hash check result.",
+                                  "counter", lambda r=result: getattr(verifier, r), {"result": result})
+
+        if pipeline.dedup:
+            dedup = pipeline.dedup
+            registry.callback("gateway_duplicates_dropped_total", "Duplicate readings dropped on the gateway.",
+                              "counter", lambda: dedup.duplicates)
+            registry.callback("gateway_probable_duplicates_total",
+                              "Readings forwarded although the Bloom filter had seen them.",
+                              "counter", lambda: dedup.probable_duplicates)
+            registry.callback("gateway_reorder_held", "Readings held for reordering.",
+                              "gauge", lambda: dedup.held)
+            registry.callback("gateway_reorder_late_total", "Readings released behind a newer one from the same tracker.",
+                              "counter", lambda: dedup.late)
+
+        if pipeline.spool:
+            spool = pipeline.spool
+            registry.callback("gateway_spool_pending", "Messages waiting in the spool.",
+                              "gauge", lambda: spool.pending)
+            registry.callback("gateway_spool_bytes", "Disk used by spool segments.",
+                              "gauge", lambda: spool.size_bytes)
+            registry.callback("gateway_spool_dropped_total", "Spooled messages dropped to respect the disk limit.",
+                              "counter", lambda: spool.dropped)
+            registry.callback("gateway_spool_corrupted_total", "Spooled records skipped for failing their CRC.",
+                              "counter", lambda: spool.corrupted)
+            registry.callback("gateway_spool_dead_lettered_total", "Spooled messages moved to the dead-letter file.",
+                              "counter", lambda: pipeline.dead_lettered)
+
+    def bind_http_uplink(self, uplink) -> None:
+        """Register scrape-time callbacks for an HttpUplink's counters."""
+        registry = self.registry
+
+        registry.callback("gateway_http_retries_total", "HTTP uplink requests retried.",
+                          "counter", lambda: uplink.retries)
+        registry.callback("gateway_http_throttled_total", "HTTP 429/503 responses from the dashboard.",
+                          "counter", lambda: uplink.throttled)
+        registry.callback("gateway_http_rejected_total", "Messages the dashboard refused as invalid (400/422).",
+                          "counter", lambda: uplink.rejected)
+
+
+class MetricsServer:
+    """
+    Serves a MetricsRegistry at /metrics on a background thread.
+    """
+
+    def __init__(self, registry: MetricsRegistry, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+        """
+        Initialize MetricsServer.
+
+        Args:
+            registry: Metrics to expose.
+            host: Interface to bind; keep the default to stay local.
+            port: TCP port to listen on.
+        """
+        self.registry = registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(handler):
+                if handler.path.split("?", 1)[0] != "/metrics":
+                    handler.send_error(404)
+                    return
+
+                body = registry.render().encode("utf-8")
+                handler.send_response(200)
+                handler.send_header("Content-Type", CONTENT_TYPE)
+                handler.send_header("Content-Length", str(len(body)))
+                handler.end_headers()
+                handler.wfile.write(body)
+
+            def log_message(handler, format, *args):
+                logger.debug("metrics: " + format, *args)
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def start(self) -> None:
+        """Start serving on the background thread."""
+        self._thread.start()
+        host, port = self._server.server_address[:2]
+        logger.info("Serving metrics on http://%s:%d/metrics", host, port)
+
+    def stop(self) -> None:
+        """Stop serving and close the socket."""
+        self._server.shutdown()
+        self._server.server_close()
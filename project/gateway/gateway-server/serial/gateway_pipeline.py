@@ -0,0 +1,612 @@
+"""
+GatewayPipeline: asyncio gateway with decoupled reader, parser and
+uplink stages.
+
+Each serial port is watched by the event loop's selector and framed into
+lines by its own LineFramer, or into binary frames by a FrameDecoder,
+so one process serves dozens of ports without a thread per port. Lines
+and frames from every port are parsed into messages, and messages are
+handed to a single shared uplink.
+Writes to a port, such as cloud-to-device commands, go through the
+port's CommandLane, whose acknowledgements are matched as lines are
+read rather than after they have queued behind telemetry.
+Stages are joined by bounded BackpressureQueues, so a slow MQTT publish
+only ever fills the message queue and never stalls serial reads.
+
+Optional stages:
+
+    FrameVerifier     drops frames whose tracker hash does not match
+    DedupWindow       drops duplicate readings and optionally reorders
+                      each tracker's readings by timestamp
+    TelemetryBatcher  sends readings as batch_telemetry envelopes
+    Spool             stores messages the uplink fails to deliver and
+                      replays them at a limited rate once it recovers;
+                      one that keeps failing while the link is up goes
+                      to a dead-letter file
+    GatewayMetrics    counts throughput, failures and uplink latency
+"""
+
+import asyncio
+import dataclasses
+import json
+import logging
+import logging.handlers
+import os
+import serial
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from batch_uplink import TelemetryBatcher
+from binary_frame import FrameDecoder, is_frame, parse_frame, FRAMING_BINARY, FRAMING_LINES
+from command_lane import Command, CommandLane, PRIORITY_INTERACTIVE, STATUS_ACKED
+from dedup_window import DedupWindow
+from frame_verifier import FrameVerifier
+from http_client import UplinkError
+from gateway_metrics import GatewayMetrics
+from line_framer import LineFramer
+from message_parser import parse_line
+from pipeline_queue import BackpressureQueue, SpillFile, POLICY_BLOCK, POLICY_SPILL
+from spool import Spool, SpoolHandle
+
+logger = logging.getLogger(__name__)
+
+READ_SIZE = 1024
+DEFAULT_QUEUE_SIZE = 1024
+DEFAULT_DRAIN_RATE = 20.0
+DEFAULT_RETRY_INTERVAL_S = 10.0
+DEFAULT_MAX_ATTEMPTS = 3
+SPOOL_IDLE_S = 1.0
+
+DEAD_LETTER_FILE = "dead-letter.jsonl"
+DEFAULT_DEAD_LETTER_MAX_BYTES = 10 * 1024 * 1024
+
+# uplink errors meaning the link is down rather than that the message is
+# bad; senders with their own, like the IoT Hub client, add them
+TRANSPORT_ERRORS = (OSError, UplinkError)
+
+
+def _encode_message(msg: Dict[str, Any]) -> bytes:
+    return json.dumps(msg).encode("utf-8")
+
+
+class SerialPort:
+    """
+    One non-blocking serial port and the framer for its byte stream.
+
+    Attributes:
+        name: Serial port path.
+        ser: The underlying Serial object.
+        framer: LineFramer or FrameDecoder holding partial data between reads.
+    """
+
+    def __init__(self, name: str, baudrate: int, framing: str = FRAMING_LINES):
+        """
+        Initialize SerialPort.
+
+        Args:
+            name: Serial port path (e.g. "/dev/ttyUSB0").
+            baudrate: Baud rate for communication.
+            framing: "lines" for JSON text, "binary" for binary frames.
+        """
+        self.name = name
+        self.ser = serial.Serial(name, baudrate, timeout=0)
+        self.framer = FrameDecoder() if framing == FRAMING_BINARY else LineFramer()
+
+    def fileno(self) -> Optional[int]:
+        """File descriptor for the selector, or None where unsupported."""
+        try:
+            return self.ser.fileno()
+        except (AttributeError, OSError):
+            return None
+
+
+class GatewayPipeline:
+    """
+    Reader → parser → uplink pipeline running on an asyncio event loop.
+
+    Attributes:
+        ports: The SerialPorts being read.
+        lines: Queue of raw lines and binary frames between the reader
+            and parser stages.
+        messages: Queue of parsed messages leaving the parser stage.
+        outbox: Queue feeding the uplink stage; the batch queue when
+            batching, otherwise the message queue itself.
+        commands: CommandLane per port name.
+    """
+
+    def __init__(
+        self,
+        ports: str | SerialPort | Sequence[str | SerialPort],
+        baudrate: int,
+        send: Callable[[Dict[str, Any]], None],
+        *,
+        framing: str = FRAMING_LINES,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        policy: str = POLICY_BLOCK,
+        spill_dir: Optional[str] = None,
+        uplink_workers: int = 1,
+        batcher: Optional[TelemetryBatcher] = None,
+        spool: Optional[Spool] = None,
+        drain_rate: float = DEFAULT_DRAIN_RATE,
+        retry_interval: float = DEFAULT_RETRY_INTERVAL_S,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        transport_errors: Sequence[type] = (),
+        dead_letter_path: Optional[str] = None,
+        verifier: Optional[FrameVerifier] = None,
+        dedup: Optional[DedupWindow] = None,
+        metrics: Optional[GatewayMetrics] = None,
+        echo: Optional[Callable[[bytes], None]] = None,
+    ):
+        """
+        Initialize GatewayPipeline.
+
+        Args:
+            ports: Serial port path (e.g. "/dev/ttyUSB0"), or several.
+                Already-open SerialPort objects are used as they are.
+            baudrate: Baud rate for communication, shared by all ports.
+            send: Blocking uplink call, e.g. AzureIoTHubMqttClient.send_telemetry.
+                It runs on a worker thread, never on the event loop.
+            framing: How ports opened here frame their bytes: "lines" of
+                JSON text, or "binary" frames.
+            queue_size: In-memory capacity of each stage queue.
+            policy: Backpressure policy for both queues.
+            spill_dir: Directory for spill files when policy is "spill".
+            uplink_workers: Number of concurrent uplink calls.
+            batcher: Groups readings into batch_telemetry envelopes
+                before the uplink; None sends every message on its own.
+            spool: On-disk store for messages the uplink fails to send;
+                None drops them.
+            drain_rate: Spooled messages replayed per second once the
+                uplink is reachable again.
+            retry_interval: Seconds between delivery attempts while the
+                uplink is unreachable.
+            max_attempts: Replays of a spooled message failing with
+                anything but a transport error before it is dead-lettered.
+            transport_errors: Exceptions of send, besides TRANSPORT_ERRORS,
+                that mean the uplink is unreachable.
+            dead_letter_path: File to append dead-lettered messages to (one
+                JSON object per line); defaults to DEAD_LETTER_FILE in the
+                spool directory.
+            verifier: Drops frames with a bad tracker hash before they
+                are queued for the uplink; None forwards every frame.
+            dedup: Drops duplicate readings, and reorders them if it has
+                a reorder delay; None forwards every reading.
+            metrics: Updated from the event loop as lines are parsed
+                and messages sent.
+            echo: Given every raw line for display, e.g. ConsoleSink.offer;
+                None runs headless.
+        """
+        if isinstance(ports, (str, SerialPort)):
+            ports = [ports]
+
+        self.ports: List[SerialPort] = []
+        for name in ports:
+            if isinstance(name, SerialPort):
+                self.ports.append(name)
+                continue
+            try:
+                self.ports.append(SerialPort(name, baudrate, framing))
+            except Exception as e:
+                logger.error(f"Error initialising serial port {name} failed with {e}")
+
+        if not self.ports:
+            exit(1)
+
+        # binary ports skip text, so shell replies cannot be matched there
+        self.commands: Dict[str, CommandLane] = {
+            port.name: CommandLane(
+                port.ser.write,
+                name=port.name,
+                expect_acks=not isinstance(port.framer, FrameDecoder),
+                on_done=self._command_done,
+            )
+            for port in self.ports
+        }
+
+        spill = policy == POLICY_SPILL
+
+        self.lines = BackpressureQueue(
+            "lines", queue_size, policy,
+            spill=SpillFile(spill_dir) if spill else None,
+        )
+        self.messages = BackpressureQueue(
+            "messages", queue_size, policy,
+            spill=SpillFile(spill_dir, encode=_encode_message, decode=json.loads) if spill else None,
+        )
+
+        # batches are few and large, so a short lossless queue is enough;
+        # backpressure then lands on the message queue and its policy
+        self.batcher = batcher
+        self.outbox = (
+            BackpressureQueue("batches", 2 * uplink_workers) if batcher else self.messages
+        )
+
+        self.verifier = verifier
+        self.dedup = dedup
+        self.spool = spool
+        self._echo = echo
+        self._drain_rate = drain_rate
+        self._retry_interval = retry_interval
+        self._max_attempts = max_attempts
+        self._transport_errors = TRANSPORT_ERRORS + tuple(transport_errors)
+        self._online = True
+        # messages a stage took off its queue but was cancelled before handling
+        self._held: List[Dict[str, Any]] = []
+
+        self.dead_lettered = 0
+        self._dead_letter: Optional[logging.Logger] = None
+        if spool:
+            handler = logging.handlers.RotatingFileHandler(
+                dead_letter_path or os.path.join(spool.directory, DEAD_LETTER_FILE),
+                maxBytes=DEFAULT_DEAD_LETTER_MAX_BYTES, backupCount=1,
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+
+            self._dead_letter = logging.getLogger(f"{__name__}.dead_letter")
+            self._dead_letter.addHandler(handler)
+            self._dead_letter.setLevel(logging.INFO)
+            self._dead_letter.propagate = False
+
+        self._send = send
+        self._uplink_workers = uplink_workers
+        self._stop_event = asyncio.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.metrics = metrics
+        if metrics:
+            metrics.bind(self)
+
+        # only used for ports the selector cannot watch (e.g. on Windows)
+        self._read_executor = ThreadPoolExecutor(max_workers=len(self.ports), thread_name_prefix="serial-reader")
+        self._uplink_executor = ThreadPoolExecutor(max_workers=uplink_workers, thread_name_prefix="uplink")
+        # replay runs on its own thread so it never takes a live uplink worker
+        self._drain_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="spool-drain")
+
+    def write(self, data: str) -> None:
+        """
+        Queue a line for every serial port (appends newline), behind any
+        control commands.
+
+        Args:
+            data: The text line to send.
+        """
+        self.submit(Command(data, priority=PRIORITY_INTERACTIVE))
+
+    def submit(self, command: Command, port: Optional[str] = None) -> bool:
+        """
+        Queue a command on one port's CommandLane, or a copy on every
+        port's; safe to call from any thread, e.g. the MQTT callback.
+
+        Returns:
+            False if a lane was full and dropped the command.
+        """
+        lanes = [self.commands[port]] if port else list(self.commands.values())
+
+        ok = True
+        for i, lane in enumerate(lanes):
+            ok = lane.submit(command if i == 0 else dataclasses.replace(command)) and ok
+        return ok
+
+    def _command_done(self, command: Command) -> None:
+        """
+        Record an acknowledged command's latency. Runs on the lane's writer
+        thread, so the observation is handed to the event loop, the
+        histogram's only writer.
+        """
+        if not self.metrics or command.status != STATUS_ACKED or self._loop is None:
+            return
+
+        try:
+            self._loop.call_soon_threadsafe(self.metrics.command_latency.observe, command.latency)
+        except RuntimeError:
+            # the loop has already closed during shutdown
+            pass
+
+    def stop(self) -> None:
+        """Signal run() to cancel the stages and return."""
+        self._stop_event.set()
+
+    async def run(self) -> None:
+        """Run all stages until stop() is called."""
+        self._loop = asyncio.get_running_loop()
+
+        tasks: List[asyncio.Task] = [
+            asyncio.create_task(self._read_stage(port), name=f"reader-{port.name}")
+            for port in self.ports
+        ]
+        tasks.append(asyncio.create_task(self._parse_stage(), name="parser"))
+        if self.dedup and self.dedup.reorder_delay:
+            tasks.append(asyncio.create_task(self._reorder_stage(), name="reorder"))
+        if self.batcher:
+            tasks.append(asyncio.create_task(self._batch_stage(), name="batcher"))
+        tasks += [
+            asyncio.create_task(self._uplink_stage(), name=f"uplink-{i}")
+            for i in range(self._uplink_workers)
+        ]
+        if self.spool:
+            tasks.append(asyncio.create_task(self._drain_stage(), name="spool-drain"))
+
+        for port in self.ports:
+            self.commands[port.name].start()
+            logger.info("Started pipeline on %s @ %d", port.name, port.ser.baudrate)
+
+        try:
+            await self._stop_event.wait()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+            self._flush_pending()
+
+            self._read_executor.shutdown(wait=True)
+            self._uplink_executor.shutdown(wait=True)
+            self._drain_executor.shutdown(wait=True)
+            for lane in self.commands.values():
+                lane.stop()
+            for port in self.ports:
+                port.ser.close()
+            if self.spool:
+                self.spool.close()
+            self.lines.close()
+            self.messages.close()
+
+            logger.info(
+                "Pipeline stopped. lines dropped=%d spilled=%d, messages dropped=%d spilled=%d",
+                self.lines.dropped, self.lines.spilled,
+                self.messages.dropped, self.messages.spilled,
+            )
+
+    async def _read_stage(self, port: SerialPort) -> None:
+        """Queue complete lines from one port whenever it becomes readable."""
+        loop = asyncio.get_running_loop()
+        lane = self.commands[port.name]
+
+        fd = port.fileno()
+        if fd is None:
+            await self._read_stage_threaded(port)
+            return
+
+        readable = asyncio.Event()
+        loop.add_reader(fd, readable.set)
+
+        try:
+            while True:
+                await readable.wait()
+                readable.clear()
+
+                try:
+                    chunk = port.ser.read(READ_SIZE)
+                except serial.SerialException as e:
+                    logger.error("Stopped reading %s: %s", port.name, e)
+                    return
+
+                for line in port.framer.feed(chunk):
+                    lane.observe(line)
+                    data = bytes(line)
+
+                    if not self.lines.would_block():
+                        await self.lines.put(data)
+                        continue
+
+                    # the selector is level-triggered: while we wait for room,
+                    # unread bytes would wake the loop on every iteration
+                    loop.remove_reader(fd)
+                    try:
+                        await self.lines.put(data)
+                    finally:
+                        loop.add_reader(fd, readable.set)
+        finally:
+            loop.remove_reader(fd)
+
+    async def _read_stage_threaded(self, port: SerialPort) -> None:
+        """Fallback reader using blocking reads on a worker thread."""
+        loop = asyncio.get_running_loop()
+        lane = self.commands[port.name]
+        port.ser.timeout = 0.1
+
+        while True:
+            try:
+                chunk = await loop.run_in_executor(self._read_executor, port.ser.read, READ_SIZE)
+            except serial.SerialException as e:
+                logger.error("Stopped reading %s: %s", port.name, e)
+                return
+
+            for line in port.framer.feed(chunk):
+                lane.observe(line)
+                await self.lines.put(bytes(line))
+
+    async def _parse_stage(self) -> None:
+        """Parse queued lines and binary frames into messages for the uplink."""
+        while True:
+            line = await self.lines.get()
+
+            # a text line never starts with the frame sync word
+            parse = parse_frame if is_frame(line) else parse_line
+
+            parsed: List[Dict[str, Any]] = []
+            try:
+                ok = parse(line, parsed.append, self._echo)
+            except Exception as e:
+                logger.error("Failed to parse line: %s", e)
+                ok = False
+
+            if not ok and self.metrics:
+                self.metrics.parse_failures.inc()
+
+            for msg in parsed:
+                if self.verifier and not self.verifier.check(msg):
+                    continue
+                if self.dedup:
+                    for ready in self.dedup.add(msg):
+                        await self.messages.put(ready)
+                    continue
+                await self.messages.put(msg)
+
+    async def _reorder_stage(self) -> None:
+        """Release readings held for reordering once their delay has passed."""
+        while True:
+            timeout = self.dedup.time_until_release()
+            await asyncio.sleep(self.dedup.reorder_delay if timeout is None else timeout)
+
+            for msg in self.dedup.release_expired():
+                await self.messages.put(msg)
+
+    async def _batch_stage(self) -> None:
+        """Group parsed messages into envelopes, flushing on size or latency."""
+        # one get() is kept across timeouts: cancelling it, as wait_for()
+        # does, loses a message that arrives just as the timeout fires
+        get: Optional[asyncio.Task] = None
+
+        try:
+            while True:
+                if get is None:
+                    get = asyncio.create_task(self.messages.get())
+
+                done, _ = await asyncio.wait({get}, timeout=self.batcher.time_until_flush())
+
+                if get in done:
+                    ready = self.batcher.add(get.result())
+                    get = None
+                else:
+                    ready = self.batcher.flush_expired()
+
+                for envelope in ready:
+                    await self.outbox.put(envelope)
+        finally:
+            if get is not None and not get.cancel() and not get.cancelled():
+                # got a message just as the stage was cancelled
+                self._held.append(get.result())
+
+    def _flush_pending(self) -> None:
+        """
+        Send readings still held for reordering and any open batches on
+        shutdown, blocking until they complete.
+        """
+        envelopes = self._held + (self.dedup.flush_all() if self.dedup else [])
+        self._held = []
+
+        if self.batcher:
+            batched = []
+            for msg in envelopes:
+                batched += self.batcher.add(msg)
+            envelopes = batched + self.batcher.flush_all()
+
+        if not envelopes:
+            return
+
+        logger.info("Flushing %d pending messages before shutdown.", len(envelopes))
+        futures = [self._uplink_executor.submit(self._send, envelope) for envelope in envelopes]
+        for envelope, future in zip(envelopes, futures):
+            error = future.exception()
+            if error:
+                self._store(envelope, error)
+
+    async def _uplink_stage(self) -> None:
+        """Send queued messages using the blocking uplink on a worker thread."""
+        while True:
+            msg = await self.outbox.get()
+
+            if self.spool and not self._online:
+                # don't wait on a dead link; the drain stage probes it
+                self.spool.append(_encode_message(msg))
+                continue
+
+            try:
+                await self._timed_send(self._uplink_executor, msg)
+            except Exception as e:
+                self._store(msg, e)
+
+    async def _timed_send(self, executor: ThreadPoolExecutor, msg: Dict[str, Any]) -> None:
+        """Run the blocking uplink on executor, recording metrics."""
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+
+        try:
+            await loop.run_in_executor(executor, self._send, msg)
+        except Exception:
+            if self.metrics:
+                self.metrics.send_failures.inc()
+            raise
+
+        if self.metrics:
+            self.metrics.messages_sent.inc()
+            self.metrics.uplink_latency.observe(loop.time() - started)
+
+    def _store(self, msg: Dict[str, Any], error: BaseException) -> None:
+        """
+        Spool a message that failed to send, or drop it without a spool.
+        Only a transport error takes the uplink offline; a message that
+        failed on its own is retried, then dead-lettered, by the drain stage.
+        """
+        if not self.spool:
+            logger.error("Uplink failed: %s", error)
+            return
+
+        if not isinstance(error, self._transport_errors):
+            logger.warning("Uplink failed to send a message (%s); spooling it for retry.", error)
+        elif self._online:
+            logger.warning("Uplink failed (%s); spooling until it recovers.", error)
+            self._online = False
+
+        self.spool.append(_encode_message(msg))
+
+    async def _drain_stage(self) -> None:
+        """Replay spooled messages at drain_rate while the uplink is up."""
+        loop = asyncio.get_running_loop()
+        interval = 1.0 / self._drain_rate
+        # failures of the head record other than transport errors
+        attempts = 0
+        last_handle = None
+
+        while True:
+            head = self.spool.peek()
+            if head is None:
+                await asyncio.sleep(SPOOL_IDLE_S)
+                continue
+
+            data, handle = head
+            if handle != last_handle:
+                # a new head, or the old one was dropped while we waited
+                attempts = 0
+                last_handle = handle
+
+            started = loop.time()
+            try:
+                await self._timed_send(self._drain_executor, json.loads(data))
+            except self._transport_errors as e:
+                self._online = False
+                logger.debug("Spool replay failed: %s", e)
+                # records pile up while offline; get them onto disk
+                self.spool.flush()
+                await asyncio.sleep(self._retry_interval)
+                continue
+            except Exception as e:
+                attempts += 1
+                if attempts < self._max_attempts:
+                    logger.warning("Spooled message failed (%s); attempt %d of %d.", e, attempts, self._max_attempts)
+                    await asyncio.sleep(self._retry_interval)
+                    continue
+
+                self._dead_letter_head(data, handle, e)
+                continue
+
+            if not self._online:
+                logger.info("Uplink recovered; replaying %d spooled messages.", self.spool.pending)
+                self._online = True
+
+            self.spool.pop(handle)
+            await asyncio.sleep(max(0.0, started + interval - loop.time()))
+
+    def _dead_letter_head(self, data: bytes, handle: SpoolHandle, error: BaseException) -> None:
+        """Move the spool's head record to the dead-letter file, unless it has since been dropped."""
+        if not self.spool.pop(handle):
+            return
+
+        self.dead_lettered += 1
+        logger.error("Spooled message failed %d times (%s); dead-lettering it.", self._max_attempts, error)
+
+        self._dead_letter.info(json.dumps({
+            "reason": repr(error),
+            "message": data.decode("utf-8", errors="replace"),
+        }))
@@ -1,21 +1,222 @@
 """
-Simple HTTP client for posting JSON payloads.
+HTTP uplink posting gateway messages straight to the dashboard's
+/api/telemetry/gateway/ endpoint, without IoT Hub.
+
+HttpUplink keeps one keep-alive session per uplink worker thread, so
+concurrent sends reuse their connections instead of opening one per
+message. Failed requests are retried with jittered exponential backoff,
+and a 429 or 503 Retry-After pauses every worker until it has passed.
+
+Example
+
+uplink = HttpUplink(compress=True)
+uplink.send(message)
 """
 
 import logging
+import random
 import requests
 import os
-import json
+import threading
+import time
 
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, List, Optional
 from uuid import uuid4
 from datetime import datetime
 
+from requests.adapters import HTTPAdapter
+
+from uplink_encoding import encode_message, CONTENT_TYPE_JSON, CONTENT_ENCODING_DEFLATE
+
 logger = logging.getLogger(__name__)
 
 from dotenv import load_dotenv
 
 load_dotenv()
 
+DEFAULT_SERVER_URL = "http://localhost:8000/api/telemetry/gateway/"
+DEFAULT_TIMEOUT_S = 5.0
+CONNECT_TIMEOUT_S = 3.05
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BACKOFF_S = 0.5
+DEFAULT_MAX_BACKOFF_S = 30.0
+
+# responses worth retrying at once
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+THROTTLE_STATUSES = {429, 503}
+# responses meaning the message itself is bad; resending it cannot succeed.
+# Any other failure, e.g. 401/403 for a revoked key or 404 for a wrong URL,
+# is the gateway's problem, so send() raises and the message is spooled.
+REJECT_STATUSES = {400, 422}
+
+
+class UplinkError(Exception):
+    """Raised when a message could not be delivered after every retry."""
+
+
+def retry_after(response: requests.Response) -> Optional[float]:
+    """Seconds requested by a Retry-After header, or None."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class HttpUplink:
+    """
+    Blocking, thread-safe uplink to the dashboard's telemetry endpoint.
+
+    Use send() as a GatewayPipeline uplink; run several uplink workers to
+    keep that many requests in flight.
+
+    Attributes:
+        url: Telemetry endpoint.
+        retries: Requests retried after a failure.
+        throttled: 429/503 responses received.
+        rejected: Messages dropped because the server refused them
+            (REJECT_STATUSES).
+    """
+
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        api_key: Optional[str] = None,
+        content_type: str = CONTENT_TYPE_JSON,
+        compress: bool = False,
+        timeout: float = DEFAULT_TIMEOUT_S,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        backoff: float = DEFAULT_BACKOFF_S,
+        max_backoff: float = DEFAULT_MAX_BACKOFF_S,
+    ):
+        """
+        Initialize HttpUplink.
+
+        Args:
+            url: Telemetry endpoint; defaults to LOCAL_SERVER_URL.
+            api_key: Dashboard API key; defaults to API_KEY.
+            content_type: Body encoding, see uplink_encoding.
+            compress: Deflate request bodies.
+            timeout: Seconds to wait for a response.
+            max_retries: Retries before send() raises UplinkError.
+            backoff: Base delay in seconds, doubled on each retry.
+            max_backoff: Upper bound on a single retry delay.
+        """
+        self.url = url or os.getenv("LOCAL_SERVER_URL", DEFAULT_SERVER_URL)
+        self.headers = {"Authorization": f"Api-Key {api_key or os.getenv('API_KEY')}"}
+        self.content_type = content_type
+        self.compress = compress
+        self.timeout = (CONNECT_TIMEOUT_S, timeout)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        self.retries = 0
+        self.throttled = 0
+        self.rejected = 0
+
+        self._local = threading.local()
+        self._sessions: List[requests.Session] = []
+        self._lock = threading.Lock()
+        # monotonic time before which no worker sends, set by Retry-After
+        self._not_before = 0.0
+
+    def _session(self) -> requests.Session:
+        """The calling thread's keep-alive session."""
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.mount(self.url, HTTPAdapter(pool_connections=1, pool_maxsize=1, max_retries=0))
+            session.headers.update(self.headers)
+            self._local.session = session
+            with self._lock:
+                self._sessions.append(session)
+        return session
+
+    def send(self, data: Dict[str, Any]) -> None:
+        """
+        POST one message, retrying transient failures.
+
+        Messages the server rejects as invalid (400/422) are logged and
+        dropped, since resending them cannot succeed. Other failures are
+        retried if transient, otherwise raised at once.
+
+        Raises:
+            UplinkError: If every attempt failed, or the server refused the
+                request for a reason other than the message, such as
+                401/403/404.
+        """
+        body, content_type, content_encoding = encode_message(data, self.content_type, self.compress)
+        headers = {"Content-Type": content_type}
+        if content_encoding == CONTENT_ENCODING_DEFLATE:
+            headers["Content-Encoding"] = content_encoding
+
+        session = self._session()
+        error = ""
+
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                with self._lock:
+                    self.retries += 1
+
+            wait = self._not_before - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+
+            delay = None
+            try:
+                resp = session.post(self.url, data=body, headers=headers, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = str(e)
+            else:
+                if resp.status_code < 400:
+                    logger.debug("Posted %d bytes → %s [%d]", len(body), self.url, resp.status_code)
+                    return
+
+                error = f"{resp.status_code} {resp.text[:200]}"
+                if resp.status_code in REJECT_STATUSES:
+                    with self._lock:
+                        self.rejected += 1
+                    logger.error("Server rejected message: %s", error)
+                    return
+
+                if resp.status_code not in RETRY_STATUSES:
+                    raise UplinkError(f"POST to {self.url} refused: {error}")
+
+                if resp.status_code in THROTTLE_STATUSES:
+                    delay = retry_after(resp)
+                    with self._lock:
+                        self.throttled += 1
+                        if delay is not None:
+                            self._not_before = max(self._not_before, time.monotonic() + delay)
+
+            if attempt == self.max_retries:
+                break
+
+            if delay is None:
+                # full jitter keeps retrying workers from moving in lockstep
+                delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+            logger.debug("POST failed (%s); retrying in %.2fs", error, delay)
+            time.sleep(delay)
+
+        raise UplinkError(f"POST to {self.url} failed after {self.max_retries + 1} attempts: {error}")
+
+    def close(self) -> None:
+        """Close every worker's session and its connections."""
+        with self._lock:
+            for session in self._sessions:
+                session.close()
+            self._sessions = []
+
 def send_test_message_to_local_server():
     """
     POST a JSON payload to the configured server.
@@ -61,19 +262,14 @@ def send_test_message_to_local_server():
       }
     }
 
-    server_url = os.getenv("LOCAL_SERVER_URL", "http://localhost:8000/api/telemetry/gateway/")
-
-    headers = {
-        "Authorization": f"Api-Key {os.getenv('API_KEY')}",
-        "Content-Type": "application/json",
-    }
+    uplink = HttpUplink()
 
     try:
-        resp = requests.post(server_url, headers=headers, data=json.dumps(payload), timeout=5)
-        resp.raise_for_status()
-
-        logger.info("Posted JSON → %s [%d]", server_url, resp.status_code)
+        uplink.send(payload)
+        logger.info("Posted JSON → %s", uplink.url)
 
     except Exception as exc:
-        logger.error("Failed to POST JSON: %s %s", exc, resp.text if 'resp' in locals() else "")
+        logger.error("Failed to POST JSON: %s", exc)
+    finally:
+        uplink.close()
 
@@ -0,0 +1,154 @@
+"""
+LineFramer: incremental newline framing over a preallocated buffer.
+
+Bytes read from the serial port are copied once into a fixed-size
+bytearray. Complete lines are handed out as memoryview slices over that
+buffer, and the scan for the delimiter resumes where the previous one
+stopped, so framing a backlog is linear in its size instead of copying
+the remaining bytes for every line like bytearray.partition() does.
+"""
+
+import logging
+
+from typing import Iterator
+
+logger = logging.getLogger(__name__)
+
+# Largest partial line kept between reads. Tracker frames are < 1 KiB, so
+# anything that grows past this without a newline is UART garbage.
+DEFAULT_CAPACITY = 64 * 1024
+
+
+class LineFramer:
+    """
+    Split a byte stream into delimiter-terminated lines without copying.
+
+    Each yielded memoryview excludes the delimiter and is only valid until
+    the next line is requested from the framer; callers that need to keep
+    a line around must copy it with bytes(line).
+
+    Attributes:
+        bytes_fed: Total bytes passed to feed().
+        lines_framed: Total complete lines yielded.
+        overflows: Partial lines dropped for exceeding the capacity.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, delimiter: bytes = b"\n"):
+        """
+        Initialize LineFramer.
+
+        Args:
+            capacity: Size of the preallocated buffer, i.e. the longest
+                line that can be framed.
+            delimiter: Byte sequence terminating each line.
+        """
+        if capacity < len(delimiter):
+            raise ValueError("LineFramer capacity must hold at least the delimiter")
+
+        self._buf = bytearray(capacity)
+        self._view = memoryview(self._buf)
+        self._capacity = capacity
+        self._delimiter = delimiter
+
+        self._start = 0    # first byte of the current (partial) line
+        self._end = 0      # one past the last byte written
+        self._scan = 0     # no delimiter exists in [start, scan)
+        self._discarding = False
+
+        self.bytes_fed = 0
+        self.lines_framed = 0
+        self.overflows = 0
+
+    @property
+    def pending(self) -> int:
+        """Number of buffered bytes belonging to an incomplete line."""
+        return self._end - self._start
+
+    def reset(self) -> None:
+        """Drop any buffered partial line."""
+        self._start = self._end = self._scan = 0
+        self._discarding = False
+
+    def feed(self, data) -> Iterator[memoryview]:
+        """
+        Append data and yield every line it completes.
+
+        The generator must be exhausted before feed() is called again,
+        otherwise the unconsumed part of data is lost.
+
+        Args:
+            data: Any bytes-like object (bytes, bytearray, memoryview).
+
+        Yields:
+            memoryview slices of the internal buffer, one per line.
+        """
+        data = memoryview(data).cast("B")
+        self.bytes_fed += len(data)
+
+        while data:
+            n = self._reserve(len(data))
+            self._view[self._end:self._end + n] = data[:n]
+            self._end += n
+            data = data[n:]
+
+            yield from self._drain()
+
+    def _reserve(self, wanted: int) -> int:
+        """
+        Make room at the tail of the buffer for up to `wanted` bytes.
+
+        Returns:
+            Number of bytes that can be written at self._end.
+        """
+        if self._start == self._end:
+            self._start = self._end = self._scan = 0
+
+        free = self._capacity - self._end
+        if free >= wanted:
+            return wanted
+
+        if self._start:
+            # slide the partial line to the front; it is at most one line long
+            size = self._end - self._start
+            self._view[:size] = self._view[self._start:self._end]
+            self._scan -= self._start
+            self._start = 0
+            self._end = size
+            free = self._capacity - size
+
+        if free == 0:
+            # a whole buffer without a delimiter: drop it and skip to the next
+            # one, keeping the tail that may be the start of a split delimiter
+            logger.warning("Line exceeds %d bytes; discarding.", self._capacity)
+            self.overflows += 1
+            keep = min(len(self._delimiter) - 1, self._end)
+            self._view[:keep] = self._view[self._end - keep:self._end]
+            self._start = self._scan = 0
+            self._end = keep
+            self._discarding = True
+            free = self._capacity - keep
+
+        return min(wanted, free)
+
+    def _drain(self) -> Iterator[memoryview]:
+        """Yield the complete lines currently in the buffer."""
+        buf = self._buf
+        delimiter = self._delimiter
+        width = len(delimiter)
+
+        while True:
+            idx = buf.find(delimiter, self._scan, self._end)
+            if idx < 0:
+                # a multi-byte delimiter may straddle the next write
+                self._scan = max(self._start, self._end - width + 1)
+                return
+
+            start = self._start
+            self._start = self._scan = idx + width
+
+            if self._discarding:
+                self._discarding = False
+                continue
+
+            self.lines_framed += 1
+            yield self._view[start:idx]
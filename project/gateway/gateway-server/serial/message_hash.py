@@ -6,8 +6,29 @@ JSON_BUFFER_SIZE = 352
 def compute_tracker_hash(json_message: str) -> str:
     # 1. parse the full JSON, dig into payload
     msg = json.loads(json_message)
-    payload = msg['payload']
 
+    return compute_payload_hash(msg['payload'])
+
+def compute_payload_hash(payload: dict) -> str:
+    data = format_payload_snippet(payload)
+
+    # 4. pad out to JSON_BUFFER_SIZE bytes with NULs
+    if len(data) + 1 > JSON_BUFFER_SIZE:
+        raise ValueError("Formatted JSON too large!")
+    # +1 for the C snprintf’s trailing NULL; but since we pad with zeros
+    # a simple left-pad works:
+    buf = data.ljust(JSON_BUFFER_SIZE, b'\0')
+
+    # 5. compute SHA256
+    digest = hashlib.sha256(buf).hexdigest()
+
+    return digest
+
+def format_payload_snippet(payload: dict) -> bytes:
+    """
+    The `"payload":{...}` snippet exactly as the tracker's snprintf wrote
+    it, as ASCII bytes.
+    """
     # 2. pull out the *string* values exactly as C printed them:
     ts = payload['timestamp'] # e.g. "2025-05-29T13:27:32"
     up = payload['uptime'] # e.g. "61"
@@ -50,15 +71,14 @@ def compute_tracker_hash(json_message: str) -> str:
         f'}}'
     )
 
-    # 4. turn it into bytes and pad out to 1024 bytes with NULs
-    data = snippet.encode('ascii')
-    if len(data) + 1 > JSON_BUFFER_SIZE:
-        raise ValueError("Formatted JSON too large!")
-    # +1 for the C snprintf’s trailing NULL; but since we pad with zeros
-    # a simple left-pad works:
-    buf = data.ljust(JSON_BUFFER_SIZE, b'\0')
+    return snippet.encode('ascii')
 
-    # 5. compute SHA256
-    digest = hashlib.sha256(buf).hexdigest()
+def claimed_hash(msg: dict) -> str | None:
+    """
+    The digest the tracker sent with a message: payload['hash'] if
+    present, otherwise the signature value.
+    """
+    payload = msg.get('payload') or {}
+    signature = msg.get('signature') or {}
 
-    return digest
+    return payload.get('hash') or signature.get('value') or None
@@ -1,6 +1,16 @@
 """
 Parse incoming byte buffers for JSON payloads embedded in log lines,
 and forward valid ones via HTTP.
+
+Lines are normally framed by LineFramer in SerialClient and passed to
+parse_line(); parse_buffer() remains for callers holding a raw buffer.
+
+JSON is extracted on bytes by extract_json(). If orjson is installed
+(an optional entry in requirements.txt) it is tried first, falling back
+to the standard library for anything it rejects.
+
+Raw lines are only shown on the terminal when an echo callable such as
+ConsoleSink.offer is passed; headless gateways never decode them.
 """
 
 import json
@@ -9,18 +19,26 @@ import re
 
 from datetime import datetime
 
-from prompt_toolkit import print_formatted_text
-from prompt_toolkit.formatted_text import ANSI
+from typing import Any, Callable, Optional
 
-from typing import Callable
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
+# control bytes (colour codes, \r, stray NULs) removed before parsing
+_CONTROL_BYTES = bytes(range(0x20))
+
+# trailing comma before }; \x1c-\x1f are included because str's \s,
+# which the firmware output was originally cleaned with, matches them
+_TRAILING_COMMA = re.compile(rb",[\s\x1c-\x1f]*}")
+
 def parse_buffer(buf: bytearray, received: Callable) -> bytearray:
     """
-    Extract newline-terminated lines from buf, strip off any non-JSON prefix,
-    attempt to parse the remainder as JSON (even if it has trailing commas),
-    validate the new header/payload schema, and POST to server.
+    Extract newline-terminated lines from buf and hand each one to
+    parse_line().
 
     Args:
         buf: Byte buffer that may contain partial or multiple lines.
@@ -28,38 +46,103 @@ def parse_buffer(buf: bytearray, received: Callable) -> bytearray:
     Returns:
         Leftover bytes after processing complete lines.
     """
-    while b"\n" in buf:
-        line, _, buf = buf.partition(b"\n")
-        text = line.decode("utf-8", errors="ignore").strip()
-        logger.debug("Raw line: %s", text)
-        print_formatted_text(ANSI(text))
-
-        # find the JSON start
-        idx = text.find("{")
-        if idx < 0:
-            logger.debug("No JSON payload found; skipping line.")
-            continue
-        json_text = text[idx:]
-
-        # remove trailing commas before } or ]
-        json_text = re.sub(r",\s*}", "}", json_text)
-        json_text = "".join(ch for ch in json_text if ord(ch) >= 0x20)
+    start = 0
 
-        try:
-            msg = json.loads(json_text)
-        except json.JSONDecodeError as e:
-            logger.error(f"Malformed JSON; ignoring. s:{json_text}:e")
-            continue
+    # scan forward with offsets rather than partition(), which copies the
+    # whole remainder of the buffer for every line
+    with memoryview(buf) as view:
+        while True:
+            idx = buf.find(b"\n", start)
+            if idx < 0:
+                break
+            parse_line(view[start:idx], received)
+            start = idx + 1
+
+    return buf[start:]
+
+def parse_line(
+    line: bytes | memoryview,
+    received: Callable,
+    echo: Optional[Callable[[bytes | memoryview], None]] = None,
+) -> bool:
+    """
+    Strip off any non-JSON prefix from a single line, attempt to parse the
+    remainder as JSON (even if it has trailing commas), and pass the
+    message to the received callback.
+
+    Args:
+        line: One line without its newline, e.g. a slice from LineFramer.
+        received: Callable invoked with each parsed message.
+        echo: Callable given every raw line for display, e.g.
+            ConsoleSink.offer; None shows nothing.
+
+    Returns:
+        False if the line held malformed JSON, otherwise True.
+    """
+    if echo:
+        echo(line)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Raw line: %s", str(line, "utf-8", errors="ignore").strip())
+
+    try:
+        msg = extract_json(line)
+    except json.JSONDecodeError as e:
+        text = str(line, "utf-8", errors="ignore").strip()
+        logger.error(f"Malformed JSON; ignoring. s:{text}:e")
+        return False
+
+    if msg is None:
+        logger.debug("No JSON payload found; skipping line.")
+        return True
 
-        payload = msg.get("payload", {})
+    payload = msg.get("payload", {})
 
-        # convert ISO time → epoch
+    # convert ISO time → epoch
+    if "time" in payload:
         try:
             dt = datetime.fromisoformat(payload["time"])
             payload["timestamp"] = int(dt.timestamp())
         except ValueError:
             logger.error("Invalid time format; skipping timestamp conversion.")
 
-        received(msg)
+    received(msg)
+
+    return True
+
+def extract_json(line: bytes | memoryview) -> Optional[Any]:
+    """
+    Parse the JSON object embedded in a firmware log line.
+
+    Everything before the first '{' is dropped, trailing commas before
+    '}' are removed, then control bytes are deleted, matching the
+    leniency the tracker output has always needed.
+
+    Args:
+        line: One line without its newline.
+
+    Returns:
+        The decoded JSON value, or None if the line holds no '{'.
+
+    Raises:
+        json.JSONDecodeError: If the cleaned text is not valid JSON.
+    """
+    data = bytes(line)
+
+    idx = data.find(b"{")
+    if idx < 0:
+        return None
+
+    data = _TRAILING_COMMA.sub(b"}", data[idx:]).translate(None, _CONTROL_BYTES)
+
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+
+    try:
+        text = data.decode("utf-8")
+    except UnicodeDecodeError:
+        text = data.decode("utf-8", errors="ignore")
 
-    return buf
+    return json.loads(text)
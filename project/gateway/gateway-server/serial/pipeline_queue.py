@@ -0,0 +1,168 @@
+"""
+Bounded asyncio queues joining the gateway pipeline stages.
+
+Each queue has a backpressure policy deciding what happens when the
+consumer falls behind:
+
+    block        the producer waits for space (lossless, slows the producer)
+    drop-oldest  the oldest queued item is discarded to make room
+    spill        overflow is written to a temporary file and read back
+                 in order once the consumer catches up
+"""
+
+import asyncio
+import logging
+import struct
+import tempfile
+
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+POLICY_BLOCK = "block"
+POLICY_DROP_OLDEST = "drop-oldest"
+POLICY_SPILL = "spill"
+
+POLICIES = (POLICY_BLOCK, POLICY_DROP_OLDEST, POLICY_SPILL)
+
+_RECORD_LEN = struct.Struct("<I")
+
+
+class SpillFile:
+    """
+    FIFO overflow store backed by an anonymous temporary file.
+
+    Items are encoded to bytes and stored as length-prefixed records. The
+    file is truncated whenever it has been fully read back, so it only
+    grows while the consumer is behind.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        encode: Callable[[Any], bytes] = bytes,
+        decode: Callable[[bytes], Any] = bytes,
+    ):
+        """
+        Initialize SpillFile.
+
+        Args:
+            directory: Where to create the temporary file (None for the
+                system default).
+            encode: Converts a queued item into bytes.
+            decode: Converts stored bytes back into an item.
+        """
+        self._file = tempfile.TemporaryFile(dir=directory)
+        self._encode = encode
+        self._decode = decode
+        self._read_pos = 0
+        self._write_pos = 0
+        self.pending = 0
+
+    def append(self, item: Any) -> None:
+        """Store an item at the tail of the spill."""
+        data = self._encode(item)
+        self._file.seek(self._write_pos)
+        self._file.write(_RECORD_LEN.pack(len(data)))
+        self._file.write(data)
+        self._write_pos = self._file.tell()
+        self.pending += 1
+
+    def pop(self) -> Any:
+        """Remove and return the item at the head of the spill."""
+        if not self.pending:
+            raise IndexError("pop from empty SpillFile")
+
+        self._file.seek(self._read_pos)
+        (size,) = _RECORD_LEN.unpack(self._file.read(_RECORD_LEN.size))
+        data = self._file.read(size)
+        self._read_pos = self._file.tell()
+        self.pending -= 1
+
+        if not self.pending:
+            self._file.seek(0)
+            self._file.truncate()
+            self._read_pos = self._write_pos = 0
+
+        return self._decode(data)
+
+    def close(self) -> None:
+        """Close and delete the underlying file."""
+        self._file.close()
+
+
+class BackpressureQueue:
+    """
+    asyncio.Queue wrapper applying a backpressure policy on put().
+
+    Attributes:
+        name: Label used in log messages.
+        policy: One of POLICIES.
+        dropped: Items discarded by the drop-oldest policy.
+        spilled: Items written to the spill file.
+    """
+
+    def __init__(self, name: str, maxsize: int, policy: str = POLICY_BLOCK, spill: Optional[SpillFile] = None):
+        """
+        Initialize BackpressureQueue.
+
+        Args:
+            name: Label used in log messages.
+            maxsize: Number of items held in memory.
+            policy: One of POLICIES.
+            spill: Overflow store, required for the spill policy.
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown backpressure policy: {policy}")
+        if policy == POLICY_SPILL and spill is None:
+            raise ValueError("The spill policy requires a SpillFile")
+        if maxsize <= 0:
+            raise ValueError("BackpressureQueue maxsize must be positive")
+
+        self.name = name
+        self.policy = policy
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self._spill = spill
+        self.dropped = 0
+        self.spilled = 0
+
+    def qsize(self) -> int:
+        """Items waiting in memory and in the spill."""
+        return self._queue.qsize() + (self._spill.pending if self._spill else 0)
+
+    def would_block(self) -> bool:
+        """True if put() would wait for room instead of returning at once."""
+        return self.policy == POLICY_BLOCK and self._queue.full()
+
+    async def put(self, item: Any) -> None:
+        """Enqueue an item according to the queue's policy."""
+        if self.policy == POLICY_BLOCK:
+            await self._queue.put(item)
+            return
+
+        if self.policy == POLICY_SPILL:
+            # once spilling, keep appending to the spill until it drains so
+            # items still come out in arrival order
+            if self._spill.pending or self._queue.full():
+                self._spill.append(item)
+                self.spilled += 1
+                return
+        elif self._queue.full():
+            self._queue.get_nowait()
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                logger.warning("Queue %s full; dropped %d items so far.", self.name, self.dropped)
+
+        self._queue.put_nowait(item)
+
+    async def get(self) -> Any:
+        """Dequeue the oldest item, waiting until one is available."""
+        if self._queue.empty() and self._spill is not None and self._spill.pending:
+            return self._spill.pop()
+
+        return await self._queue.get()
+
+    def close(self) -> None:
+        """Release the spill file, if any."""
+        if self._spill is not None:
+            self._spill.close()
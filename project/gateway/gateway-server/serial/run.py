@@ -3,19 +3,24 @@ Entry point for the serial-terminal CLI.
 
 Uses argparse to parse CLI options, starts the
 SerialClient, and reads user input lines to send.
+Serial output is shown through a rate-limited ConsoleSink;
+--headless runs without a terminal or prompt_toolkit.
 
 Example
 
 python3 main.py --port /dev/ttyACM0 --baud 115200
+python3 main.py --port /dev/ttyACM0 --headless
 """
 from message_hash import compute_tracker_hash
 
 import argparse
+import functools
 import logging
+import signal
+import threading
 from serial_client import SerialClient
-from message_parser import parse_buffer
-from prompt_toolkit import PromptSession
-from prompt_toolkit.patch_stdout import patch_stdout
+from message_parser import parse_line
+from console_sink import ConsoleSink, DEFAULT_MAX_RATE
 from azure_iothub import AzureIoTHubMqttClient, send_test_message_to_azure_iot_hub, send_iot_hub_test_message
 from http_client import send_test_message_to_local_server
 from gateway_cli import set_device
@@ -52,6 +57,23 @@ def main():
         action="store_true",
         help="Enable debug logging"
     )
+    parser.add_argument(
+        "--headless",
+        action="store_true",
+        help="Run as a daemon: no prompt and no serial output on the terminal"
+    )
+    parser.add_argument(
+        "--console-rate",
+        type=float,
+        default=DEFAULT_MAX_RATE,
+        help="Maximum serial lines shown per second"
+    )
+    parser.add_argument(
+        "--console-sample",
+        type=int,
+        default=1,
+        help="Show one serial line in every N"
+    )
     parser.add_argument(
         "--az-test",
         action="store_true",
@@ -87,7 +109,17 @@ def main():
  
     azure_client = AzureIoTHubMqttClient(message_callback=process_messages)
 
-    serial_client = SerialClient(args.port, args.baud, parser_callback=parse_buffer, received_callback=azure_client.send_telemetry)
+    if args.headless:
+        serial_client = SerialClient(args.port, args.baud, parser_callback=parse_line, received_callback=azure_client.send_telemetry)
+        run_headless(serial_client, azure_client)
+        return
+
+    # terminal rendering happens on the console thread, never the reader
+    console = ConsoleSink(max_rate=args.console_rate, sample_every=args.console_sample)
+    parser_callback = functools.partial(parse_line, echo=console.offer)
+
+    serial_client = SerialClient(args.port, args.baud, parser_callback=parser_callback, received_callback=azure_client.send_telemetry)
+    console.start()
     serial_client.start()
 
     global serial_client_global
@@ -95,6 +127,10 @@ def main():
 
     print(f"Connected to {args.port} @ {args.baud}. Type 'exit' to quit.")
 
+    # only the interactive terminal needs prompt_toolkit
+    from prompt_toolkit import PromptSession
+    from prompt_toolkit.patch_stdout import patch_stdout
+
     session = PromptSession("> ")
 
     # patch_stdout lets us safely print() from other threads without breaking the prompt.
@@ -109,8 +145,27 @@ def main():
             print("\nExiting…")
         finally:
             serial_client.stop()
+            console.stop()
             azure_client.shutdown()
 
+def run_headless(serial_client: SerialClient, azure_client: AzureIoTHubMqttClient):
+    """
+    Forward serial messages until SIGINT or SIGTERM, without a prompt.
+    """
+    global serial_client_global
+    serial_client_global = serial_client
+
+    stop = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop.set())
+
+    serial_client.start()
+    try:
+        stop.wait()
+    finally:
+        serial_client.stop()
+        azure_client.shutdown()
+
 def process_messages(message: dict):
     """
         Check messages for 'deviceIDupdate' and call set_device() if found.
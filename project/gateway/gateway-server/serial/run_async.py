@@ -0,0 +1,363 @@
+"""
+Entry point for the headless asyncio gateway.
+
+Runs the GatewayPipeline so serial reads, parsing and the uplink (IoT
+Hub, or the dashboard over HTTP) proceed independently, with bounded
+queues between them.
+
+Example
+
+python3 run_async.py --port /dev/ttyACM0 /dev/ttyACM1 --baud 115200 --policy drop-oldest --batch-size 50
+python3 run_async.py --uplink http --server-url http://dashboard:8000/api/telemetry/gateway/ --uplink-workers 4 --batch-size 50
+python3 run_async.py --port /dev/ttyACM0 --framing binary --verify-hash
+"""
+
+import argparse
+import asyncio
+import logging
+import signal
+
+from azure_iothub import AzureIoTHubMqttClient, TRANSPORT_ERRORS as AZURE_TRANSPORT_ERRORS
+from batch_uplink import TelemetryBatcher, DEFAULT_MAX_BYTES, DEFAULT_MAX_LATENCY_S
+from binary_frame import FRAMINGS, FRAMING_LINES
+from console_sink import ConsoleSink, DEFAULT_MAX_RATE as DEFAULT_CONSOLE_RATE
+from dedup_window import DedupWindow, DEFAULT_MAX_ENTRIES as DEFAULT_DEDUP_ENTRIES, DEFAULT_MAX_AGE_S as DEFAULT_DEDUP_AGE, DEFAULT_BLOOM_CAPACITY
+from frame_verifier import FrameVerifier
+from gateway_cli import set_device
+from gateway_metrics import GatewayMetrics, MetricsServer, DEFAULT_HOST as DEFAULT_METRICS_HOST, DEFAULT_PORT as DEFAULT_METRICS_PORT
+from gateway_pipeline import GatewayPipeline, DEFAULT_QUEUE_SIZE, DEFAULT_DRAIN_RATE
+from http_client import HttpUplink, DEFAULT_MAX_RETRIES
+from pipeline_queue import POLICIES, POLICY_BLOCK
+from spool import Spool, DEFAULT_MAX_BYTES as DEFAULT_SPOOL_BYTES
+from uplink_encoding import CONTENT_TYPES
+
+# Configure root logger
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(message)s"
+)
+
+logger = logging.getLogger(__name__)
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse CLI options."""
+    parser = argparse.ArgumentParser(
+        description="Asyncio gateway forwarding tracker JSON messages to Azure IoT Hub"
+    )
+    parser.add_argument(
+        "-p", "--port",
+        nargs="+",
+        default=["/dev/ttyACM0"],
+        help="Serial port device(s); all share one uplink"
+    )
+    parser.add_argument(
+        "-b", "--baud",
+        type=int,
+        default=115200,
+        help="Baud rate"
+    )
+    parser.add_argument(
+        "--framing",
+        choices=FRAMINGS,
+        default=FRAMING_LINES,
+        help="Tracker output format: JSON lines, or CRC-checked binary frames"
+    )
+    parser.add_argument(
+        "-v", "--verbose",
+        action="store_true",
+        help="Enable debug logging"
+    )
+    parser.add_argument(
+        "--console",
+        action="store_true",
+        help="Show raw serial lines on the terminal (rate-limited; headless otherwise)"
+    )
+    parser.add_argument(
+        "--console-rate",
+        type=float,
+        default=DEFAULT_CONSOLE_RATE,
+        help="With --console, maximum lines shown per second"
+    )
+    parser.add_argument(
+        "--console-sample",
+        type=int,
+        default=1,
+        help="With --console, show one line in every N"
+    )
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=DEFAULT_QUEUE_SIZE,
+        help="Capacity of each stage queue"
+    )
+    parser.add_argument(
+        "--policy",
+        choices=POLICIES,
+        default=POLICY_BLOCK,
+        help="Backpressure policy when a stage queue is full"
+    )
+    parser.add_argument(
+        "--spill-dir",
+        default=None,
+        help="Directory for overflow files with --policy spill"
+    )
+    parser.add_argument(
+        "--uplink",
+        choices=("iothub", "http"),
+        default="iothub",
+        help="Send to Azure IoT Hub, or POST straight to the dashboard"
+    )
+    parser.add_argument(
+        "--server-url",
+        default=None,
+        help="With --uplink http, the telemetry endpoint (default: LOCAL_SERVER_URL)"
+    )
+    parser.add_argument(
+        "--http-retries",
+        type=int,
+        default=DEFAULT_MAX_RETRIES,
+        help="With --uplink http, retries per request before spooling"
+    )
+    parser.add_argument(
+        "--uplink-workers",
+        type=int,
+        default=1,
+        help="Number of concurrent uplink sends"
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=1,
+        help="Readings per batch_telemetry message (1 disables batching)"
+    )
+    parser.add_argument(
+        "--batch-bytes",
+        type=int,
+        default=DEFAULT_MAX_BYTES,
+        help="Maximum encoded size of a batch_telemetry message"
+    )
+    parser.add_argument(
+        "--batch-latency",
+        type=float,
+        default=DEFAULT_MAX_LATENCY_S,
+        help="Seconds a reading may wait in a batch before it is sent"
+    )
+    parser.add_argument(
+        "--gateway-id",
+        default=None,
+        help="Gateway id for batches whose readings carry none"
+    )
+    parser.add_argument(
+        "--encoding",
+        choices=sorted(CONTENT_TYPES),
+        default="json",
+        help="Uplink message encoding (msgpack needs the msgpack package)"
+    )
+    parser.add_argument(
+        "--compress",
+        action="store_true",
+        help="Deflate-compress uplink messages"
+    )
+    parser.add_argument(
+        "--spool-dir",
+        default=None,
+        help="Directory for the store-and-forward spool (disabled if unset)"
+    )
+    parser.add_argument(
+        "--spool-max-mb",
+        type=int,
+        default=DEFAULT_SPOOL_BYTES // (1024 * 1024),
+        help="Disk budget for the spool in MiB"
+    )
+    parser.add_argument(
+        "--drain-rate",
+        type=float,
+        default=DEFAULT_DRAIN_RATE,
+        help="Spooled messages replayed per second after the uplink recovers"
+    )
+    parser.add_argument(
+        "--verify-hash",
+        action="store_true",
+        help="Drop telemetry frames whose tracker hash does not match"
+    )
+    parser.add_argument(
+        "--require-hash",
+        action="store_true",
+        help="With --verify-hash, also drop frames that carry no hash"
+    )
+    parser.add_argument(
+        "--quarantine-file",
+        default=None,
+        help="With --verify-hash, append dropped frames to this file"
+    )
+    parser.add_argument(
+        "--dedup",
+        action="store_true",
+        help="Drop duplicate readings (same tracker, timestamp and hash) on the gateway"
+    )
+    parser.add_argument(
+        "--dedup-entries",
+        type=int,
+        default=DEFAULT_DEDUP_ENTRIES,
+        help="With --dedup, readings remembered exactly"
+    )
+    parser.add_argument(
+        "--dedup-age",
+        type=float,
+        default=DEFAULT_DEDUP_AGE,
+        help="With --dedup, seconds a reading is remembered exactly"
+    )
+    parser.add_argument(
+        "--dedup-bloom",
+        type=int,
+        default=DEFAULT_BLOOM_CAPACITY,
+        help="With --dedup, readings per Bloom filter generation (0 disables it)"
+    )
+    parser.add_argument(
+        "--reorder-delay",
+        type=float,
+        default=0.0,
+        help="With --dedup, seconds to hold readings to restore tracker timestamp order"
+    )
+    parser.add_argument(
+        "--metrics-host",
+        default=DEFAULT_METRICS_HOST,
+        help="Interface for the Prometheus metrics endpoint"
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=DEFAULT_METRICS_PORT,
+        help="Port for the Prometheus metrics endpoint (0 disables it)"
+    )
+
+    return parser.parse_args()
+
+
+async def run(args: argparse.Namespace) -> None:
+    """
+    Build the pipeline and uplink client and run until interrupted.
+    """
+    pipeline: GatewayPipeline | None = None
+    metrics = GatewayMetrics()
+
+    def process_messages(message: dict):
+        """
+            Check messages for 'deviceIDupdate' and call set_device() if found.
+        """
+        metrics.c2d_commands.inc()
+
+        if message["messageType"] == "deviceIDUpdate" and pipeline:
+            value = message["message"]
+            logger.info(f"deviceIDupdate message received with value: {value}")
+            set_device(pipeline, value)
+
+    azure_client = None
+    http_uplink = None
+    if args.uplink == "http":
+        # no IoT Hub connection, so no cloud-to-device commands either
+        http_uplink = HttpUplink(
+            url=args.server_url,
+            content_type=CONTENT_TYPES[args.encoding],
+            compress=args.compress,
+            max_retries=args.http_retries,
+        )
+        metrics.bind_http_uplink(http_uplink)
+        send = http_uplink.send
+        transport_errors = ()
+    else:
+        azure_client = AzureIoTHubMqttClient(
+            message_callback=process_messages,
+            content_type=CONTENT_TYPES[args.encoding],
+            compress=args.compress,
+        )
+        send = azure_client.send_telemetry
+        transport_errors = AZURE_TRANSPORT_ERRORS
+
+    batcher = None
+    if args.batch_size > 1:
+        batcher = TelemetryBatcher(
+            max_readings=args.batch_size,
+            max_bytes=args.batch_bytes,
+            max_latency=args.batch_latency,
+            gateway_id=args.gateway_id,
+        )
+
+    verifier = None
+    if args.verify_hash:
+        verifier = FrameVerifier(
+            require_hash=args.require_hash,
+            quarantine_path=args.quarantine_file,
+        )
+
+    dedup = None
+    if args.dedup:
+        dedup = DedupWindow(
+            max_entries=args.dedup_entries,
+            max_age=args.dedup_age,
+            bloom_capacity=args.dedup_bloom,
+            reorder_delay=args.reorder_delay,
+        )
+
+    console = None
+    if args.console:
+        console = ConsoleSink(max_rate=args.console_rate, sample_every=args.console_sample)
+        console.start()
+
+    spool = None
+    if args.spool_dir:
+        spool = Spool(args.spool_dir, max_bytes=args.spool_max_mb * 1024 * 1024)
+
+    pipeline = GatewayPipeline(
+        args.port,
+        args.baud,
+        send,
+        framing=args.framing,
+        queue_size=args.queue_size,
+        policy=args.policy,
+        spill_dir=args.spill_dir,
+        uplink_workers=args.uplink_workers,
+        batcher=batcher,
+        spool=spool,
+        drain_rate=args.drain_rate,
+        transport_errors=transport_errors,
+        verifier=verifier,
+        dedup=dedup,
+        metrics=metrics,
+        echo=console.offer if console else None,
+    )
+
+    metrics_server = None
+    if args.metrics_port:
+        metrics_server = MetricsServer(metrics.registry, args.metrics_host, args.metrics_port)
+        metrics_server.start()
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, pipeline.stop)
+
+    try:
+        await pipeline.run()
+    finally:
+        if azure_client:
+            azure_client.shutdown()
+        if http_uplink:
+            http_uplink.close()
+        if console:
+            console.stop()
+        if metrics_server:
+            metrics_server.stop()
+
+
+def main():
+    args = parse_args()
+
+    if args.verbose:
+        logging.getLogger().setLevel(logging.DEBUG)
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,20 @@
 """
 SerialClient: threaded serial port reader/writer.
 
-Reads from a serial port in a background thread and
-passes raw bytes to a parser callback, and provides
-a simple write() method for sending lines.
+Reads from a serial port in a background thread, frames
+the raw bytes into lines and passes each line to a parser
+callback. Lines sent with write() or submit() go through the
+port's CommandLane, which writes them in priority order and
+matches acknowledgements against the lines read.
 """
 
 import threading
 import logging
 import serial
 
+from command_lane import Command, CommandLane, PRIORITY_INTERACTIVE
+from line_framer import LineFramer
+
 logger = logging.getLogger(__name__)
 
 
@@ -19,8 +24,9 @@ class SerialClient:
 
     Attributes:
         ser: The underlying Serial object.
-        parser_callback: Function that consumes a bytearray
-            and returns any leftover bytes.
+        framer: LineFramer holding partial lines between reads.
+        commands: CommandLane owning all writes to the port.
+        parser_callback: Function that consumes one framed line.
     """
 
     def __init__(self, port: str, baudrate: int, parser_callback, received_callback):
@@ -30,8 +36,10 @@ class SerialClient:
         Args:
             port: Serial port path (e.g. "/dev/ttyUSB0").
             baudrate: Baud rate for communication.
-            parser_callback: Callable[[bytearray], bytearray]
-                to handle incoming data.
+            parser_callback: Callable[[memoryview, Callable], None]
+                to handle each incoming line.
+            received_callback: Callable passed through to
+                parser_callback for parsed messages.
         """
         try:
             self.ser = serial.Serial(port, baudrate, timeout=0.1)
@@ -41,6 +49,8 @@ class SerialClient:
 
         self.received_callback = received_callback
         self.parser_callback = parser_callback
+        self.framer = LineFramer()
+        self.commands = CommandLane(self.ser.write, name=port)
         self._stop_event = threading.Event()
         self._thread = threading.Thread(
             target=self._read_loop, daemon=True
@@ -49,34 +59,44 @@ class SerialClient:
     def start(self):
         """Start the background reader thread."""
         self._thread.start()
+        self.commands.start()
         logger.info("Started reader on %s @ %d", self.ser.port, self.ser.baudrate)
 
     def stop(self):
         """Signal the thread to stop and close the serial port."""
         self._stop_event.set()
+        self.commands.stop()
         self._thread.join()
         self.ser.close()
         logger.info("Serial client stopped.")
 
     def write(self, data: str):
         """
-        Send a line over serial (appends newline).
+        Queue a line to send over serial (appends newline), behind any
+        control commands.
 
         Args:
             data: The text line to send.
         """
-        line = data + "\n"
-        self.ser.write(line.encode("utf-8"))
-        logger.debug("Sent: %s", line.strip())
+        self.commands.submit(Command(data, priority=PRIORITY_INTERACTIVE))
+
+    def submit(self, command: Command) -> bool:
+        """
+        Queue a command on the port's CommandLane; safe from any thread.
+
+        Returns:
+            False if the lane was full and the command was dropped.
+        """
+        return self.commands.submit(command)
 
     def _read_loop(self):
         """
         Continuously read from serial until stopped,
-        and feed data to parser_callback.
+        and feed each complete line to parser_callback.
         """
-        buffer = bytearray()
         while not self._stop_event.is_set():
             chunk = self.ser.read(1024)
             if chunk:
-                buffer.extend(chunk)
-                buffer = self.parser_callback(buffer, self.received_callback)
+                for line in self.framer.feed(chunk):
+                    self.commands.observe(line)
+                    self.parser_callback(line, self.received_callback)
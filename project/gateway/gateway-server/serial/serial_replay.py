@@ -0,0 +1,657 @@
+"""
+Record, replay and synthesise tracker UART traffic, and benchmark the
+gateway pipeline with it.
+
+A capture file starts with CAPTURE_MAGIC followed by one record per
+serial read:
+
+    <f64 seconds since capture start> <u32 length> <length raw bytes>
+
+Synthetic captures hold byte-exact tracker frames in the firmware's
+JSON_FORMAT layout (my_json.h), signed with the same snippet hash that
+compute_tracker_hash checks, from a number of virtual trackers.
+
+bench replays a capture, or synthetic frames, into a GatewayPipeline at
+the recorded pace or as fast as the pipeline will take it. Bytes go
+through an in-process pipe, or with --pty through a pseudo-terminal
+that the pipeline opens with pyserial like a real tracker. The uplink
+is a local stand-in, so no IoT Hub connection is needed. serve replays
+onto a pseudo-terminal for run.py or run_async.py to open unchanged.
+
+Example
+
+python3 serial_replay.py record --port /dev/ttyACM0 --out tracker.cap --duration 600
+python3 serial_replay.py generate --frames 10000 --trackers 8 --rate 20 --out synthetic.cap
+python3 serial_replay.py bench --capture tracker.cap --speed 1
+python3 serial_replay.py bench --frames 100000 --pty --verify-hash --corrupt 0.01
+python3 serial_replay.py bench --frames 100000 --framing binary --verify-hash
+python3 serial_replay.py serve --capture tracker.cap
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import re
+import struct
+import threading
+import time
+import uuid
+
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+from batch_uplink import TelemetryBatcher, MESSAGE_TYPE_BATCH_TELEMETRY, MESSAGE_TYPE_TELEMETRY, SCHEMA_VERSION
+from binary_frame import (
+    FrameDecoder, TelemetryFrame, decode_frame, encode_frame, format_payload,
+    FIRMWARE_GATEWAY_ID, FIRMWARE_KEY_ID, FIRMWARE_SIG_ALG, FRAMINGS, FRAMING_BINARY, FRAMING_LINES,
+)
+from console_sink import ConsoleSink
+from dedup_window import DedupWindow
+from frame_verifier import FrameVerifier
+from gateway_metrics import GatewayMetrics
+from gateway_pipeline import GatewayPipeline, SerialPort, READ_SIZE, DEFAULT_QUEUE_SIZE
+from line_framer import LineFramer
+from message_hash import compute_payload_hash, format_payload_snippet
+from pipeline_queue import POLICIES, POLICY_BLOCK
+
+logging.basicConfig(
+    level=logging.WARNING,
+    format="%(asctime)s [%(levelname)s] %(message)s"
+)
+
+logger = logging.getLogger(__name__)
+
+CAPTURE_MAGIC = b"UARTCAP1"
+_RECORD = struct.Struct("<dI")
+
+DEFAULT_TRACKERS = 4
+DEFAULT_RATE = 10.0
+DEFAULT_IDLE_S = 2.0
+
+_MESSAGE_ID = re.compile(rb'"messageId":"([^"]*)"')
+
+
+class CaptureWriter:
+    """Append timestamped raw reads to a capture file."""
+
+    def __init__(self, path: str):
+        self._file = open(path, "wb")
+        self._file.write(CAPTURE_MAGIC)
+
+    def write(self, offset: float, data: bytes) -> None:
+        """Record data read `offset` seconds after the capture started."""
+        self._file.write(_RECORD.pack(offset, len(data)))
+        self._file.write(data)
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_capture(path: str) -> Iterator[Tuple[float, bytes]]:
+    """
+    Yield (offset, data) records from a capture file.
+
+    Raises:
+        ValueError: If the file is not a capture.
+    """
+    with open(path, "rb") as f:
+        if f.read(len(CAPTURE_MAGIC)) != CAPTURE_MAGIC:
+            raise ValueError(f"{path} is not a serial capture")
+
+        while True:
+            header = f.read(_RECORD.size)
+            if len(header) < _RECORD.size:
+                return
+            offset, length = _RECORD.unpack(header)
+            data = f.read(length)
+            if len(data) < length:
+                logger.warning("Capture %s ends with a truncated record.", path)
+                return
+            yield offset, data
+
+
+def tracker_frame(rng: random.Random, device: int, when: float, uptime: int, corrupt: bool = False) -> bytes:
+    """
+    One synthetic frame as the gateway firmware prints it, ending in \\r\\n.
+
+    Values are formatted with the firmware's snprintf precisions, and the
+    signature is the tracker's snippet hash in upper-case hex. A corrupt
+    frame has one payload digit changed after signing, as UART noise would.
+    """
+    payload = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(when)),
+        "uptime": str(uptime),
+        "location": {
+            "latitude": f"{rng.uniform(27.0, 28.0):.7f}",
+            "ns": "S",
+            "longitude": f"{rng.uniform(152.5, 153.5):.7f}",
+            "ew": "E",
+            "altitude_m": f"{rng.uniform(0.0, 120.0):.1f}",
+        },
+        "environment": {
+            "temperature_c": f"{rng.uniform(15.0, 35.0):.2f}",
+            "humidity_percent": f"{rng.uniform(30.0, 90.0):.2f}",
+            "pressure_hpa": f"{rng.uniform(99.0, 103.0):.1f}",
+            "gas_ppm": f"{rng.uniform(0.0, 50.0):.2f}",
+        },
+        "acceleration": {
+            "x_mps2": f"{rng.uniform(-0.5, 0.5):.3f}",
+            "y_mps2": f"{rng.uniform(-0.5, 0.5):.3f}",
+            "z_mps2": f"{rng.uniform(-9.9, -9.6):.3f}",
+        },
+    }
+    digest = compute_payload_hash(payload).upper()
+
+    # the gateway adds deviceId to the payload the tracker signed
+    snippet = format_payload_snippet(payload).replace(
+        b'"payload":{', b'"payload":{"deviceId":"dev-%d",' % device, 1
+    )
+    if corrupt:
+        digits = [i for i, byte in enumerate(snippet) if 0x30 <= byte <= 0x39]
+        i = rng.choice(digits)
+        snippet = snippet[:i] + bytes([0x30 + (snippet[i] - 0x30 + 1) % 10]) + snippet[i + 1:]
+
+    header = (
+        f'{{"header":{{"messageId":"{uuid.UUID(int=rng.getrandbits(128), version=4)}",'
+        f'"gatewayId":"{FIRMWARE_GATEWAY_ID}","schemaVersion":"{SCHEMA_VERSION}",'
+        f'"messageType":"{MESSAGE_TYPE_TELEMETRY}"}},'
+    )
+    signature = f',"signature":{{"alg":"{FIRMWARE_SIG_ALG}","keyId":"{FIRMWARE_KEY_ID}","value":"{digest}"}}}}\r\n'
+
+    return header.encode("ascii") + snippet + signature.encode("ascii")
+
+
+def tracker_binary_frame(rng: random.Random, device: int, when: float, uptime: int, corrupt: bool = False) -> bytes:
+    """
+    One synthetic reading as a binary frame (see binary_frame).
+
+    The hash is the tracker's snippet hash of the values as the firmware
+    formats them. A corrupt frame has a hash byte changed before the CRC
+    is computed, so it reaches the gateway and fails hash verification.
+    """
+    reading = TelemetryFrame(
+        message_id=uuid.UUID(int=rng.getrandbits(128), version=4).bytes,
+        dev_id=device,
+        timestamp=int(when),
+        uptime=uptime,
+        lat=rng.randint(270_000_000, 280_000_000),
+        ns=b"S",
+        lon=rng.randint(1_525_000_000, 1_535_000_000),
+        ew=b"E",
+        alt=rng.randint(0, 1200),
+        temp=rng.randint(1500, 3500),
+        humid=rng.randint(3000, 9000),
+        press=rng.randint(990, 1030),
+        gas=rng.randint(0, 5000),
+        x=rng.randint(-500, 500),
+        y=rng.randint(-500, 500),
+        z=rng.randint(-9900, -9600),
+        hash=b"",
+    )
+    digest = bytes.fromhex(compute_payload_hash(format_payload(reading)))
+    if corrupt:
+        digest = bytes([digest[0] ^ 0xFF]) + digest[1:]
+
+    return encode_frame(reading._replace(hash=digest))
+
+
+def synthetic_frames(
+    frames: int,
+    trackers: int = DEFAULT_TRACKERS,
+    rate: float = DEFAULT_RATE,
+    corrupt: float = 0.0,
+    seed: int = 0,
+    binary: bool = False,
+) -> Iterator[Tuple[float, bytes]]:
+    """
+    Yield (offset, frame) records from `trackers` virtual trackers taking
+    turns, `rate` frames per second in total.
+
+    Args:
+        frames: Number of frames to generate.
+        trackers: Number of virtual trackers (deviceIds dev-0 ...).
+        rate: Frames per second across all trackers; 0 gives every frame
+            offset 0.
+        corrupt: Fraction of frames with a changed value after signing.
+        seed: Seed for reproducible values and messageIds.
+        binary: Generate binary frames instead of JSON lines.
+    """
+    rng = random.Random(seed)
+    start = time.time()
+    make_frame = tracker_binary_frame if binary else tracker_frame
+
+    for seq in range(frames):
+        offset = seq / rate if rate else 0.0
+        device = seq % trackers
+        yield offset, make_frame(
+            rng, device, start + offset, uptime=seq // trackers,
+            corrupt=rng.random() < corrupt,
+        )
+
+
+class _PipeSerial:
+    """Read end of an os.pipe with the parts of the Serial API the pipeline uses."""
+
+    def __init__(self, baudrate: int):
+        self.baudrate = baudrate
+        self.timeout = 0
+        self._read_fd, self.write_fd = os.pipe()
+        os.set_blocking(self._read_fd, False)
+
+    def fileno(self) -> int:
+        return self._read_fd
+
+    def read(self, size: int) -> bytes:
+        try:
+            return os.read(self._read_fd, size)
+        except BlockingIOError:
+            return b""
+
+    def write(self, data: bytes) -> int:
+        # C2D writes have no tracker to go to
+        return len(data)
+
+    def close(self) -> None:
+        os.close(self._read_fd)
+
+
+class LoopbackPort(SerialPort):
+    """
+    SerialPort fed by the benchmark through an os.pipe instead of a UART.
+
+    Attributes:
+        write_fd: File descriptor the replayer writes raw bytes to.
+    """
+
+    def __init__(self, name: str = "loopback", baudrate: int = 115200, framing: str = FRAMING_LINES):
+        self.name = name
+        self.ser = _PipeSerial(baudrate)
+        self.framer = FrameDecoder() if framing == FRAMING_BINARY else LineFramer()
+        self.write_fd = self.ser.write_fd
+
+
+def open_pty() -> Tuple[int, int, str]:
+    """
+    Open a raw pseudo-terminal.
+
+    Returns:
+        (master_fd, slave_fd, slave_path); bytes written to master_fd
+        arrive on slave_path.
+    """
+    import pty
+    import tty
+
+    master, slave = pty.openpty()
+    tty.setraw(slave)
+    return master, slave, os.ttyname(slave)
+
+
+class Replayer(threading.Thread):
+    """
+    Write capture records to a file descriptor on a background thread.
+
+    Attributes:
+        sent: perf_counter() time each frame's last byte was written,
+            keyed by its header messageId.
+        bytes_written: Total bytes written.
+    """
+
+    def __init__(
+        self,
+        records: Iterable[Tuple[float, bytes]],
+        fd: int,
+        speed: float = 0.0,
+        framing: str = FRAMING_LINES,
+    ):
+        """
+        Initialize Replayer.
+
+        Args:
+            records: (offset, data) pairs, e.g. from read_capture().
+            fd: Blocking file descriptor to write to.
+            speed: Playback rate relative to the record offsets
+                (1 = original pace); 0 writes as fast as possible.
+            framing: "binary" if the records hold binary frames.
+        """
+        super().__init__(name="replayer", daemon=True)
+        self.records = records
+        self.fd = fd
+        self.speed = speed
+        self._frames = FrameDecoder() if framing == FRAMING_BINARY else None
+
+        self.sent: Dict[str, float] = {}
+        self.bytes_written = 0
+        self.started = 0.0
+
+    def run(self) -> None:
+        pending = bytearray()
+        self.started = time.perf_counter()
+
+        for offset, data in self.records:
+            if self.speed:
+                delay = self.started + offset / self.speed - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+            view = memoryview(data)
+            while view:
+                view = view[os.write(self.fd, view):]
+            self.bytes_written += len(data)
+
+            now = time.perf_counter()
+            if self._frames:
+                # timestamp each binary frame once its CRC is out
+                for frame in self._frames.feed(data):
+                    reading = decode_frame(frame)
+                    if reading:
+                        self.sent[str(uuid.UUID(bytes=reading.message_id))] = now
+                continue
+
+            # timestamp each frame once its newline is out
+            pending += data
+            start = 0
+            while True:
+                idx = pending.find(b"\n", start)
+                if idx < 0:
+                    break
+                match = _MESSAGE_ID.search(pending, start, idx)
+                if match:
+                    self.sent[match.group(1).decode("ascii", errors="replace")] = now
+                start = idx + 1
+            del pending[:start]
+
+
+class LocalUplink:
+    """
+    Stand-in for the IoT Hub client that records when each reading arrives.
+
+    Attributes:
+        received: perf_counter() arrival time keyed by messageId.
+        messages: Uplink calls made (a batch counts once).
+    """
+
+    def __init__(self, delay: float = 0.0):
+        """
+        Initialize LocalUplink.
+
+        Args:
+            delay: Seconds each send blocks for, to mimic a network round trip.
+        """
+        self.delay = delay
+        self.received: Dict[str, float] = {}
+        self.messages = 0
+        self._lock = threading.Lock()
+
+    def send(self, msg: Dict[str, Any]) -> None:
+        if self.delay:
+            time.sleep(self.delay)
+        now = time.perf_counter()
+
+        header = msg.get("header") or {}
+        if header.get("messageType") == MESSAGE_TYPE_BATCH_TELEMETRY:
+            ids = [reading.get("messageId") for reading in msg["payload"]["readings"]]
+        else:
+            ids = [header.get("messageId")]
+
+        with self._lock:
+            self.messages += 1
+            for message_id in ids:
+                self.received[message_id] = now
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of values, which must be sorted."""
+    if not values:
+        return float("nan")
+    rank = max(1, -(-len(values) * pct // 100))
+    return values[int(rank) - 1]
+
+
+def report(pipeline: GatewayPipeline, replayer: Replayer, uplink: LocalUplink) -> None:
+    """Print throughput, end-to-end latency and where frames were lost."""
+    sent = replayer.sent
+    latencies = sorted(
+        uplink.received[message_id] - sent_at
+        for message_id, sent_at in sent.items()
+        if message_id in uplink.received
+    )
+    delivered = len(latencies)
+
+    finished = max(uplink.received.values(), default=replayer.started)
+    elapsed = max(finished - replayer.started, 1e-9)
+
+    metrics = pipeline.metrics
+    overflows = sum(getattr(port.framer, "overflows", 0) for port in pipeline.ports)
+    crc_errors = sum(getattr(port.framer, "crc_errors", 0) for port in pipeline.ports)
+    bad_hash = pipeline.verifier.mismatched if pipeline.verifier else 0
+    dedup = pipeline.dedup
+    duplicates = dedup.duplicates if dedup else 0
+
+    print(f"{'frames':<12} {len(sent)} sent, {delivered} delivered, {len(sent) - delivered} lost")
+    print(f"{'throughput':<12} {delivered / elapsed:.0f} frames/s, "
+          f"{replayer.bytes_written / elapsed / 1024:.0f} KiB/s over {elapsed:.2f}s "
+          f"({uplink.messages} uplink calls)")
+    print(f"{'latency':<12} p50 {percentile(latencies, 50) * 1000:.2f} ms, "
+          f"p99 {percentile(latencies, 99) * 1000:.2f} ms, "
+          f"max {(latencies[-1] if latencies else float('nan')) * 1000:.2f} ms")
+    print(f"{'drops':<12} lines queue {pipeline.lines.dropped}, message queue {pipeline.messages.dropped}, "
+          f"bad hash {bad_hash}, duplicates {duplicates}, parse failures {metrics.parse_failures.value}, "
+          f"line overflows {overflows}, crc errors {crc_errors}, send failures {metrics.send_failures.value}")
+
+
+async def bench(args: argparse.Namespace) -> None:
+    """Replay frames through a GatewayPipeline and report the results."""
+    if args.capture:
+        records = read_capture(args.capture)
+    else:
+        records = synthetic_frames(
+            args.frames, args.trackers, args.rate, args.corrupt, args.seed, args.framing == FRAMING_BINARY
+        )
+
+    slave = None
+    if args.pty:
+        fd, slave, port = open_pty()
+    else:
+        port = LoopbackPort(baudrate=args.baud, framing=args.framing)
+        fd = port.write_fd
+
+    batcher = None
+    if args.batch_size > 1:
+        batcher = TelemetryBatcher(max_readings=args.batch_size, max_latency=args.batch_latency)
+
+    console = None
+    if args.echo:
+        console = ConsoleSink()
+        console.start()
+
+    uplink = LocalUplink(delay=args.uplink_delay / 1000)
+    pipeline = GatewayPipeline(
+        port,
+        args.baud,
+        uplink.send,
+        framing=args.framing,
+        queue_size=args.queue_size,
+        policy=args.policy,
+        uplink_workers=args.uplink_workers,
+        batcher=batcher,
+        verifier=FrameVerifier() if args.verify_hash else None,
+        dedup=DedupWindow(reorder_delay=args.reorder_delay) if args.dedup else None,
+        metrics=GatewayMetrics(),
+        echo=console.offer if console else None,
+    )
+
+    replayer = Replayer(records, fd, speed=args.speed, framing=args.framing)
+    running = asyncio.create_task(pipeline.run())
+    replayer.start()
+
+    # done once every frame has arrived, or nothing has for args.idle seconds
+    delivered, idle = -1, 0.0
+    while idle < args.idle:
+        await asyncio.sleep(0.1)
+        if replayer.is_alive():
+            continue
+        if len(uplink.received) >= len(replayer.sent):
+            break
+        idle = idle + 0.1 if len(uplink.received) == delivered else 0.0
+        delivered = len(uplink.received)
+
+    pipeline.stop()
+    await running
+
+    os.close(fd)
+    if slave is not None:
+        os.close(slave)
+    if console:
+        console.stop()
+
+    report(pipeline, replayer, uplink)
+
+
+def record(args: argparse.Namespace) -> None:
+    """Record raw reads from a serial port until the duration or Ctrl+C."""
+    import serial
+
+    ser = serial.Serial(args.port, args.baud, timeout=0.1)
+    total = 0
+    started = time.monotonic()
+
+    print(f"Recording {args.port} to {args.out}; Ctrl+C to stop.")
+    with CaptureWriter(args.out) as capture:
+        try:
+            while not args.duration or time.monotonic() - started < args.duration:
+                data = ser.read(READ_SIZE)
+                if data:
+                    capture.write(time.monotonic() - started, data)
+                    total += len(data)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            ser.close()
+
+    print(f"Recorded {total} bytes in {time.monotonic() - started:.1f}s.")
+
+
+def generate(args: argparse.Namespace) -> None:
+    """Write synthetic frames to a capture file."""
+    with CaptureWriter(args.out) as capture:
+        for offset, frame in synthetic_frames(
+            args.frames, args.trackers, args.rate, args.corrupt, args.seed, args.framing == FRAMING_BINARY
+        ):
+            capture.write(offset, frame)
+
+    print(f"Wrote {args.frames} frames from {args.trackers} trackers to {args.out}.")
+
+
+def serve(args: argparse.Namespace) -> None:
+    """Replay frames onto a pseudo-terminal for an unmodified gateway to read."""
+    master, slave, path = open_pty()
+
+    print(f"Serving on {path}; start the gateway with --port {path}, then press Enter.")
+    input()
+
+    try:
+        while True:
+            if args.capture:
+                records = read_capture(args.capture)
+            else:
+                records = synthetic_frames(
+                    args.frames, args.trackers, args.rate, args.corrupt, args.seed, args.framing == FRAMING_BINARY
+                )
+
+            replayer = Replayer(records, master, speed=args.speed, framing=args.framing)
+            replayer.run()
+            print(f"Replayed {len(replayer.sent)} frames.")
+            if not args.loop:
+                break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        os.close(master)
+        os.close(slave)
+
+
+def _add_source_args(parser: argparse.ArgumentParser, speed: float) -> None:
+    parser.add_argument("--capture", default=None, help="Capture file to replay (synthetic frames if unset)")
+    parser.add_argument("--speed", type=float, default=speed,
+                        help="Replay speed relative to the capture (1 = original pace, 0 = as fast as possible)")
+    _add_synthetic_args(parser)
+
+
+def _add_synthetic_args(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--frames", type=int, default=10000, help="Synthetic frames to generate")
+    parser.add_argument("--trackers", type=int, default=DEFAULT_TRACKERS, help="Virtual trackers taking turns")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE, help="Synthetic frames per second across all trackers")
+    parser.add_argument("--corrupt", type=float, default=0.0, help="Fraction of synthetic frames with a bad hash")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for synthetic values")
+    parser.add_argument("--framing", choices=FRAMINGS, default=FRAMING_LINES,
+                        help="Tracker output format: JSON lines or binary frames")
+
+
+def parse_args() -> argparse.Namespace:
+    """Parse CLI options."""
+    parser = argparse.ArgumentParser(description="Record, replay and benchmark tracker serial traffic")
+    parser.add_argument("-b", "--baud", type=int, default=115200, help="Baud rate")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Enable debug logging")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("record", help="Record raw bytes from a serial port")
+    p.add_argument("-p", "--port", default="/dev/ttyACM0", help="Serial port device")
+    p.add_argument("-o", "--out", required=True, help="Capture file to write")
+    p.add_argument("--duration", type=float, default=0, help="Seconds to record (0 = until Ctrl+C)")
+    p.set_defaults(func=record)
+
+    p = commands.add_parser("generate", help="Write synthetic tracker frames to a capture file")
+    p.add_argument("-o", "--out", required=True, help="Capture file to write")
+    _add_synthetic_args(p)
+    p.set_defaults(func=generate)
+
+    p = commands.add_parser("bench", help="Replay through GatewayPipeline with a local uplink")
+    _add_source_args(p, speed=0.0)
+    p.add_argument("--pty", action="store_true", help="Feed the pipeline through a pseudo-terminal and pyserial")
+    p.add_argument("--echo", action="store_true", help="Show lines through a rate-limited ConsoleSink")
+    p.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE, help="Capacity of each stage queue")
+    p.add_argument("--policy", choices=POLICIES, default=POLICY_BLOCK, help="Backpressure policy")
+    p.add_argument("--uplink-workers", type=int, default=1, help="Number of concurrent uplink sends")
+    p.add_argument("--uplink-delay", type=float, default=0.0, help="Milliseconds each stand-in uplink send takes")
+    p.add_argument("--batch-size", type=int, default=1, help="Readings per batch_telemetry message (1 disables)")
+    p.add_argument("--batch-latency", type=float, default=0.5, help="Seconds a reading may wait in a batch")
+    p.add_argument("--verify-hash", action="store_true", help="Check tracker hashes with FrameVerifier")
+    p.add_argument("--dedup", action="store_true", help="Drop duplicate readings with a DedupWindow")
+    p.add_argument("--reorder-delay", type=float, default=0.0,
+                   help="With --dedup, seconds to hold readings for per-tracker reordering")
+    p.add_argument("--idle", type=float, default=DEFAULT_IDLE_S,
+                   help="Seconds without deliveries before counting the rest as lost")
+    p.set_defaults(func=bench)
+
+    p = commands.add_parser("serve", help="Replay onto a pseudo-terminal for an unmodified gateway")
+    _add_source_args(p, speed=1.0)
+    p.add_argument("--loop", action="store_true", help="Replay repeatedly until Ctrl+C")
+    p.set_defaults(func=serve)
+
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    if args.verbose:
+        logging.getLogger().setLevel(logging.DEBUG)
+    else:
+        # the report counts bad frames; a warning per frame would swamp it
+        logging.getLogger("frame_verifier").setLevel(logging.ERROR)
+
+    if args.func is bench:
+        asyncio.run(bench(args))
+    else:
+        args.func(args)
+
+
+if __name__ == "__main__":
+    main()
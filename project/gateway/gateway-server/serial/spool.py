@@ -0,0 +1,407 @@
+"""
+Spool: durable store-and-forward queue for messages the uplink could not
+deliver.
+
+Messages are appended to fixed-size, memory-mapped segment files in a
+spool directory. A checkpoint file records how far the spool has been
+drained, so after a crash or reboot the gateway resumes from the last
+checkpoint (delivery is at-least-once; the server drops duplicates).
+Disk usage is bounded by deleting the oldest segment when the limit is
+reached.
+
+Record layout inside a segment:
+
+    <u32 length> <u32 crc32> <length bytes of data>
+
+The header is written after the data, so a torn write leaves a zero
+length and recovery stops there. A record whose CRC does not match is
+logged, counted and skipped using its length; if the length itself is
+unusable, the rest of that segment is skipped.
+
+peek() hands out the record together with its position (segment id and
+offset), and pop() only advances if the head is still at that position.
+append() may drop the head segment while a peeked record is being
+delivered; popping by position keeps that from removing a different,
+undelivered record.
+"""
+
+import logging
+import mmap
+import os
+import re
+import struct
+import zlib
+
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEGMENT_SIZE = 4 * 1024 * 1024
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_CHECKPOINT_EVERY = 100
+
+CHECKPOINT_FILE = "checkpoint"
+
+_HEADER = struct.Struct("<II")
+_POSITION = struct.Struct("<QQ")
+_CRC = struct.Struct("<I")
+_SEGMENT_RE = re.compile(r"^seg-(\d{10})\.spool$")
+
+# (segment id, offset) of a record, as returned by Spool.peek()
+SpoolHandle = Tuple[int, int]
+
+
+class _CorruptRecord(Exception):
+    """
+    Raised by _Segment.read for a record that fails its check.
+
+    Attributes:
+        offset: Where the record starts.
+        next_offset: Where the following record starts, or None if the
+            length header is unusable.
+    """
+
+    def __init__(self, offset: int, next_offset: Optional[int]):
+        super().__init__(f"corrupt spool record at offset {offset}")
+        self.offset = offset
+        self.next_offset = next_offset
+
+
+class _Segment:
+    """One memory-mapped segment file."""
+
+    def __init__(self, directory: str, seg_id: int, size: int):
+        self.id = seg_id
+        self.path = os.path.join(directory, f"seg-{seg_id:010d}.spool")
+
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size != size:
+                os.ftruncate(fd, size)
+            self.mm = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+
+        self.size = size
+
+    def read(self, offset: int) -> Tuple[Optional[bytes], int]:
+        """
+        Read the record at offset.
+
+        Returns:
+            (data, next_offset), or (None, offset) at the end of the
+            written data.
+
+        Raises:
+            _CorruptRecord: If the record fails its CRC or its length runs
+                past the end of the segment.
+        """
+        if offset + _HEADER.size > self.size:
+            return None, offset
+
+        length, crc = _HEADER.unpack_from(self.mm, offset)
+        if length == 0:
+            return None, offset
+
+        end = offset + _HEADER.size + length
+        if end > self.size:
+            raise _CorruptRecord(offset, None)
+
+        data = self.mm[offset + _HEADER.size:end]
+        if zlib.crc32(data) != crc:
+            raise _CorruptRecord(offset, end)
+
+        return data, end
+
+    def write(self, offset: int, data: bytes) -> int:
+        """Write a record at offset and return the next offset."""
+        start = offset + _HEADER.size
+        end = start + len(data)
+        self.mm[start:end] = data
+        _HEADER.pack_into(self.mm, offset, len(data), zlib.crc32(data))
+        return end
+
+    def fits(self, offset: int, length: int) -> bool:
+        return offset + _HEADER.size + length <= self.size
+
+    def close(self) -> None:
+        self.mm.flush()
+        self.mm.close()
+
+    def delete(self) -> None:
+        self.mm.close()
+        os.remove(self.path)
+
+
+class Spool:
+    """
+    Append-only, segment-rotated on-disk FIFO of byte records.
+
+    Use peek() to look at the oldest record and pop() with the handle it
+    returned once the record has been delivered. The read position is checkpointed every
+    `checkpoint_every` pops and on close().
+
+    Attributes:
+        directory: Spool directory.
+        pending: Records appended but not yet popped.
+        dropped: Records discarded to respect the disk limit.
+        corrupted: Records skipped for failing their CRC.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        segment_size: int = DEFAULT_SEGMENT_SIZE,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        checkpoint_every: int = DEFAULT_CHECKPOINT_EVERY,
+    ):
+        """
+        Open or create the spool in directory, recovering any existing
+        segments and checkpoint.
+
+        Args:
+            directory: Spool directory, created if missing.
+            segment_size: Size of each segment file in bytes.
+            max_bytes: Disk budget; the oldest segment is dropped beyond it.
+            checkpoint_every: Pops between checkpoint writes.
+        """
+        if segment_size <= _HEADER.size:
+            raise ValueError("Spool segment_size is too small")
+
+        self.directory = directory
+        self.segment_size = segment_size
+        self.max_segments = max(2, max_bytes // segment_size)
+        self.checkpoint_every = checkpoint_every
+
+        self.pending = 0
+        self.dropped = 0
+        self.corrupted = 0
+
+        self._segments: List[_Segment] = []
+        self._read_offset = 0
+        self._write_offset = 0
+        self._unsaved_pops = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._recover()
+
+    @property
+    def size_bytes(self) -> int:
+        """Disk space currently used by segment files."""
+        return len(self._segments) * self.segment_size
+
+    def append(self, data: bytes) -> None:
+        """Append one record, rotating to a new segment when full."""
+        if not data:
+            raise ValueError("Cannot spool an empty record")
+        if _HEADER.size + len(data) > self.segment_size:
+            raise ValueError(f"Record of {len(data)} bytes exceeds the spool segment size")
+
+        tail = self._segments[-1]
+        if not tail.fits(self._write_offset, len(data)):
+            tail.mm.flush()
+            if len(self._segments) >= self.max_segments:
+                self._drop_oldest()
+            tail = self._open_segment(tail.id + 1)
+            self._write_offset = 0
+
+        self._write_offset = tail.write(self._write_offset, data)
+        self.pending += 1
+
+    def peek(self) -> Optional[Tuple[bytes, SpoolHandle]]:
+        """
+        Return the oldest undelivered record without removing it.
+
+        Returns:
+            (data, handle) where handle is passed to pop() once the record
+            has been delivered, or None if the spool is empty.
+        """
+        while True:
+            head = self._segments[0]
+            try:
+                data, _ = head.read(self._read_offset)
+            except _CorruptRecord as e:
+                self._skip_corrupt(head, e)
+                continue
+
+            if data is not None:
+                return data, (head.id, self._read_offset)
+
+            if len(self._segments) == 1:
+                return None
+
+            # end of a sealed segment: move on to the next one
+            self._retire_head()
+
+    def pop(self, handle: SpoolHandle) -> bool:
+        """
+        Remove the record peek() returned with handle.
+
+        Args:
+            handle: The handle peek() returned with the record.
+
+        Returns:
+            True if the record was removed, False if the head has moved
+            past it since, e.g. because its segment was dropped.
+        """
+        if handle != (self._segments[0].id, self._read_offset):
+            return False
+
+        data, offset = self._segments[0].read(self._read_offset)
+        if data is None:
+            raise IndexError("pop from empty Spool")
+
+        self._read_offset = offset
+        self.pending -= 1
+        self._unsaved_pops += 1
+
+        if self._unsaved_pops >= self.checkpoint_every:
+            self.checkpoint()
+        return True
+
+    def checkpoint(self) -> None:
+        """Persist the read position atomically."""
+        position = _POSITION.pack(self._segments[0].id, self._read_offset)
+        record = position + _CRC.pack(zlib.crc32(position))
+
+        tmp = os.path.join(self.directory, CHECKPOINT_FILE + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(record)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, os.path.join(self.directory, CHECKPOINT_FILE))
+
+        self._unsaved_pops = 0
+
+    def flush(self) -> None:
+        """Flush the segment being written to disk."""
+        self._segments[-1].mm.flush()
+
+    def close(self) -> None:
+        """Checkpoint and unmap every segment."""
+        self.checkpoint()
+        for segment in self._segments:
+            segment.close()
+        self._segments = []
+
+    def _open_segment(self, seg_id: int) -> _Segment:
+        segment = _Segment(self.directory, seg_id, self.segment_size)
+        self._segments.append(segment)
+        return segment
+
+    def _skip_corrupt(self, segment: _Segment, error: _CorruptRecord) -> None:
+        """Move the read position past a corrupt record at the head."""
+        self.corrupted += 1
+
+        if error.next_offset is not None:
+            logger.error("Spool record at offset %d of %s failed its CRC; skipping it.", error.offset, segment.path)
+            self._read_offset = error.next_offset
+            self.pending -= 1
+            return
+
+        # without a usable length the following records cannot be found
+        logger.error(
+            "Spool record at offset %d of %s has an invalid length; skipping the rest of the segment.",
+            error.offset, segment.path,
+        )
+        self._read_offset = segment.size if len(self._segments) > 1 else self._write_offset
+        self.pending = sum(
+            self._count(other, self._read_offset if i == 0 else 0)
+            for i, other in enumerate(self._segments)
+        )
+
+    def _retire_head(self) -> None:
+        """Delete the fully drained head segment and read from the next."""
+        self._segments.pop(0).delete()
+        self._read_offset = 0
+        self.checkpoint()
+
+    def _drop_oldest(self) -> None:
+        """Discard the head segment's undelivered records to free disk."""
+        lost = self._count(self._segments[0], self._read_offset)
+        self.pending -= lost
+        self.dropped += lost
+        logger.warning("Spool full; dropped %d undelivered records.", lost)
+        self._retire_head()
+
+    def _count(self, segment: _Segment, offset: int) -> int:
+        """Number of records in segment from offset onwards."""
+        return self._scan(segment, offset)[0]
+
+    def _scan(self, segment: _Segment, offset: int) -> Tuple[int, int]:
+        """
+        Walk the records of segment from offset, counting corrupt ones
+        whose length is usable, since peek() will skip them one by one.
+
+        Returns:
+            (records, end offset of the last one)
+        """
+        count = 0
+        while True:
+            try:
+                data, next_offset = segment.read(offset)
+            except _CorruptRecord as e:
+                if e.next_offset is None:
+                    return count, offset
+                next_offset = e.next_offset
+            else:
+                if data is None:
+                    return count, offset
+
+            count += 1
+            offset = next_offset
+
+    def _read_checkpoint(self) -> Tuple[int, int]:
+        path = os.path.join(self.directory, CHECKPOINT_FILE)
+        try:
+            with open(path, "rb") as f:
+                record = f.read()
+            seg_id, offset = _POSITION.unpack_from(record)
+            (crc,) = _CRC.unpack_from(record, _POSITION.size)
+        except (OSError, struct.error):
+            return 0, 0
+
+        if zlib.crc32(record[:_POSITION.size]) != crc:
+            logger.warning("Spool checkpoint is corrupt; replaying from the oldest segment.")
+            return 0, 0
+
+        return seg_id, offset
+
+    def _recover(self) -> None:
+        """Reopen existing segments and restore the read and write positions."""
+        ids = sorted(
+            int(match.group(1))
+            for match in map(_SEGMENT_RE.match, os.listdir(self.directory))
+            if match
+        )
+
+        if not ids:
+            self._open_segment(1)
+            return
+
+        for seg_id in ids:
+            self._open_segment(seg_id)
+
+        seg_id, offset = self._read_checkpoint()
+        while len(self._segments) > 1 and self._segments[0].id < seg_id:
+            self._segments.pop(0).delete()
+        if self._segments[0].id != seg_id:
+            offset = 0
+        self._read_offset = offset
+
+        # find the end of the written data in the tail segment and clear
+        # anything after it, such as a torn record from a crash
+        tail = self._segments[-1]
+        _, end = self._scan(tail, 0)
+        tail.mm[end:] = bytes(tail.size - end)
+        self._write_offset = end
+
+        if self._read_offset > end and len(self._segments) == 1:
+            self._read_offset = end
+
+        self.pending = sum(
+            self._count(segment, self._read_offset if i == 0 else 0)
+            for i, segment in enumerate(self._segments)
+        )
+
+        logger.info("Recovered spool with %d undelivered records.", self.pending)
@@ -0,0 +1,82 @@
+import uuid
+
+from binary_frame import FrameDecoder, TelemetryFrame, decode_frame, encode_frame, is_frame, to_message
+
+
+def reading(dev_id: int = 7, uptime: int = 494) -> TelemetryFrame:
+    return TelemetryFrame(
+        message_id=uuid.UUID(int=uptime).bytes, timestamp=1_735_689_600, uptime=uptime,
+        lat=275002432, ns=b"S", lon=1530153600, ew=b"E", alt=0,
+        temp=2622, humid=6900, press=1023, gas=2800, x=2413, y=-459, z=-6511,
+        hash=bytes(range(32)), dev_id=dev_id,
+    )
+
+
+def frames(decoder: FrameDecoder, data: bytes) -> list:
+    return [bytes(frame) for frame in decoder.feed(data)]
+
+
+def test_round_trip():
+    frame = encode_frame(reading())
+    decoder = FrameDecoder()
+
+    (out,) = frames(decoder, frame)
+    assert is_frame(out)
+    assert decode_frame(out) == reading()
+    assert decoder.frames_framed == 1
+
+
+def test_frame_split_across_reads():
+    data = encode_frame(reading(uptime=1)) + encode_frame(reading(uptime=2))
+    decoder = FrameDecoder()
+
+    out = []
+    for i in range(len(data)):
+        out += frames(decoder, data[i:i + 1])
+
+    assert [decode_frame(frame).uptime for frame in out] == [1, 2]
+    assert decoder.pending == 0
+
+
+def test_bad_crc_is_dropped_and_the_next_frame_found():
+    bad = bytearray(encode_frame(reading(uptime=1)))
+    bad[10] ^= 0xFF
+    decoder = FrameDecoder()
+
+    out = frames(decoder, bytes(bad) + encode_frame(reading(uptime=2)))
+
+    assert [decode_frame(frame).uptime for frame in out] == [2]
+    assert decoder.crc_errors == 1
+
+
+def test_resyncs_after_noise():
+    noise = b"[00:00:01] <inf> log line \xa5 with a stray sync byte\r\n"
+    data = noise + encode_frame(reading(uptime=1)) + noise + encode_frame(reading(uptime=2))
+    decoder = FrameDecoder()
+
+    out = frames(decoder, data[:len(noise) + 5]) + frames(decoder, data[len(noise) + 5:])
+
+    assert [decode_frame(frame).uptime for frame in out] == [1, 2]
+    assert decoder.skipped == 2 * len(noise)
+
+
+def test_unknown_version_is_skipped():
+    frame = bytearray(encode_frame(reading()))
+    frame[2] = 9
+    decoder = FrameDecoder()
+
+    assert frames(decoder, bytes(frame) + encode_frame(reading(uptime=3)))[-1] == encode_frame(reading(uptime=3))
+    assert decoder.invalid == 1
+
+
+def test_to_message_formats_like_the_firmware():
+    msg = to_message(reading())
+    payload = msg["payload"]
+
+    assert msg["header"]["messageType"] == "telemetry"
+    assert payload["deviceId"] == "dev-7"
+    assert msg["header"]["messageId"] == str(uuid.UUID(int=494))
+    assert payload["location"]["latitude"] == "27.5002432"
+    assert payload["environment"]["temperature_c"] == "26.22"
+    assert payload["acceleration"]["y_mps2"] == "-0.459"
+    assert msg["signature"]["value"] == bytes(range(32)).hex().upper()
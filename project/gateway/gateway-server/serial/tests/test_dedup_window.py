@@ -0,0 +1,69 @@
+from dedup_window import DedupWindow
+
+
+def reading(device: str, timestamp: str, hash_: str = "ab") -> dict:
+    return {
+        "header": {"messageType": "telemetry"},
+        "payload": {"deviceId": device, "timestamp": timestamp, "hash": hash_},
+    }
+
+
+def test_exact_duplicate_is_dropped():
+    window = DedupWindow()
+    msg = reading("t1", "2025-01-01T00:00:00")
+
+    assert window.add(msg, now=0.0) == [msg]
+    assert window.add(dict(msg), now=1.0) == []
+    assert window.duplicates == 1
+
+
+def test_bloom_only_hit_is_forwarded_and_counted():
+    window = DedupWindow(max_entries=1)
+    first = reading("t1", "2025-01-01T00:00:00")
+    other = reading("t1", "2025-01-01T00:00:01")
+
+    window.add(first, now=0.0)
+    # pushes the first key out of the one-entry LRU; only the Bloom filter has it
+    window.add(other, now=1.0)
+
+    assert window.add(first, now=2.0) == [first]
+    assert window.probable_duplicates == 1
+    assert window.duplicates == 0
+
+
+def test_non_telemetry_passes_through():
+    window = DedupWindow()
+    msg = {"header": {"messageType": "heartbeat"}, "payload": {"deviceId": "t1"}}
+
+    assert window.add(msg) == [msg]
+    assert window.add(msg) == [msg]
+
+
+def test_reorders_per_tracker():
+    window = DedupWindow(reorder_delay=5.0)
+    late = reading("t1", "2025-01-01T00:00:02")
+    early = reading("t1", "2025-01-01T00:00:01")
+
+    assert window.add(late, now=0.0) == []
+    assert window.add(early, now=1.0) == []
+    # the earlier timestamp arrived last and holds back the tracker
+    assert window.time_until_release(now=1.0) == 5.0
+
+    assert window.release_expired(now=10.0) == [early, late]
+    assert window.held == 0
+    assert window.late == 0
+
+
+def test_idle_trackers_are_forgotten():
+    window = DedupWindow(max_age=60.0, reorder_delay=1.0)
+
+    for n in range(100):
+        window.add(reading(f"t{n}", "2025-01-01T00:00:00"), now=0.0)
+    window.release_expired(now=2.0)
+    assert len(window._released) == 100
+
+    window.add(reading("t0", "2025-01-01T00:01:00"), now=100.0)
+    window.release_expired(now=102.0)
+
+    assert list(window._released) == ["t0"]
+    assert not window._held
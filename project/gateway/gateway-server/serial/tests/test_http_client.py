@@ -0,0 +1,76 @@
+import threading
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from http_client import HttpUplink, UplinkError
+
+
+@pytest.fixture
+def server():
+    """Local endpoint answering every POST with server.status."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            self.server.posts += 1
+            self.send_response(self.server.status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    httpd = HTTPServer(("127.0.0.1", 0), Handler)
+    httpd.posts = 0
+    thread = threading.Thread(target=httpd.serve_forever, args=(0.01,), daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def uplink_for(server) -> HttpUplink:
+    return HttpUplink(url=f"http://127.0.0.1:{server.server_port}/", api_key="key", max_retries=2, backoff=0.0)
+
+
+@pytest.mark.parametrize("status", [200, 202])
+def test_success(server, status):
+    server.status = status
+    uplink = uplink_for(server)
+
+    uplink.send({"header": {}})
+    assert server.posts == 1
+    assert uplink.rejected == 0
+
+
+@pytest.mark.parametrize("status", [400, 422])
+def test_invalid_message_is_dropped(server, status):
+    server.status = status
+    uplink = uplink_for(server)
+
+    uplink.send({"header": {}})
+    assert server.posts == 1
+    assert uplink.rejected == 1
+
+
+@pytest.mark.parametrize("status", [401, 403, 404])
+def test_refused_request_raises_without_retrying(server, status):
+    server.status = status
+    uplink = uplink_for(server)
+
+    with pytest.raises(UplinkError):
+        uplink.send({"header": {}})
+    assert server.posts == 1
+    assert uplink.rejected == 0
+
+
+def test_server_error_is_retried_then_raised(server):
+    server.status = 500
+    uplink = uplink_for(server)
+
+    with pytest.raises(UplinkError):
+        uplink.send({"header": {}})
+    assert server.posts == 3
+    assert uplink.retries == 2
@@ -0,0 +1,74 @@
+import asyncio
+import json
+
+import pytest
+
+from pipeline_queue import BackpressureQueue, SpillFile, POLICY_DROP_OLDEST, POLICY_SPILL
+
+
+def drain(queue: BackpressureQueue) -> list:
+    async def get_all():
+        return [await queue.get() for _ in range(queue.qsize())]
+    return asyncio.run(get_all())
+
+
+def test_spill_keeps_arrival_order():
+    async def run():
+        queue = BackpressureQueue("q", 4, POLICY_SPILL, spill=SpillFile())
+        for n in range(10):
+            await queue.put(n.to_bytes(2, "little"))
+        assert queue.spilled == 6
+
+        out = [await queue.get() for _ in range(3)]
+        # while the spill holds items, new ones go behind them
+        await queue.put((10).to_bytes(2, "little"))
+        out += [await queue.get() for _ in range(queue.qsize())]
+        queue.close()
+        return [int.from_bytes(item, "little") for item in out]
+
+    assert asyncio.run(run()) == list(range(11))
+
+
+def test_spill_round_trips_messages():
+    spill = SpillFile(encode=lambda msg: json.dumps(msg).encode(), decode=json.loads)
+    queue = BackpressureQueue("q", 1, POLICY_SPILL, spill=spill)
+
+    async def run():
+        for n in range(3):
+            await queue.put({"n": n})
+        return [await queue.get() for _ in range(3)]
+
+    assert asyncio.run(run()) == [{"n": 0}, {"n": 1}, {"n": 2}]
+    assert spill.pending == 0
+    queue.close()
+
+
+def test_drop_oldest():
+    queue = BackpressureQueue("q", 3, POLICY_DROP_OLDEST)
+
+    async def run():
+        for n in range(5):
+            await queue.put(n)
+
+    asyncio.run(run())
+    assert queue.dropped == 2
+    assert drain(queue) == [2, 3, 4]
+
+
+def test_would_block_only_when_blocking_and_full():
+    async def run():
+        blocking = BackpressureQueue("q", 1)
+        assert not blocking.would_block()
+        await blocking.put(1)
+        assert blocking.would_block()
+
+        dropping = BackpressureQueue("q", 1, POLICY_DROP_OLDEST)
+        await dropping.put(1)
+        assert not dropping.would_block()
+
+    asyncio.run(run())
+
+
+def test_spill_policy_requires_spill_file():
+    with pytest.raises(ValueError):
+        BackpressureQueue("q", 1, POLICY_SPILL)
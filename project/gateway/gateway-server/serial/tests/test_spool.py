@@ -0,0 +1,165 @@
+import asyncio
+import json
+import os
+import threading
+
+import pytest
+
+from gateway_pipeline import GatewayPipeline, SerialPort
+from spool import Spool
+
+# three 16-byte records per segment, at most two segments
+SEGMENT_SIZE = 48
+MAX_BYTES = 2 * SEGMENT_SIZE
+
+
+def record(n: int) -> bytes:
+    return json.dumps({"n": n}).encode()
+
+
+def drain_all(spool: Spool) -> list:
+    out = []
+    while (head := spool.peek()) is not None:
+        data, handle = head
+        assert spool.pop(handle)
+        out.append(json.loads(data)["n"])
+    return out
+
+
+@pytest.fixture
+def port():
+    master, slave = os.openpty()
+    port = SerialPort(os.ttyname(slave), 115200)
+    yield port
+    port.ser.close()
+    os.close(master)
+    os.close(slave)
+
+
+def test_fifo_across_segments(tmp_path):
+    spool = Spool(str(tmp_path), segment_size=SEGMENT_SIZE, max_bytes=1024)
+    for n in range(10):
+        spool.append(record(n))
+
+    assert spool.pending == 10
+    assert drain_all(spool) == list(range(10))
+    assert spool.pending == 0
+
+
+def test_resumes_from_checkpoint(tmp_path):
+    spool = Spool(str(tmp_path), segment_size=SEGMENT_SIZE, max_bytes=1024, checkpoint_every=1)
+    for n in range(5):
+        spool.append(record(n))
+    for _ in range(2):
+        _, handle = spool.peek()
+        spool.pop(handle)
+    spool.close()
+
+    spool = Spool(str(tmp_path), segment_size=SEGMENT_SIZE, max_bytes=1024)
+    assert spool.pending == 3
+    assert drain_all(spool) == [2, 3, 4]
+
+
+def test_pop_after_head_dropped_is_a_no_op(tmp_path):
+    spool = Spool(str(tmp_path), segment_size=SEGMENT_SIZE, max_bytes=MAX_BYTES)
+    for n in range(6):
+        spool.append(record(n))
+
+    data, handle = spool.peek()
+    assert json.loads(data) == {"n": 0}
+
+    # opening a third segment drops the head, records 0-2
+    spool.append(record(6))
+    assert spool.dropped == 3
+
+    assert not spool.pop(handle)
+    assert spool.pending == 4
+    assert drain_all(spool) == [3, 4, 5, 6]
+
+
+def test_corrupt_record_is_skipped(tmp_path):
+    spool = Spool(str(tmp_path), segment_size=SEGMENT_SIZE, max_bytes=1024)
+    for n in range(3):
+        spool.append(record(n))
+
+    # flip a data byte of the second record
+    segment = spool._segments[0]
+    offset = 8 + len(record(0)) + 8
+    segment.mm[offset] ^= 0xFF
+
+    assert drain_all(spool) == [0, 2]
+    assert spool.corrupted == 1
+
+
+def test_spool_filling_during_slow_send_loses_no_undelivered_record(tmp_path, port):
+    spool = Spool(str(tmp_path), segment_size=SEGMENT_SIZE, max_bytes=MAX_BYTES)
+    for n in range(6):
+        spool.append(record(n))
+
+    sending = threading.Event()
+    release = threading.Event()
+    sent = []
+
+    def send(msg):
+        if not sent:
+            sending.set()
+            release.wait(5)
+        sent.append(msg["n"])
+
+    pipeline = GatewayPipeline(port, 115200, send, spool=spool, drain_rate=1000.0)
+
+    async def run():
+        drain = asyncio.create_task(pipeline._drain_stage())
+        await asyncio.get_running_loop().run_in_executor(None, sending.wait, 5)
+
+        # while record 0 is in flight, fill the spool so its segment is dropped
+        spool.append(record(6))
+        release.set()
+
+        while spool.pending:
+            await asyncio.sleep(0.01)
+        drain.cancel()
+        await asyncio.gather(drain, return_exceptions=True)
+
+    asyncio.run(run())
+
+    # 0 was delivered, 1 and 2 were dropped with it; nothing after them is lost
+    assert sent == [0, 3, 4, 5, 6]
+    assert spool.dropped == 3
+
+
+def test_dropped_head_is_not_dead_lettered(tmp_path, port):
+    spool = Spool(str(tmp_path), segment_size=SEGMENT_SIZE, max_bytes=MAX_BYTES)
+    for n in range(6):
+        spool.append(record(n))
+
+    sending = threading.Event()
+    release = threading.Event()
+    sent = []
+
+    def send(msg):
+        if msg["n"] == 0:
+            sending.set()
+            release.wait(5)
+            raise ValueError("rejected")
+        sent.append(msg["n"])
+
+    pipeline = GatewayPipeline(
+        port, 115200, send, spool=spool, drain_rate=1000.0, retry_interval=0.0, max_attempts=1,
+    )
+
+    async def run():
+        drain = asyncio.create_task(pipeline._drain_stage())
+        await asyncio.get_running_loop().run_in_executor(None, sending.wait, 5)
+        spool.append(record(6))
+        release.set()
+
+        while spool.pending:
+            await asyncio.sleep(0.01)
+        drain.cancel()
+        await asyncio.gather(drain, return_exceptions=True)
+
+    asyncio.run(run())
+
+    assert pipeline.dead_lettered == 0
+    assert sent == [3, 4, 5, 6]
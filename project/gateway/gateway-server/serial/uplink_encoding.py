@@ -0,0 +1,104 @@
+"""
+Wire encodings for uplink messages.
+
+JSON stays the default. MessagePack (pip install msgpack) drops JSON's
+quotes and punctuation, and deflate compression removes the key names
+(temperature_c, humidity_percent, ...) that every reading repeats, which
+matters most for batch_telemetry envelopes. The choice travels with
+each message as its content type and content encoding, so the Azure
+function and the dashboard decode it without configuration.
+
+Values are left as the tracker's strings, since the tracker hash is
+computed over their exact text.
+
+Note that IoT Hub message routing queries on the body only work for
+uncompressed JSON.
+
+Example
+
+body, content_type, content_encoding = encode_message(msg, CONTENT_TYPE_MSGPACK, compress=True)
+msg == decode_message(body, content_type, content_encoding)
+"""
+
+import json
+import zlib
+
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+CONTENT_TYPE_JSON = "application/json"
+CONTENT_TYPE_MSGPACK = "application/msgpack"
+CONTENT_TYPES = {"json": CONTENT_TYPE_JSON, "msgpack": CONTENT_TYPE_MSGPACK}
+
+CONTENT_ENCODING_UTF8 = "utf-8"
+# zlib stream, as HTTP's Content-Encoding: deflate
+CONTENT_ENCODING_DEFLATE = "deflate"
+
+COMPRESSION_LEVEL = 6
+
+
+def encode_message(
+    data: Dict[str, Any],
+    content_type: str = CONTENT_TYPE_JSON,
+    compress: bool = False,
+) -> Tuple[bytes, str, Optional[str]]:
+    """
+    Serialise an uplink message.
+
+    Args:
+        data: The message.
+        content_type: CONTENT_TYPE_JSON or CONTENT_TYPE_MSGPACK.
+        compress: Deflate the serialised bytes.
+
+    Returns:
+        (body, content_type, content_encoding); content_encoding is
+        "utf-8" for plain JSON, "deflate" when compressed, else None.
+
+    Raises:
+        ValueError: If content_type is unknown or msgpack is not installed.
+    """
+    if content_type == CONTENT_TYPE_JSON:
+        body = json.dumps(data, separators=(",", ":")).encode("utf-8")
+        content_encoding = CONTENT_ENCODING_UTF8
+    elif content_type == CONTENT_TYPE_MSGPACK:
+        if msgpack is None:
+            raise ValueError("MessagePack uplink encoding needs the msgpack package")
+        body = msgpack.packb(data)
+        content_encoding = None
+    else:
+        raise ValueError(f"Unsupported uplink content type: {content_type}")
+
+    if compress:
+        body = zlib.compress(body, COMPRESSION_LEVEL)
+        content_encoding = CONTENT_ENCODING_DEFLATE
+
+    return body, content_type, content_encoding
+
+
+def decode_message(body: bytes, content_type: Optional[str], content_encoding: Optional[str] = None) -> Any:
+    """
+    Inverse of encode_message(); a missing content type means JSON.
+
+    Raises:
+        ValueError: If the body cannot be decoded.
+    """
+    if (content_encoding or "").lower() == CONTENT_ENCODING_DEFLATE:
+        try:
+            body = zlib.decompress(body)
+        except zlib.error as e:
+            raise ValueError(f"Invalid deflate body: {e}") from e
+
+    media_type = (content_type or CONTENT_TYPE_JSON).split(";", 1)[0].strip().lower()
+    if media_type == CONTENT_TYPE_MSGPACK:
+        if msgpack is None:
+            raise ValueError("MessagePack uplink encoding needs the msgpack package")
+        try:
+            return msgpack.unpackb(body)
+        except (msgpack.UnpackException, ValueError) as e:
+            raise ValueError(f"Invalid MessagePack body: {e}") from e
+
+    return json.loads(body)
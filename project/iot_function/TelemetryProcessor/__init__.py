@@ -1,34 +1,232 @@
 import azure.functions as func
 import logging
 import json
+import msgpack
 import requests
 import os
+import tempfile
+import time
+import uuid
+import zlib
 
-def main(event: func.EventHubEvent):
-    body = event.get_body().decode("utf-8")
-    logging.info(f"Recieved: {body}")
+from typing import Any, Dict, List, Optional, Tuple
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-    try:
-        data = json.loads(body)
-        logging.info("Parsed telemetry: %s", data)
+CONTENT_TYPE_JSON = "application/json"
+CONTENT_TYPE_MSGPACK = "application/msgpack"
+CONTENT_TYPE_NDJSON = "application/x-ndjson"
+CONTENT_ENCODING_DEFLATE = "deflate"
 
-    except json.JSONDecodeError:
-        logging.warning("Received invalid JSON payload")
+# IoT Hub messages are at most 256 KB; a deflate body inflating past this
+# is rejected instead of expanded into memory
+MAX_INFLATED_BYTES = 1024 * 1024
+
+# one bulk request per this many encoded bytes, so a large batch of
+# gateway envelopes never turns into one enormous POST
+MAX_BULK_BYTES = 4 * 1024 * 1024
+
+CONNECT_TIMEOUT_S = 3.05
+READ_TIMEOUT_S = 30
+MAX_RETRIES = 3
+BACKOFF_S = 0.5
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+DEAD_LETTER_DIR = os.getenv(
+    "PATHLEDGER_DEAD_LETTER_DIR", os.path.join(tempfile.gettempdir(), "telemetry-dead-letter")
+)
+
+def bulk_url() -> str:
+    """
+    The dashboard's bulk ingest endpoint; derived from the single-message
+    URL unless set explicitly.
+    """
+    url = os.getenv("PATHLEDGER_GATEWAY_TELEMETRY_BULK_API_URL")
+    if url:
+        return url
+    return os.getenv("PATHLEDGER_GATEWAY_TELEMETRY_API_URL", "").rstrip("/") + "/bulk/"
+
+def make_session() -> requests.Session:
+    """
+    A session whose connections are kept alive between invocations on the
+    same worker, retrying throttling and server errors with backoff.
+    """
+    retry = Retry(
+        total=MAX_RETRIES,
+        backoff_factor=BACKOFF_S,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=frozenset({"POST"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(max_retries=retry))
+    session.mount("http://", HTTPAdapter(max_retries=retry))
+    return session
+
+session = make_session()
+
+def content_headers(properties: Optional[Dict[str, Any]]) -> Tuple[str, Optional[str]]:
+    """
+    The content type and encoding the gateway set on the IoT Hub message,
+    from the event's system properties. Older gateways only send JSON.
+    """
+    properties = properties or {}
+    content_type = properties.get("content-type") or CONTENT_TYPE_JSON
+    content_encoding = properties.get("content-encoding")
+    return content_type, content_encoding
+
+def system_properties(events: List[func.EventHubEvent]) -> List[Dict[str, Any]]:
+    """
+    Per-event system properties. With cardinality "many" every event
+    shares the batch metadata, which holds one entry per event.
+    """
+    metadata = (events[0].metadata or {}) if events else {}
+    properties = metadata.get("SystemPropertiesArray") or []
+    if isinstance(properties, str):
+        properties = json.loads(properties)
+    return list(properties) + [{}] * (len(events) - len(properties))
+
+def decode_body(body: bytes, content_type: str, content_encoding: str):
+    """
+    Decode a telemetry body sent as JSON or MessagePack, optionally
+    deflate-compressed.
+
+    Raises:
+        ValueError: If the body does not decode or inflates past
+            MAX_INFLATED_BYTES.
+    """
+    if (content_encoding or "").lower() == CONTENT_ENCODING_DEFLATE:
+        inflater = zlib.decompressobj()
+        body = inflater.decompress(body, MAX_INFLATED_BYTES + 1)
+        if len(body) > MAX_INFLATED_BYTES:
+            raise ValueError(f"body inflates to more than {MAX_INFLATED_BYTES} bytes")
+        if not inflater.eof:
+            raise ValueError("truncated deflate body")
+
+    if content_type.split(";", 1)[0].strip().lower() == CONTENT_TYPE_MSGPACK:
+        return msgpack.unpackb(body)
+
+    return json.loads(body)
+
+def validate(message: Any) -> Optional[str]:
+    """
+    Cheap structural check before forwarding; the dashboard validates
+    the payload itself. Returns the problem, or None if the envelope
+    looks right.
+    """
+    if not isinstance(message, dict):
+        return "not an object"
+
+    header = message.get("header")
+    if not isinstance(header, dict):
+        return "missing header"
+    if not isinstance(header.get("messageType"), str):
+        return "missing header.messageType"
+    if not isinstance(message.get("payload"), dict):
+        return "missing payload"
+
+    return None
+
+def dead_letter(records: List[Dict[str, Any]]) -> None:
+    """
+    Append messages that could not be delivered to a local NDJSON file,
+    one file per invocation, for inspection and replay.
+    """
+    if not records:
         return
 
+    os.makedirs(DEAD_LETTER_DIR, exist_ok=True)
+    path = os.path.join(DEAD_LETTER_DIR, f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}.ndjson")
+
+    with open(path, "a", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, default=str) + "\n")
+
+    logging.warning(f"Dead-lettered {len(records)} messages to {path}")
+
+def chunks(lines: List[bytes], max_bytes: int = MAX_BULK_BYTES):
+    """
+    Split encoded NDJSON lines into request bodies of at most max_bytes
+    (a single larger line gets a request to itself).
+    """
+    start, size = 0, 0
+    for i, line in enumerate(lines):
+        if size and size + len(line) > max_bytes:
+            yield start, lines[start:i]
+            start, size = i, 0
+        size += len(line)
+    if start < len(lines):
+        yield start, lines[start:]
+
+def forward(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    POST messages to the dashboard's bulk endpoint as NDJSON.
+
+    Returns:
+        Dead-letter records for the messages that were not accepted.
+    """
     headers = {
         "Authorization": f"Api-Key {os.getenv('PATHLEDGER_GATEWAY_TELEMETRY_API_KEY')}",
-        "Content-Type": "application/json",
+        "Content-Type": CONTENT_TYPE_NDJSON,
     }
+    lines = [json.dumps(message, separators=(",", ":")).encode("utf-8") + b"\n" for message in messages]
+    failed = []
+
+    for offset, body in chunks(lines):
+        batch = messages[offset:offset + len(body)]
+        try:
+            resp = session.post(bulk_url(), headers=headers, data=b"".join(body),
+                                timeout=(CONNECT_TIMEOUT_S, READ_TIMEOUT_S))
+        except requests.exceptions.RequestException as err:
+            logging.error(f"Bulk forward of {len(batch)} messages failed: {err}")
+            failed += [{"reason": f"request failed: {err}", "message": message} for message in batch]
+            continue
+
+        if not resp.ok:
+            logging.error(f"Bulk forward of {len(batch)} messages failed with: {resp.status_code}")
+            failed += [{"reason": f"HTTP {resp.status_code}", "message": message} for message in batch]
+            continue
+
+        logging.info(f"Forwarded {len(batch)} messages, succeeded with: {resp.status_code}")
+
+        # per-message results; anything rejected will not succeed on a retry
+        try:
+            results = resp.json().get("results") or []
+        except ValueError:
+            results = []
+        for result in results:
+            if result.get("status") == "rejected" and 0 <= result.get("index", -1) < len(batch):
+                failed.append({"reason": result.get("error", "rejected"), "message": batch[result["index"]]})
+
+    return failed
+
+def main(events: List[func.EventHubEvent]):
+    logging.info(f"Recieved batch of {len(events)} events")
+
+    messages = []
+    dead = []
+
+    for event, properties in zip(events, system_properties(events)):
+        body = event.get_body()
+        content_type, content_encoding = content_headers(properties)
+
+        try:
+            message = decode_body(body, content_type, content_encoding)
+        except (ValueError, zlib.error, msgpack.UnpackException):
+            logging.warning("Received invalid %s payload", content_type)
+            dead.append({"reason": f"undecodable {content_type}", "body": body.hex()})
+            continue
+
+        problem = validate(message)
+        if problem:
+            logging.warning(f"Received invalid message: {problem}")
+            dead.append({"reason": problem, "message": message})
+            continue
+
+        messages.append(message)
+
+    if messages:
+        dead += forward(messages)
 
-    try:
-        resp = requests.post(os.getenv("PATHLEDGER_GATEWAY_TELEMETRY_API_URL", ""), headers=headers, json=data, timeout=5)
-        logging.info(f"Succeeded with: {resp.status_code}")
-    except requests.exceptions.HTTPError as errh:
-        logging.error(f"HTTP error: {errh}")
-    except requests.exceptions.ConnectionError as errc:
-        logging.error(f"Connection error: {errc}")
-    except requests.exceptions.Timeout as errt:
-        logging.error(f"Timeout: {errt}")
-    except requests.exceptions.RequestException as err:
-        logging.error(f"{err}")
+    dead_letter(dead)